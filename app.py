@@ -1,15 +1,37 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, stream_with_context, abort
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_wtf.csrf import CSRFProtect
 from flask_talisman import Talisman
 from flask_bootstrap import Bootstrap5
 from dotenv import load_dotenv
+from werkzeug.wsgi import ClosingIterator
 from functools import wraps
 from models import db, User, Tarefa, TaskGroup, Note
-from forms import (LoginForm, CreateUserForm, TaskForm, EditTaskForm,
+from migrations import upgrade as upgrade_schema
+import sqlite_profile
+import membership
+import user_cache
+import search
+import change_versions
+import fragment_cache
+import export
+import task_import
+import ics_feed
+import live_events
+import delta_sync
+import metrics
+import slow_queries
+from patches import apply_edits, PatchError
+from passwords import PasswordPoolBusy, verify_password
+from queries import (month_summary, month_total, initial_month, timeline_page, month_key,
+                     month_name, parse_month_key, decode_cursor,
+                     notes_sidebar_query, note_detail, admin_group_stats, admin_user_page,
+                     group_member_page, member_candidates, add_members, remove_members,
+                     task_list_page, MEMBER_BULK_LIMIT)
+from task_api import apply_batch, task_to_dict, parse_date, BatchError
+from forms import (LoginForm, CreateUserForm, TaskForm, EditTaskForm, ImportTasksForm,
                    TaskGroupForm, DeleteForm, ManageMemberForm)
-from collections import defaultdict
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -19,6 +41,16 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///tarefas.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Perfil do SQLite para vários workers (WAL, busy timeout, BEGIN IMMEDIATE)
+app.config['SQLITE_TUNING'] = os.getenv('SQLITE_TUNING', 'True') == 'True'
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # milissegundos
+app.config['SQLITE_CACHE_SIZE'] = int(os.getenv('SQLITE_CACHE_SIZE', '-20000'))  # negativo = KiB (~20 MB)
+app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # bytes
+
+# Diretório dos contadores de versão compartilhados entre os workers
+# (padrão: pasta "cache" ao lado do banco SQLite)
+app.config['CACHE_DIR'] = os.getenv('CACHE_DIR')
+
 # Configurações de segurança
 app.config['SESSION_COOKIE_SECURE'] = os.getenv('SESSION_COOKIE_SECURE', 'False') == 'True'  # True em produção com HTTPS
 app.config['SESSION_COOKIE_HTTPONLY'] = True
@@ -27,11 +59,47 @@ app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hora
 app.config['WTF_CSRF_TIME_LIMIT'] = None  # Token CSRF não expira (usa session)
 app.config['WTF_CSRF_SSL_STRICT'] = os.getenv('WTF_CSRF_SSL_STRICT', 'False') == 'True'  # True em produção
 
+# Cache do user loader (retratos de usuário em memória)
+app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', '1024'))
+app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', '300'))  # segundos
+
+# Cache dos blocos de mês renderizados (memória por worker e, opcionalmente, disco compartilhado)
+app.config['FRAGMENT_CACHE_SIZE'] = int(os.getenv('FRAGMENT_CACHE_SIZE', '512'))
+app.config['FRAGMENT_CACHE_DISK'] = os.getenv('FRAGMENT_CACHE_DISK', 'False') == 'True'
+app.config['FRAGMENT_CACHE_DISK_MAX_FILES'] = int(os.getenv('FRAGMENT_CACHE_DISK_MAX_FILES', '5000'))
+
+# Feeds .ics: janela de datas (em dias a partir de hoje) e blocos de eventos em cache por worker
+app.config['ICS_FEED_PAST_DAYS'] = int(os.getenv('ICS_FEED_PAST_DAYS', '90'))
+app.config['ICS_FEED_FUTURE_DAYS'] = int(os.getenv('ICS_FEED_FUTURE_DAYS', '365'))
+app.config['ICS_FEED_CACHE_SIZE'] = int(os.getenv('ICS_FEED_CACHE_SIZE', '256'))
+
+# Eventos em tempo real (SSE): conexões por worker, duração de cada conexão e intervalos (segundos)
+app.config['LIVE_EVENTS'] = os.getenv('LIVE_EVENTS', 'True') == 'True'
+app.config['LIVE_EVENTS_MAX_STREAMS'] = int(os.getenv('LIVE_EVENTS_MAX_STREAMS', '12'))
+app.config['LIVE_EVENTS_STREAM_SECONDS'] = int(os.getenv('LIVE_EVENTS_STREAM_SECONDS', '300'))
+app.config['LIVE_EVENTS_POLL_INTERVAL'] = float(os.getenv('LIVE_EVENTS_POLL_INTERVAL', '0.5'))
+app.config['LIVE_EVENTS_HEARTBEAT'] = int(os.getenv('LIVE_EVENTS_HEARTBEAT', '15'))
+
+# Métricas por requisição (Server-Timing e /metrics): arquivos por worker gravados
+# a cada METRICS_FLUSH_INTERVAL segundos e descartados após METRICS_MAX_AGE sem atualização
+app.config['METRICS'] = os.getenv('METRICS', 'True') == 'True'
+app.config['METRICS_DIR'] = os.getenv('METRICS_DIR')  # padrão: <cache>/metrics
+app.config['METRICS_FLUSH_INTERVAL'] = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+app.config['METRICS_MAX_AGE'] = int(os.getenv('METRICS_MAX_AGE', '86400'))
+
+# Registro de consultas lentas (acima de SLOW_QUERY_MS milissegundos), visto em /admin/consultas-lentas
+app.config['SLOW_QUERY_LOG'] = os.getenv('SLOW_QUERY_LOG', 'True') == 'True'
+app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '100'))
+app.config['SLOW_QUERY_FLUSH_INTERVAL'] = float(os.getenv('SLOW_QUERY_FLUSH_INTERVAL', '5'))
+
 # Configurações do Bootstrap-Flask
 app.config['BOOTSTRAP_SERVE_LOCAL'] = True  # Servir Bootstrap localmente ao invés de CDN
 
 # Inicializar extensões
 db.init_app(app)
+sqlite_profile.init_app(app, db)
+metrics.init_app(app, db)
+slow_queries.init_app(app, db)
 bootstrap = Bootstrap5(app)
 
 # Proteção CSRF
@@ -62,7 +130,8 @@ login_manager.session_protection = 'strong'  # Proteção adicional de sessão
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Retrato em cache (sem SELECT por requisição)
+    return user_cache.load(int(user_id))
 
 
 # ============= DECORADORES =============
@@ -77,6 +146,22 @@ def admin_required(f):
     return decorated_function
 
 
+def api_login_required(f):
+    """Como @login_required, mas responde 401 em JSON em vez de redirecionar para o login."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return {'success': False, 'message': 'Autenticação necessária.'}, 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@app.errorhandler(PasswordPoolBusy)
+def password_pool_busy(error):
+    """Pool de hashing saturado: recusar rápido em vez de enfileirar o worker."""
+    return 'Servidor ocupado. Tente novamente em alguns segundos.', 503, {'Retry-After': '2'}
+
+
 # ============= ROTAS DE AUTENTICAÇÃO =============
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -88,8 +173,26 @@ def login():
 
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
+        password_hash = user.password_hash if user else None
+        # Encerrar a transação (BEGIN IMMEDIATE em POST) antes do Argon2,
+        # para não segurar o lock de escrita durante a verificação da senha.
+        # O hash é lido antes: acessar `user` após o commit abriria outra transação
+        db.session.commit()
 
-        if user and user.check_password(form.password.data):
+        try:
+            valid, needs_rehash = verify_password(password_hash, form.password.data) if user else (False, False)
+        except PasswordPoolBusy:
+            flash('Muitos logins simultâneos. Tente novamente em alguns segundos.', 'warning')
+            return render_template('login.html', form=form), 503, {'Retry-After': '2'}
+
+        if valid:
+            if needs_rehash:
+                # Parâmetros do Argon2 mudaram: refazer o hash com a senha em mãos
+                try:
+                    user.set_password(form.password.data)
+                    db.session.commit()
+                except PasswordPoolBusy:
+                    db.session.rollback()  # fica para o próximo login
             login_user(user)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('index'))
@@ -109,87 +212,129 @@ def logout():
 
 # ============= ROTAS DE TAREFAS =============
 
+def _members_for_filter(group_ids, selected_group_id):
+    """Membros (id, nome) dos grupos do usuário ou apenas do grupo selecionado."""
+    if selected_group_id:
+        if selected_group_id not in group_ids:
+            return []
+        group_ids = [selected_group_id]
+    return membership.members(group_ids)
+
+
+def _month_block(group_ids, year, month, selected_group_id, selected_user_id, total=None):
+    """HTML do bloco de um mês (primeira página) e o cursor da seguinte, via cache de fragmentos."""
+    def render():
+        tarefas, next_cursor = timeline_page(group_ids, year, month, selected_group_id, selected_user_id)
+        bloco = {'chave': month_key(year, month), 'nome': month_name(year, month),
+                 'tarefas': tarefas, 'next_cursor': next_cursor,
+                 'total': total if total is not None
+                 else month_total(group_ids, year, month, selected_group_id, selected_user_id)}
+        return render_template('_tarefas_mes.html', mes=bloco), next_cursor
+
+    return fragment_cache.month_block(group_ids, year, month, selected_group_id, selected_user_id, render)
+
+
 @app.route('/')
 @login_required
+@change_versions.conditional
 def index():
     # Criar formulário de tarefa
     form = TaskForm()
-    form.task_group_id.choices = [('', '--- Selecione um grupo ---')] + [(g.id, g.name) for g in current_user.task_groups]
+    form.task_group_id.choices = [('', '--- Selecione um grupo ---')] + [(g.id, g.name) for g in membership.groups()]
 
     # Buscar grupos do usuário
-    user_groups = current_user.task_groups
+    user_groups = membership.groups()
 
     # Se o usuário não pertence a nenhum grupo, retornar vazio
     if not user_groups:
-        return render_template('index.html', tarefas_agrupadas=[], total_tarefas=0, user_groups=user_groups,
-                             members_list=[], selected_user_id=None, selected_group_id=None, form=form)
+        return render_template('index.html', meses=[], mes_inicial_html=None, indice_inicial=None,
+                             total_tarefas=0, user_groups=user_groups, members_list=[],
+                             selected_user_id=None, selected_group_id=None, form=form,
+                             live_versions={})
 
     # Buscar IDs dos grupos do usuário
-    group_ids = [group.id for group in user_groups]
+    group_ids = membership.group_ids()
 
     # Obter filtros da query string
     selected_user_id = request.args.get('user_id', type=int)
     selected_group_id = request.args.get('group_id', type=int)
 
-    # Buscar todas as tarefas dos grupos que o usuário pertence
-    query = Tarefa.query.filter(Tarefa.task_group_id.in_(group_ids))
+    # Membros para o filtro (só do grupo selecionado, se houver)
+    members_list = _members_for_filter(group_ids, selected_group_id)
 
-    # Aplicar filtro de grupo se selecionado
-    if selected_group_id:
-        # Verificar se o usuário pertence a este grupo
-        if selected_group_id in group_ids:
-            query = query.filter(Tarefa.task_group_id == selected_group_id)
+    # Meses com tarefas (cabeçalhos e contagens calculados no banco)
+    meses = month_summary(group_ids, selected_group_id, selected_user_id)
+    total_tarefas = sum(mes['total'] for mes in meses)
 
-    # Aplicar filtro de usuário se selecionado
-    if selected_user_id:
-        query = query.filter(Tarefa.user_id == selected_user_id)
+    # A página abre apenas no mês atual; os demais são carregados sob demanda
+    mes_inicial_html = None
+    indice_inicial = initial_month(meses)
+    if indice_inicial is not None:
+        mes = meses[indice_inicial]
+        mes_inicial_html, _ = _month_block(group_ids, mes['ano'], mes['mes'], selected_group_id,
+                                           selected_user_id, total=mes['total'])
 
-    tarefas = query.order_by(Tarefa.data).all()
+    return render_template('index.html', meses=meses, mes_inicial_html=mes_inicial_html,
+                         indice_inicial=indice_inicial, total_tarefas=total_tarefas,
+                         user_groups=user_groups, members_list=members_list,
+                         selected_user_id=selected_user_id, selected_group_id=selected_group_id, form=form,
+                         live_versions=_live_versions(group_ids))
 
-    # Buscar todos os membros dos grupos para o filtro
-    members_set = set()
-    if selected_group_id:
-        # Se um grupo está selecionado, mostrar apenas membros daquele grupo
-        selected_group = TaskGroup.query.get(selected_group_id)
-        if selected_group:
-            for member in selected_group.members.all():
-                members_set.add((member.id, member.username))
+
+@app.route('/tarefas/mes')
+@login_required
+@change_versions.conditional
+def tarefas_mes():
+    """Fragmento HTML de um mês da linha do tempo (paginação por chave)"""
+    group_ids = membership.group_ids()
+
+    mes = parse_month_key(request.args.get('mes'))
+    if not mes:
+        return {'success': False, 'message': 'Mês inválido.'}, 400
+
+    after = None
+    if request.args.get('after'):
+        after = decode_cursor(request.args.get('after'))
+        if not after:
+            return {'success': False, 'message': 'Cursor inválido.'}, 400
+
+    selected_user_id = request.args.get('user_id', type=int)
+    selected_group_id = request.args.get('group_id', type=int)
+
+    # Continuação de um mês já exibido: apenas as linhas da tabela
+    if after:
+        tarefas, next_cursor = timeline_page(group_ids, mes[0], mes[1], selected_group_id,
+                                             selected_user_id, after=after)
+        html = fragment_cache.for_viewer(render_template('_tarefas_linhas.html', tarefas=tarefas))
     else:
-        # Mostrar todos os membros de todos os grupos do usuário
-        for group in user_groups:
-            for member in group.members.all():
-                members_set.add((member.id, member.username))
-    members_list = sorted(list(members_set), key=lambda x: x[1])  # Ordenar por nome
-
-    # Agrupar tarefas por mês/ano
-    tarefas_por_mes = defaultdict(list)
-    meses_ordem = []
-
-    # Nomes dos meses em português
-    meses_nomes = {
-        1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril',
-        5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto',
-        9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
+        html, next_cursor = _month_block(group_ids, mes[0], mes[1], selected_group_id, selected_user_id)
+
+    return {
+        'success': True,
+        'mes': month_key(*mes),
+        'html': html,
+        'next_cursor': next_cursor
     }
 
-    for tarefa in tarefas:
-        mes_ano = (tarefa.data.year, tarefa.data.month)
-        if mes_ano not in tarefas_por_mes:
-            meses_ordem.append(mes_ano)
-        tarefas_por_mes[mes_ano].append(tarefa)
-
-    # Criar lista formatada de meses com suas tarefas
-    tarefas_agrupadas = []
-    for ano, mes in meses_ordem:
-        mes_nome = f"{meses_nomes[mes]} de {ano}"
-        tarefas_agrupadas.append({
-            'mes_nome': mes_nome,
-            'tarefas': tarefas_por_mes[(ano, mes)]
-        })
-
-    return render_template('index.html', tarefas_agrupadas=tarefas_agrupadas, total_tarefas=len(tarefas),
-                         user_groups=user_groups, members_list=members_list,
-                         selected_user_id=selected_user_id, selected_group_id=selected_group_id, form=form)
+
+@app.route('/busca')
+@login_required
+@change_versions.conditional
+def busca():
+    """Busca textual em tarefas e notas dos grupos do usuário"""
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+
+    results, has_next, ranked = [], False, True
+    if query:
+        if search.is_installed():
+            results, has_next, ranked = search.search(query, membership.group_ids(), page)
+        else:
+            flash('A busca ainda não está disponível: execute as migrações do banco.', 'warning')
+
+    group_names = {group.id: group.name for group in membership.groups()}
+    return render_template('busca.html', query=query, results=results, page=page,
+                         has_next=has_next, ranked=ranked, group_names=group_names)
 
 
 @app.route('/adicionar', methods=['POST'])
@@ -198,12 +343,11 @@ def adicionar():
     form = TaskForm()
 
     # Preencher choices do SelectField com grupos do usuário
-    form.task_group_id.choices = [('', '--- Selecione um grupo ---')] + [(g.id, g.name) for g in current_user.task_groups]
+    form.task_group_id.choices = [('', '--- Selecione um grupo ---')] + [(g.id, g.name) for g in membership.groups()]
 
     if form.validate_on_submit():
         # Verificar se o usuário pertence ao grupo
-        task_group = TaskGroup.query.get(form.task_group_id.data)
-        if not task_group or task_group not in current_user.task_groups:
+        if form.task_group_id.data not in membership.group_ids():
             flash('Você não pertence a este grupo de tarefas.', 'danger')
             return redirect(url_for('index'))
 
@@ -234,8 +378,7 @@ def editar(id):
     # Verificar permissões
     # Admin pode editar qualquer tarefa do grupo
     # Usuário comum só pode editar suas próprias tarefas
-    task_group = tarefa.task_group
-    if task_group not in current_user.task_groups:
+    if tarefa.task_group_id not in membership.group_ids():
         flash('Você não tem permissão para editar esta tarefa.', 'danger')
         return redirect(url_for('index'))
 
@@ -246,12 +389,11 @@ def editar(id):
     form = EditTaskForm(obj=tarefa)
 
     # Preencher choices do SelectField com grupos do usuário
-    form.task_group_id.choices = [(g.id, g.name) for g in current_user.task_groups]
+    form.task_group_id.choices = [(g.id, g.name) for g in membership.groups()]
 
     if form.validate_on_submit():
         # Verificar se o usuário pertence ao novo grupo
-        new_task_group = TaskGroup.query.get(form.task_group_id.data)
-        if not new_task_group or new_task_group not in current_user.task_groups:
+        if form.task_group_id.data not in membership.group_ids():
             flash('Você não pertence a este grupo de tarefas.', 'danger')
             return redirect(url_for('index'))
 
@@ -279,8 +421,7 @@ def deletar(id):
     # Verificar permissões
     # Admin pode deletar qualquer tarefa do grupo
     # Usuário comum só pode deletar suas próprias tarefas
-    task_group = tarefa.task_group
-    if task_group not in current_user.task_groups:
+    if tarefa.task_group_id not in membership.group_ids():
         flash('Você não tem permissão para deletar esta tarefa.', 'danger')
         return redirect(url_for('index'))
 
@@ -294,70 +435,147 @@ def deletar(id):
     return redirect(url_for('index'))
 
 
+@app.route('/importar', methods=['GET', 'POST'])
+@login_required
+def importar():
+    """Importação em massa de tarefas de um arquivo CSV ou .ics (com simulação)"""
+    form = ImportTasksForm()
+    form.task_group_id.choices = [(g.id, g.name) for g in membership.groups()]
+
+    report = None
+    if form.validate_on_submit():
+        upload = form.arquivo.data
+        try:
+            report = task_import.import_tasks(
+                task_import.text_lines(upload.stream), task_import.detect_format(upload.filename),
+                current_user.id, membership.group_ids(), default_group_id=form.task_group_id.data,
+                dry_run=form.dry_run.data)
+        except task_import.ImportFileError as e:
+            flash(str(e), 'danger')
+    else:
+        for field, errors in form.errors.items():
+            for error in errors:
+                flash(error, 'danger')
+
+    return render_template('importar.html', form=form, report=report,
+                         max_rows=task_import.MAX_ROWS)
+
+
+# ============= ASSINATURA DA AGENDA (.ics) =============
+
+@app.route('/agenda')
+@login_required
+def agenda_assinatura():
+    """Links de assinatura da agenda em aplicativos de calendário"""
+    return render_template('agenda.html', token=ics_feed.token_for(current_user.id),
+                         user_groups=membership.groups(), form=DeleteForm())
+
+
+@app.route('/agenda/novo-link', methods=['POST'])
+@login_required
+def agenda_novo_link():
+    """Gera (ou troca) o token dos links de assinatura; os links antigos deixam de funcionar"""
+    form = DeleteForm()
+    if not form.validate_on_submit():
+        flash('Token CSRF inválido.', 'danger')
+        return redirect(url_for('agenda_assinatura'))
+
+    ics_feed.new_token(current_user.id)
+    flash('Novos links de assinatura gerados.', 'success')
+    return redirect(url_for('agenda_assinatura'))
+
+
+@app.route('/agenda/<token>.ics')
+def agenda_feed(token):
+    """Feed pessoal: tarefas de todos os grupos do dono do token"""
+    owner = ics_feed.user_for_token(token)
+    if owner is None:
+        abort(404)
+    return ics_feed.feed_response(f'Agenda de {owner.username}', membership.groups(owner.id))
+
+
+@app.route('/agenda/<token>/grupo/<int:group_id>.ics')
+def agenda_feed_grupo(token, group_id):
+    """Feed de um grupo do dono do token"""
+    owner = ics_feed.user_for_token(token)
+    if owner is None:
+        abort(404)
+    groups = [group for group in membership.groups(owner.id) if group.id == group_id]
+    if not groups:
+        abort(404)
+    return ics_feed.feed_response(groups[0].name, groups)
+
+
 # ============= ROTAS DE ANOTAÇÕES =============
 
 @app.route('/notas')
 @login_required
+@change_versions.conditional
 def notas():
     """Página de anotações com gerenciador de arquivos"""
     # Buscar grupos do usuário
-    user_groups = current_user.task_groups
+    user_groups = membership.groups()
 
     # Se o usuário não pertence a nenhum grupo, retornar vazio
     if not user_groups:
         return render_template('notas.html', notes=[], user_groups=user_groups,
                              selected_group_id=None, selected_note_id=None,
-                             current_note=None, members_list=[])
+                             current_note=None, members_list=[], live_versions={})
 
     # Buscar IDs dos grupos do usuário
-    group_ids = [group.id for group in user_groups]
+    group_ids = membership.group_ids()
 
     # Obter filtros da query string
     selected_group_id = request.args.get('group_id', type=int)
     selected_note_id = request.args.get('note_id', type=int)
     selected_user_id = request.args.get('user_id', type=int)
 
-    # Buscar todas as notas dos grupos que o usuário pertence
-    query = Note.query.filter(Note.task_group_id.in_(group_ids))
-
-    # Aplicar filtro de grupo se selecionado
-    if selected_group_id and selected_group_id in group_ids:
-        query = query.filter(Note.task_group_id == selected_group_id)
+    # Buscar as notas dos grupos do usuário (sem o conteúdo, apenas a lista)
+    notes = notes_sidebar_query(group_ids, selected_group_id, selected_user_id).all()
 
-    # Aplicar filtro de usuário se selecionado
-    if selected_user_id:
-        query = query.filter(Note.user_id == selected_user_id)
-
-    notes = query.order_by(Note.updated_at.desc()).all()
-
-    # Buscar todos os membros dos grupos para o filtro
-    members_set = set()
-    if selected_group_id:
-        # Se um grupo está selecionado, mostrar apenas membros daquele grupo
-        selected_group = TaskGroup.query.get(selected_group_id)
-        if selected_group:
-            for member in selected_group.members.all():
-                members_set.add((member.id, member.username))
-    else:
-        # Mostrar todos os membros de todos os grupos do usuário
-        for group in user_groups:
-            for member in group.members.all():
-                members_set.add((member.id, member.username))
-    members_list = sorted(list(members_set), key=lambda x: x[1])  # Ordenar por nome
+    # Membros para o filtro (só do grupo selecionado, se houver)
+    members_list = _members_for_filter(group_ids, selected_group_id)
 
     # Buscar nota selecionada
     current_note = None
     if selected_note_id:
-        current_note = Note.query.get(selected_note_id)
-        # Verificar se o usuário tem acesso à nota
-        if current_note and current_note.task_group_id not in group_ids:
-            current_note = None
+        # Retorna None se a nota não pertencer aos grupos do usuário
+        current_note = note_detail(selected_note_id, group_ids)
 
     return render_template('notas.html', notes=notes, user_groups=user_groups,
                          selected_group_id=selected_group_id,
                          selected_note_id=selected_note_id,
                          selected_user_id=selected_user_id,
-                         current_note=current_note, members_list=members_list)
+                         current_note=current_note, members_list=members_list,
+                         live_versions=_live_versions(group_ids))
+
+
+@app.route('/notas/<int:id>')
+@login_required
+@change_versions.conditional
+def nota_conteudo(id):
+    """Conteúdo completo de uma nota em JSON (troca de nota sem recarregar)"""
+    group_ids = membership.group_ids()
+
+    note = note_detail(id, group_ids)
+    if not note:
+        return {'success': False, 'message': 'Nota não encontrada.'}, 404
+
+    return {
+        'success': True,
+        'note': {
+            'id': note.id,
+            'title': note.title,
+            'content': note.content or '',
+            'task_group_id': note.task_group_id,
+            'group_name': note.task_group.name,
+            'user_id': note.user_id,
+            'author': getattr(user_cache.load(note.user_id), 'username', ''),
+            'version': note.version,
+            'updated_at': note.updated_at.strftime('%d/%m/%Y %H:%M'),
+            'can_edit': note.user_id == current_user.id or current_user.is_admin
+        }
+    }
 
 
 @app.route('/notas/criar', methods=['POST'])
@@ -376,8 +594,7 @@ def criar_nota():
         return redirect(url_for('notas'))
 
     # Verificar se o usuário pertence ao grupo
-    task_group = TaskGroup.query.get(task_group_id)
-    if not task_group or task_group not in current_user.task_groups:
+    if task_group_id not in membership.group_ids():
         flash('Você não pertence a este grupo de tarefas.', 'danger')
         return redirect(url_for('notas'))
 
@@ -394,51 +611,146 @@ def criar_nota():
     return redirect(url_for('notas', note_id=note.id, group_id=task_group_id))
 
 
-@app.route('/notas/<int:id>/atualizar', methods=['POST'])
-@login_required
-def atualizar_nota(id):
-    """Atualizar conteúdo da nota - apenas autor ou admin"""
-    note = Note.query.get_or_404(id)
-
+def _check_note_edit_permission(note):
+    """Retorna a resposta de erro (JSON, 403) se o usuário não puder editar a nota."""
     # Verificar se pertence ao grupo
-    if note.task_group not in current_user.task_groups:
+    if note.task_group_id not in membership.group_ids():
         return {'success': False, 'message': 'Você não tem permissão para editar esta nota.'}, 403
 
     # Verificar se é autor ou admin
     if note.user_id != current_user.id and not current_user.is_admin:
         return {'success': False, 'message': 'Apenas o autor ou um administrador podem editar esta nota.'}, 403
 
+    return None
+
+
+def _save_note(note, content, title, task_group_id, base_version):
+    """
+    Grava a nota com um UPDATE condicional à versão e incrementa a versão.
+
+    Se `base_version` for informado e a nota tiver sido alterada desde essa
+    versão (por outro editor), nada é gravado e retorna None. Caso contrário
+    retorna a nova versão.
+    """
+    values = {'content': content, 'version': Note.version + 1}
+
+    if title:
+        values['title'] = title
+
     # Autor ou admin podem alterar o grupo
-    task_group_id = request.form.get('task_group_id', type=int)
-    if task_group_id and (note.user_id == current_user.id or current_user.is_admin):
+    if task_group_id:
         # Verificar se o usuário pertence ao novo grupo
-        new_group = TaskGroup.query.get(task_group_id)
-        if new_group and new_group in current_user.task_groups:
-            note.task_group_id = task_group_id
+        if task_group_id in membership.group_ids():
+            values['task_group_id'] = task_group_id
 
-    content = request.form.get('content', '')
-    title = request.form.get('title', '').strip()
+    query = Note.query.filter(Note.id == note.id)
+    if base_version is not None:
+        query = query.filter(Note.version == base_version)
 
-    if title:
-        note.title = title
-    note.content = content
+    updated = query.update(values, synchronize_session=False)
     db.session.commit()
 
+    if not updated:
+        return None
+    if base_version is not None:
+        return base_version + 1
+    return db.session.query(Note.version).filter(Note.id == note.id).scalar()
+
+
+def _conflict_response(note_id):
+    """Resposta 409 com a versão atual da nota."""
+    current_version = db.session.query(Note.version).filter(Note.id == note_id).scalar()
+    return {
+        'success': False,
+        'conflict': True,
+        'version': current_version,
+        'message': 'A nota foi alterada por outra pessoa desde a última vez que foi salva.'
+    }, 409
+
+
+def _saved_response(note_id, version):
+    task_group = (TaskGroup.query.join(Note, Note.task_group_id == TaskGroup.id)
+                  .filter(Note.id == note_id).first())
     return {
         'success': True,
         'message': 'Nota atualizada com sucesso!',
-        'group_name': note.task_group.name
+        'version': version,
+        'group_name': task_group.name
     }
 
 
+@app.route('/notas/<int:id>/atualizar', methods=['POST'])
+@login_required
+def atualizar_nota(id):
+    """Atualizar conteúdo da nota (texto completo) - apenas autor ou admin"""
+    note = Note.query.get_or_404(id)
+
+    error = _check_note_edit_permission(note)
+    if error:
+        return error
+
+    content = request.form.get('content', '')
+    title = request.form.get('title', '').strip()
+    task_group_id = request.form.get('task_group_id', type=int)
+
+    # Sem base_version o conteúdo é sobrescrito (comportamento original)
+    base_version = request.form.get('base_version', type=int)
+
+    version = _save_note(note, content, title, task_group_id, base_version)
+    if version is None:
+        return _conflict_response(id)
+
+    return _saved_response(id, version)
+
+
+@app.route('/notas/<int:id>/patch', methods=['POST'])
+@login_required
+def atualizar_nota_patch(id):
+    """
+    Atualizar a nota enviando apenas as edições (autosave incremental).
+
+    Corpo JSON: {"base_version": int, "edits": [{"start", "end", "text"}],
+    "length": int, "title": str, "task_group_id": int}. Retorna 409 se a
+    nota mudou desde `base_version` e 400 se o patch não puder ser aplicado
+    (o editor então reenvia o texto completo por /atualizar).
+    """
+    note = Note.query.get_or_404(id)
+
+    error = _check_note_edit_permission(note)
+    if error:
+        return error
+
+    payload = request.get_json(silent=True) or {}
+    base_version = payload.get('base_version')
+    if not isinstance(base_version, int):
+        return {'success': False, 'message': 'Versão base ausente.'}, 400
+
+    # As edições só fazem sentido sobre a versão em que foram calculadas
+    if base_version != note.version:
+        return _conflict_response(id)
+
+    try:
+        content = apply_edits(note.content, payload.get('edits', []), payload.get('length'))
+    except PatchError as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    title = payload.get('title') if isinstance(payload.get('title'), str) else ''
+    task_group_id = payload.get('task_group_id') if isinstance(payload.get('task_group_id'), int) else None
+
+    version = _save_note(note, content, title.strip(), task_group_id, base_version)
+    if version is None:
+        return _conflict_response(id)
+
+    return _saved_response(id, version)
+
+
 @app.route('/notas/<int:id>/deletar', methods=['POST'])
 @login_required
 def deletar_nota(id):
     """Deletar nota - autor ou admin podem deletar"""
     note = Note.query.get_or_404(id)
 
-    task_group = note.task_group
-    if task_group not in current_user.task_groups:
+    if note.task_group_id not in membership.group_ids():
         flash('Você não tem permissão para deletar esta nota.', 'danger')
         return redirect(url_for('notas'))
 
@@ -454,6 +766,155 @@ def deletar_nota(id):
     return redirect(url_for('notas', group_id=group_id))
 
 
+# ============= EVENTOS EM TEMPO REAL (SSE) =============
+
+def _live_versions(group_ids):
+    """
+    Versões dos grupos embutidas na página, comparadas pelo /eventos ao conectar.
+
+    None se o banco não tem as tabelas de versão (criado só com create_all):
+    a página não assina os eventos.
+    """
+    if not change_versions.is_installed():
+        return None
+    versions = change_versions.group_versions(sorted(group_ids))
+    return {str(group_id): version for group_id, version in versions.items()}
+
+
+@app.route('/eventos')
+@login_required
+def eventos():
+    """Assinatura (Server-Sent Events) das alterações nos grupos do usuário"""
+    # 204: o navegador não tenta reconectar
+    if not app.config['LIVE_EVENTS'] or not live_events.is_installed():
+        return '', 204
+
+    live = live_events.hub(app)
+    if not live.subscribe(app.config['LIVE_EVENTS_MAX_STREAMS']):
+        return 'Muitas conexões abertas. Tente novamente em alguns segundos.', 503, {'Retry-After': '30'}
+
+    try:
+        group_ids = membership.group_ids()
+        cursor = request.headers.get('Last-Event-ID', type=int)
+        if cursor is None:
+            cursor = request.args.get('after', type=int)
+        ready = None
+        if cursor is None:
+            # Conexão nova: o cursor é lido antes das versões, então nada escapa entre os dois
+            cursor = live.head
+            ready = {'versions': _live_versions(group_ids)}
+    except Exception:
+        live.unsubscribe()
+        raise
+
+    # O gerador não usa o contexto da requisição: a sessão do banco é
+    # liberada ao fim da view e a conexão fica só com a thread do stream
+    messages = live_events.stream(app, current_user.id, group_ids, cursor, ready,
+                                  duration=app.config['LIVE_EVENTS_STREAM_SECONDS'],
+                                  heartbeat=app.config['LIVE_EVENTS_HEARTBEAT'])
+    response = Response(ClosingIterator(messages, live.unsubscribe), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # proxy nginx: não acumular o stream
+    return response
+
+
+# ============= API JSON =============
+
+# Tarefas por página na listagem da API
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 500
+
+
+@app.route('/api/v1/tasks')
+@api_login_required
+@change_versions.conditional
+def api_tasks():
+    """
+    Lista as tarefas dos grupos do usuário, por data, paginadas por chave.
+
+    Filtros opcionais: group_id, user_id, from e to (AAAA-MM-DD, inclusivos);
+    `after` é o next_cursor da página anterior e `limit` o tamanho da página.
+    """
+    after = None
+    if request.args.get('after'):
+        after = decode_cursor(request.args.get('after'))
+        if not after:
+            return {'success': False, 'message': 'Cursor inválido.'}, 400
+
+    dates = {}
+    for param in ('from', 'to'):
+        if request.args.get(param):
+            dates[param] = parse_date(request.args.get(param))
+            if dates[param] is None:
+                return {'success': False, 'message': f'Data inválida em "{param}" (use AAAA-MM-DD).'}, 400
+
+    limit = min(max(request.args.get('limit', API_PAGE_SIZE, type=int), 1), API_MAX_PAGE_SIZE)
+    tarefas, next_cursor = task_list_page(
+        membership.group_ids(), request.args.get('group_id', type=int), request.args.get('user_id', type=int),
+        date_from=dates.get('from'), date_to=dates.get('to'), after=after, limit=limit)
+
+    return {
+        'success': True,
+        'tasks': [task_to_dict(tarefa) for tarefa in tarefas],
+        'next_cursor': next_cursor
+    }
+
+
+@app.route('/api/v1/tasks/batch', methods=['POST'])
+@api_login_required
+def api_tasks_batch():
+    """
+    Aplica um lote de operações (create/update/delete) em uma transação.
+
+    Corpo JSON: {"operations": [...], "atomic": bool}. Ver task_api.py. O
+    token CSRF vai no cabeçalho X-CSRFToken. Retorna um resultado por
+    operação; 422 se um lote atômico foi cancelado por erros.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return {'success': False, 'message': 'Corpo JSON inválido.'}, 400
+
+    try:
+        results, applied = apply_batch(payload.get('operations'), current_user, membership.group_ids(),
+                                       atomic=payload.get('atomic') is True)
+    except BatchError as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    body = {
+        'success': 'error' not in counts,
+        'applied': applied,
+        'counts': counts,
+        'results': results
+    }
+    return (body, 200) if applied else (body, 422)
+
+
+@app.route('/api/v1/sync')
+@api_login_required
+def api_sync():
+    """
+    Tarefas e notas alteradas ou removidas depois do cursor, nos grupos do usuário.
+
+    Sem `cursor`, devolve tudo desde o início. Cada resposta traz o cursor
+    da próxima chamada e `has_more`; com `reset`, o cliente descarta os
+    dados locais antes de aplicar a página. Ver delta_sync.py.
+    """
+    if not delta_sync.is_installed():
+        return {'success': False, 'message': 'Sincronização indisponível: execute as migrações do banco.'}, 503
+
+    limit = min(max(request.args.get('limit', delta_sync.SYNC_PAGE_SIZE, type=int), 1),
+                delta_sync.SYNC_MAX_PAGE_SIZE)
+    try:
+        page = delta_sync.sync_page(membership.group_ids(), request.args.get('cursor'), limit)
+    except delta_sync.CursorError as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    return {'success': True, **page}
+
+
 # ============= ROTAS DE ADMINISTRAÇÃO =============
 
 @app.route('/admin')
@@ -461,9 +922,12 @@ def deletar_nota(id):
 @admin_required
 def admin_dashboard():
     """Dashboard de administração"""
-    groups = TaskGroup.query.filter_by(admin_id=current_user.id).all()
-    users = User.query.filter_by(is_admin=False).all()
-    return render_template('admin/dashboard.html', groups=groups, users=users)
+    # Grupos e usuários paginados; as contagens de cada grupo vêm da mesma consulta
+    groups = admin_group_stats(current_user.id, page=request.args.get('groups_page', 1, type=int))
+
+    search = request.args.get('q', '').strip()
+    users = admin_user_page(search, page=request.args.get('page', 1, type=int))
+    return render_template('admin/dashboard.html', groups=groups, users=users, search=search)
 
 
 @app.route('/admin/groups/create', methods=['GET', 'POST'])
@@ -505,6 +969,8 @@ def admin_edit_group(id):
         group.name = form.name.data
         group.description = form.description.data
         db.session.commit()
+        # O nome do grupo faz parte do cache de grupos dos membros
+        membership.invalidate()
         flash(f'Grupo "{form.name.data}" atualizado com sucesso!', 'success')
         return redirect(url_for('admin_dashboard'))
 
@@ -532,66 +998,110 @@ def admin_delete_group(id):
     group_name = group.name
     db.session.delete(group)
     db.session.commit()
+    membership.invalidate()
     flash(f'Grupo "{group_name}" deletado com sucesso!', 'success')
     return redirect(url_for('admin_dashboard'))
 
 
+def _managed_group_or_none(id):
+    """Grupo administrado pelo usuário logado (404 se não existir, None se for de outro admin)."""
+    group = TaskGroup.query.get_or_404(id)
+    return group if group.admin_id == current_user.id else None
+
+
 @app.route('/admin/groups/<int:id>/members', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_group_members(id):
     """Gerenciar membros do grupo"""
-    group = TaskGroup.query.get_or_404(id)
+    group = _managed_group_or_none(id)
 
     # Verificar se o grupo pertence ao admin
-    if group.admin_id != current_user.id:
+    if group is None:
         flash('Você não tem permissão para gerenciar este grupo.', 'danger')
         return redirect(url_for('admin_dashboard'))
 
     form = ManageMemberForm()
 
-    # Listar membros atuais e usuários disponíveis
-    current_members = group.members.all()
-    all_users = User.query.all()  # Incluir todos os usuários, inclusive admins
-
-    if request.method == 'POST':
-        # Preencher choices dinamicamente antes da validação
-        action = request.form.get('action')
-        if action == 'add':
-            available_users = [u for u in all_users if u not in current_members]
-            form.user_id.choices = [(u.id, u.username) for u in available_users]
-        else:  # remove
-            form.user_id.choices = [(u.id, u.username) for u in current_members]
-
-        if form.validate_on_submit():
-            user = User.query.get(form.user_id.data)
-            if not user:
-                flash('Usuário não encontrado.', 'danger')
-                return redirect(url_for('admin_group_members', id=id))
-
-            if form.action.data == 'add':
-                if user not in current_members:
-                    group.members.append(user)
-                    db.session.commit()
-                    flash(f'Usuário "{user.username}" adicionado ao grupo.', 'success')
-                else:
-                    flash(f'Usuário "{user.username}" já está no grupo.', 'info')
-            elif form.action.data == 'remove':
-                if user in current_members:
-                    group.members.remove(user)
-                    db.session.commit()
-                    flash(f'Usuário "{user.username}" removido do grupo.', 'success')
-                else:
-                    flash(f'Usuário "{user.username}" não está no grupo.', 'info')
-
+    if form.validate_on_submit():
+        user_ids = set(form.user_id.data)
+        if len(user_ids) > MEMBER_BULK_LIMIT:
+            flash(f'Selecione no máximo {MEMBER_BULK_LIMIT} usuários por vez.', 'danger')
             return redirect(url_for('admin_group_members', id=id))
 
-    # Para GET, preparar choices para ambos os formulários
-    available_users = [u for u in all_users if u not in current_members]
+        # Operação em lote em uma única transação (INSERT ... SELECT / DELETE)
+        if form.action.data == 'add':
+            changed = add_members(group.id, user_ids)
+        else:
+            changed = remove_members(group.id, user_ids)
+        db.session.commit()
+
+        if changed:
+            membership.invalidate()
+        ignored = len(user_ids) - changed
+        if form.action.data == 'add':
+            flash(f'{changed} usuário(s) adicionado(s) ao grupo.', 'success' if changed else 'info')
+            if ignored:
+                flash(f'{ignored} usuário(s) ignorado(s): já são membros ou não existem.', 'info')
+        else:
+            flash(f'{changed} usuário(s) removido(s) do grupo.', 'success' if changed else 'info')
+            if ignored:
+                flash(f'{ignored} usuário(s) ignorado(s): não são membros do grupo.', 'info')
+        return redirect(url_for('admin_group_members', id=id, page=request.args.get('page')))
+
+    for errors in form.errors.values():
+        for error in errors:
+            flash(error, 'danger')
+
+    members = group_member_page(group.id, page=request.args.get('page', 1, type=int))
+    return render_template('admin/group_members.html', group=group, members=members, form=form)
 
-    return render_template('admin/group_members.html', group=group,
-                         current_members=current_members,
-                         available_users=available_users, form=form)
+
+@app.route('/admin/groups/<int:id>/members/search')
+@login_required
+@admin_required
+def admin_member_search(id):
+    """Busca (JSON) de usuários fora do grupo pelo início do nome, paginada por chave"""
+    group = _managed_group_or_none(id)
+    if group is None:
+        return {'success': False, 'message': 'Você não tem permissão para gerenciar este grupo.'}, 403
+
+    users, next_after = member_candidates(group.id, request.args.get('q', '').strip(),
+                                          after=request.args.get('after') or None)
+    return {
+        'success': True,
+        'users': [{'id': user_id, 'username': username} for user_id, username in users],
+        'next_after': next_after
+    }
+
+
+@app.route('/admin/groups/<int:id>/export')
+@login_required
+@admin_required
+def admin_export_group(id):
+    """
+    Exporta as tarefas ou notas do grupo (what=tasks|notes) em CSV ou JSON lines.
+
+    A resposta é gerada em fluxo, bloco a bloco, a partir do cursor do
+    banco; gzip=1 comprime a saída enquanto é enviada.
+    """
+    group = _managed_group_or_none(id)
+    if group is None:
+        flash('Você não tem permissão para exportar este grupo.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    kind = request.args.get('what', 'tasks')
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip') == '1'
+    try:
+        chunks = export.export_chunks(kind, group.id, fmt, compress)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    filename = export.filename(kind, group.id, fmt, compress)
+    return Response(stream_with_context(chunks), content_type=export.content_type(fmt, compress),
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 
 @app.route('/admin/users/create', methods=['GET', 'POST'])
@@ -606,18 +1116,54 @@ def admin_create_user():
         user.set_password(form.password.data)
         db.session.add(user)
         db.session.commit()
+        # O SQLite pode reutilizar o id de um usuário removido
+        user_cache.invalidate()
         flash(f'Usuário "{form.username.data}" criado com sucesso!', 'success')
         return redirect(url_for('admin_dashboard'))
 
     return render_template('admin/create_user.html', form=form)
 
 
+@app.route('/admin/consultas-lentas')
+@login_required
+@admin_required
+def admin_slow_queries():
+    """Consultas lentas de todos os workers, agrupadas pela forma do SQL"""
+    entries = slow_queries.collect(app) if app.config['SLOW_QUERY_LOG'] else []
+    return render_template('admin/slow_queries.html', entries=entries, form=DeleteForm(),
+                           enabled=app.config['SLOW_QUERY_LOG'], threshold_ms=app.config['SLOW_QUERY_MS'])
+
+
+@app.route('/admin/consultas-lentas/limpar', methods=['POST'])
+@login_required
+@admin_required
+def admin_clear_slow_queries():
+    form = DeleteForm()
+    if form.validate_on_submit() and app.config['SLOW_QUERY_LOG']:
+        slow_queries.clear(app)
+        flash('Registro de consultas lentas limpo.', 'success')
+    return redirect(url_for('admin_slow_queries'))
+
+
+@app.route('/metrics')
+@login_required
+@admin_required
+def admin_metrics():
+    """Histogramas por rota somados de todos os workers (Prometheus ou ?format=json)"""
+    if not app.config['METRICS']:
+        abort(404)
+    collected = metrics.collect(app)
+    if request.args.get('format') == 'json':
+        return collected
+    return Response(metrics.prometheus(collected), mimetype='text/plain; version=0.0.4')
+
+
 # ============= INICIALIZAÇÃO =============
 
 def init_db():
-    """Cria as tabelas do banco de dados"""
+    """Cria/atualiza as tabelas do banco de dados (migrações pendentes)"""
     with app.app_context():
-        db.create_all()
+        upgrade_schema(db.engine)
         print("Banco de dados inicializado!")
 
 
@@ -0,0 +1 @@
+"""Scripts de verificação de desempenho (contagem de consultas, latência)."""
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Verifica que o painel de administração (rota /admin) tem custo constante.
+
+Popula o banco com 20 e depois com 2.000 grupos (com membros, tarefas e
+notas) e muitos usuários, e confere que o número de instruções SQL da
+página e da busca de usuários não cresce com o volume.
+
+Execute: python -m benchmarks.admin_dashboard
+"""
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.support import load_app, count_queries, login
+
+# Limite de instruções SQL aceitas para renderizar o painel
+MAX_QUERIES = 6
+
+
+def seed(db, n_groups, n_users):
+    from models import User, TaskGroup, Tarefa, Note, user_taskgroup
+
+    admin = User(username='admin', is_admin=True)
+    admin.set_password('benchmark')
+    db.session.add(admin)
+    users = [User(username=f'user{i:05d}', password_hash=admin.password_hash) for i in range(n_users)]
+    db.session.add_all(users)
+    db.session.flush()
+
+    groups = [TaskGroup(name=f'Grupo {i:05d}', admin_id=admin.id) for i in range(n_groups)]
+    db.session.add_all(groups)
+    db.session.flush()
+
+    db.session.execute(user_taskgroup.insert(), [
+        {'user_id': users[(g * 7 + k) % n_users].id, 'taskgroup_id': group.id}
+        for g, group in enumerate(groups) for k in range(5)
+    ])
+    now = datetime(2026, 1, 1)
+    db.session.add_all([
+        Tarefa(data=date(2026, 1, 1) + timedelta(days=i % 365), descricao=f'Tarefa {i}',
+               created_at=now + timedelta(minutes=i),
+               user_id=users[i % n_users].id, task_group_id=groups[i % n_groups].id)
+        for i in range(n_groups * 10)
+    ])
+    db.session.add_all([
+        Note(title=f'Nota {i}', content='', user_id=users[i % n_users].id,
+             task_group_id=groups[i % n_groups].id)
+        for i in range(n_groups * 2)
+    ])
+    db.session.commit()
+
+
+def measure(n_groups, n_users):
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(db, n_groups, n_users)
+        engine = db.engine
+
+    client = app.test_client()
+    login(client, 'admin', 'benchmark')
+    client.get('/admin')  # aquece os caches de usuário
+
+    results = {}
+    for name, url in (('painel', '/admin'), ('busca', '/admin?q=user0001&page=2'),
+                      ('última página', '/admin?groups_page=100&page=100')):
+        started = time.perf_counter()
+        with count_queries(engine) as counter:
+            response = client.get(url)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise RuntimeError(f'GET {url} retornou HTTP {response.status_code}')
+        results[name] = (counter.count, elapsed)
+    return results
+
+
+def main():
+    small = measure(n_groups=20, n_users=50)
+    large = measure(n_groups=2000, n_users=5000)
+
+    failures = 0
+    for name in small:
+        (small_count, small_ms), (large_count, large_ms) = small[name], large[name]
+        ok = small_count == large_count and large_count <= MAX_QUERIES
+        failures += not ok
+        print(f"{'✓' if ok else '✗'} {name}: {small_count} consultas ({small_ms:.0f} ms) com 20 grupos, "
+              f'{large_count} consultas ({large_ms:.0f} ms) com 2.000 grupos')
+
+    if failures:
+        print(f'✗ O painel deve executar no máximo {MAX_QUERIES} consultas, '
+              f'independentemente do volume', file=sys.stderr)
+        sys.exit(1)
+    print('✓ Número de consultas constante')
+
+
+if __name__ == '__main__':
+    main()
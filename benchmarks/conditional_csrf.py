@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Confere que o GET condicional não devolve páginas com o token CSRF de outra sessão.
+
+As páginas cobertas pelo ETag (tarefas, notas, busca) embutem o token CSRF
+da sessão. O navegador guarda a página e o ETag mesmo quando a sessão
+expira ou o usuário sai e entra de novo; se a nova sessão recebesse 304,
+os formulários da página antiga seriam recusados (400). O roteiro:
+
+1. entra, abre a página de tarefas e guarda o ETag e o token;
+2. abre a página de novo com If-None-Match na mesma sessão (deve ser 304);
+3. entra em uma sessão nova e abre a página com o ETag guardado: deve vir
+   200 com outro token (um 304 reaproveitaria o token antigo);
+4. cria uma tarefa com o token da página que o navegador exibiria.
+
+Execute: python -m benchmarks.conditional_csrf
+"""
+import re
+import sys
+
+from benchmarks.support import load_app
+
+_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def csrf_token(html):
+    match = _TOKEN.search(html)
+    if match is None:
+        raise RuntimeError('Token CSRF não encontrado na página')
+    return match.group(1)
+
+
+def login(client, username, password):
+    token = csrf_token(client.get('/login').get_data(as_text=True))
+    response = client.post('/login', data={'username': username, 'password': password, 'csrf_token': token})
+    if response.status_code != 302:
+        raise RuntimeError(f'Login de "{username}" falhou (HTTP {response.status_code})')
+
+
+def main():
+    app = load_app()
+    app.config['WTF_CSRF_ENABLED'] = True
+    from models import db, User, TaskGroup, Tarefa
+    from migrations import upgrade
+
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+        user = User(username='ana', is_admin=False)
+        user.set_password('benchmark')
+        db.session.add(user)
+        db.session.flush()
+        group = TaskGroup(name='Casa', admin_id=user.id)
+        group.members.append(user)
+        db.session.add(group)
+        db.session.commit()
+        group_id = group.id
+
+    failed = False
+
+    def check(ok, message):
+        nonlocal failed
+        failed = failed or not ok
+        print(f"{'✓' if ok else '✗'} {message}")
+
+    first = app.test_client()
+    login(first, 'ana', 'benchmark')
+    page = first.get('/')
+    etag = page.headers.get('ETag')
+    check(page.status_code == 200 and etag is not None, f'página de tarefas com ETag (HTTP {page.status_code})')
+    cached_html = page.get_data(as_text=True)
+    again = first.get('/', headers={'If-None-Match': etag})
+    check(again.status_code == 304, f'mesma sessão revalida com 304 (HTTP {again.status_code})')
+
+    # Sessão nova (expirada, ou saída e nova entrada): o navegador ainda tem a página e o ETag
+    second = app.test_client()
+    login(second, 'ana', 'benchmark')
+    page = second.get('/', headers={'If-None-Match': etag})
+    check(page.status_code == 200, f'sessão nova recebe a página de novo (HTTP {page.status_code})')
+    html = cached_html if page.status_code == 304 else page.get_data(as_text=True)
+
+    response = second.post('/adicionar', data={'data': '2026-03-01', 'descricao': 'Depois do novo login',
+                                               'task_group_id': group_id, 'csrf_token': csrf_token(html)})
+    with app.app_context():
+        created = Tarefa.query.filter_by(descricao='Depois do novo login').count()
+    check(response.status_code == 302 and created == 1,
+          f'formulário da página enviado na sessão nova (HTTP {response.status_code}, {created} tarefa criada)')
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
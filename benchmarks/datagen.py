@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Gerador de dados sintéticos para os benchmarks.
+
+Cria usuários, grupos, participações, tarefas e notas com a distribuição
+desigual de um uso real (lei de potência): poucos usuários participam de
+muitos grupos e escrevem a maior parte do conteúdo, poucos grupos
+concentram membros, tarefas e notas, as datas se acumulam em torno do mês
+atual e o tamanho das notas varia de um parágrafo a textos longos.
+
+O gerador é determinístico para a mesma semente. Os dados entram por
+INSERTs em lote, disparando os triggers das migrações (busca, versões,
+eventos, sincronização) como as escritas da aplicação.
+
+Todos os usuários têm a senha PASSWORD; o usuário 'admin' é administrador
+e 'user00000' é o mais ativo (membro dos maiores grupos).
+
+Execute: python -m benchmarks.datagen --db /tmp/agenda.db --users 200 --groups 50 --tasks 20000 --notes 2000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.support import load_app
+
+PASSWORD = 'benchmark'
+
+# Expoente da lei de potência (maior = mais concentrado nos primeiros)
+SKEW = 1.1
+
+# Quantidade padrão de cada entidade
+DEFAULTS = {'users': 200, 'groups': 50, 'memberships': 4, 'tasks': 20000, 'notes': 2000}
+
+_BATCH = 5000
+
+_WORDS = ('reunião revisar enviar relatório cliente orçamento entrega ligar agendar '
+          'conferir pagamento contrato equipe projeto planilha apresentação visita '
+          'pedido estoque fornecedor treinamento backup servidor documentação').split()
+
+
+def _weights(n, skew):
+    """Pesos 1/posição^skew: o primeiro é o mais frequente."""
+    return [1.0 / (rank + 1) ** skew for rank in range(n)]
+
+
+def _weighted_sample(rng, population, weights, k):
+    """k elementos distintos, com probabilidade proporcional ao peso (Efraimidis–Spirakis)."""
+    keys = [(rng.random() ** (1.0 / weight), item) for item, weight in zip(population, weights)]
+    keys.sort(reverse=True)
+    return [item for _, item in keys[:k]]
+
+
+def _text(rng, n_words):
+    return ' '.join(rng.choice(_WORDS) for _ in range(n_words))
+
+
+def _insert(db, table, rows):
+    for start in range(0, len(rows), _BATCH):
+        db.session.execute(table.insert(), rows[start:start + _BATCH])
+
+
+def generate(db, users=DEFAULTS['users'], groups=DEFAULTS['groups'], memberships=DEFAULTS['memberships'],
+             tasks=DEFAULTS['tasks'], notes=DEFAULTS['notes'], skew=SKEW, seed=42, today=None):
+    """
+    Popula o banco (já com o esquema criado) e retorna um resumo.
+
+    `memberships` é o número médio de grupos por usuário. O resumo traz
+    as quantidades geradas e os ids usados pelos benchmarks: o usuário
+    mais ativo, o maior grupo dele e uma nota de sua autoria.
+    """
+    from models import User, TaskGroup, Tarefa, Note, user_taskgroup
+
+    rng = random.Random(seed)
+    today = today or date.today()
+    now = datetime.combine(today, datetime.min.time())
+
+    admin = User(username='admin', is_admin=True)
+    admin.set_password(PASSWORD)
+    db.session.add(admin)
+    db.session.flush()
+
+    # Um hash só para todos: o Argon2 é caro de propósito
+    _insert(db, User.__table__, [
+        {'username': f'user{i:05d}', 'password_hash': admin.password_hash, 'is_admin': False,
+         'created_at': now - timedelta(days=users - i)}
+        for i in range(users)
+    ])
+    user_ids = [row.id for row in db.session.query(User.id).filter(User.id != admin.id).order_by(User.id)]
+    user_weights = _weights(users, skew)
+
+    _insert(db, TaskGroup.__table__, [
+        {'name': f'Grupo {i:04d}', 'description': _text(rng, 6), 'admin_id': admin.id,
+         'created_at': now - timedelta(days=groups - i)}
+        for i in range(groups)
+    ])
+    group_ids = [row.id for row in db.session.query(TaskGroup.id).order_by(TaskGroup.id)]
+    group_weights = _weights(groups, skew)
+
+    # Usuários ativos entram em mais grupos, e os grupos populares recebem mais membros
+    mean_weight = sum(user_weights) / users
+    members = {group_id: [] for group_id in group_ids}
+    member_rows = []
+    for user_id, weight in zip(user_ids, user_weights):
+        k = max(1, min(groups, round(memberships * weight / mean_weight)))
+        for group_id in _weighted_sample(rng, group_ids, group_weights, k):
+            members[group_id].append(user_id)
+            member_rows.append({'user_id': user_id, 'taskgroup_id': group_id})
+    _insert(db, user_taskgroup, member_rows)
+
+    # Grupo sem membros sorteados fica com o usuário mais ativo
+    for group_id, group_members in members.items():
+        if not group_members:
+            group_members.append(user_ids[0])
+            _insert(db, user_taskgroup, [{'user_id': user_ids[0], 'taskgroup_id': group_id}])
+    weight_of = dict(zip(user_ids, user_weights))
+
+    def author(group_id):
+        group_members = members[group_id]
+        return rng.choices(group_members, [weight_of[user_id] for user_id in group_members])[0]
+
+    task_groups = rng.choices(group_ids, group_weights, k=tasks)
+    task_rows = []
+    for i, group_id in enumerate(task_groups):
+        # Concentradas em torno do mês atual, com cauda para o passado e o futuro
+        offset = int(rng.gauss(0, 45)) if rng.random() < 0.8 else rng.randint(-730, 365)
+        created = now - timedelta(minutes=(tasks - i) * 7)
+        task_rows.append({'data': today + timedelta(days=offset), 'descricao': _text(rng, rng.randint(3, 20)),
+                          'created_at': created, 'user_id': author(group_id), 'task_group_id': group_id})
+    _insert(db, Tarefa.__table__, task_rows)
+
+    note_groups = rng.choices(group_ids, group_weights, k=notes)
+    note_rows = []
+    for i, group_id in enumerate(note_groups):
+        # Tamanho log-normal: mediana de ~150 palavras, algumas com milhares
+        n_words = min(20000, int(rng.lognormvariate(5, 1)))
+        created = now - timedelta(hours=(notes - i) * 3)
+        note_rows.append({'title': _text(rng, 3).capitalize(), 'content': _text(rng, n_words),
+                          'created_at': created, 'updated_at': created + timedelta(minutes=rng.randint(0, 600)),
+                          'user_id': author(group_id), 'task_group_id': group_id, 'version': 1})
+    _insert(db, Note.__table__, note_rows)
+    db.session.commit()
+
+    heavy_user = user_ids[0]
+    heavy_group = next(group_id for group_id in group_ids if heavy_user in members[group_id])
+    note_id = db.session.query(Note.id).filter(Note.user_id == heavy_user).order_by(Note.id).limit(1).scalar()
+    if note_id is None:
+        note = Note(title='Nota do benchmark', content=_text(rng, 150), user_id=heavy_user,
+                    task_group_id=heavy_group)
+        db.session.add(note)
+        db.session.commit()
+        note_id = note.id
+
+    return {
+        'users': users + 1,
+        'groups': groups,
+        'memberships': len(member_rows),
+        'tasks': tasks,
+        'notes': notes,
+        'skew': skew,
+        'seed': seed,
+        'heavy_user': 'user00000',
+        'heavy_user_groups': sum(1 for group_members in members.values() if heavy_user in group_members),
+        'group_id': heavy_group,
+        'note_id': note_id,
+    }
+
+
+def add_arguments(parser):
+    """Opções de tamanho do conjunto de dados, compartilhadas pelos benchmarks."""
+    parser.add_argument('--users', type=int, default=DEFAULTS['users'], help='usuários (além do admin)')
+    parser.add_argument('--groups', type=int, default=DEFAULTS['groups'], help='grupos')
+    parser.add_argument('--memberships', type=float, default=DEFAULTS['memberships'],
+                        help='média de grupos por usuário')
+    parser.add_argument('--tasks', type=int, default=DEFAULTS['tasks'], help='tarefas')
+    parser.add_argument('--notes', type=int, default=DEFAULTS['notes'], help='notas')
+    parser.add_argument('--skew', type=float, default=SKEW, help='expoente da lei de potência')
+    parser.add_argument('--seed', type=int, default=42, help='semente do gerador')
+
+
+def generate_from_args(db, args):
+    return generate(db, users=args.users, groups=args.groups, memberships=args.memberships,
+                    tasks=args.tasks, notes=args.notes, skew=args.skew, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db', required=True, help='arquivo SQLite a criar (não pode existir)')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        raise SystemExit(f'✗ {args.db} já existe')
+
+    app = load_app(os.path.abspath(args.db))
+    from models import db
+    from migrations import upgrade
+
+    started = time.perf_counter()
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+        summary = generate_from_args(db, args)
+    elapsed = time.perf_counter() - started
+
+    print(f"✓ {summary['users']} usuários, {summary['groups']} grupos, {summary['memberships']} participações, "
+          f"{summary['tasks']} tarefas e {summary['notes']} notas em {elapsed:.1f}s")
+    print(f"  senha de todos: {PASSWORD}; usuário mais ativo: {summary['heavy_user']} "
+          f"({summary['heavy_user_groups']} grupos)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Confere que a API, o formulário e a importação CSV aceitam as mesmas datas.
+
+Só AAAA-MM-DD é aceito. Outras formas da ISO 8601 (20260301, 2026-W10-1,
+2026-060, com hora) são recusadas pelo TaskForm e têm de ser recusadas
+também por task_api.parse_date (API JSON) e pela importação de CSV, que
+valida com task_api.validate_fields.
+
+Execute: python -m benchmarks.date_validation
+"""
+import sys
+
+from benchmarks.support import load_app
+
+ACCEPTED = ['2026-03-01', '2024-02-29']
+REJECTED = ['20260301', '2026-W10-1', '2026-W10', '2026-060', '2026-03-01T10:00',
+            '2026-03-01 10:00', '2026-02-30', '01/03/2026', '']
+
+
+def form_accepts(app, value):
+    from forms import TaskForm
+
+    with app.test_request_context(method='POST', data={'data': value}):
+        form = TaskForm(meta={'csrf': False})
+        return form.data.validate(form)
+
+
+def import_accepts(value, group_id):
+    from task_import import import_tasks
+
+    lines = ['data,descricao\n', f'{value},Tarefa importada\n']
+    report = import_tasks(lines, 'csv', user_id=1, group_ids={group_id}, default_group_id=group_id, dry_run=True)
+    return report.imported == 1
+
+
+def main():
+    app = load_app()
+    from task_api import parse_date
+
+    failed = False
+    with app.app_context():
+        for value in ACCEPTED + REJECTED:
+            expected = value in ACCEPTED
+            results = {'formulário': form_accepts(app, value),
+                       'API': parse_date(value) is not None,
+                       'importação': import_accepts(value, 1)}
+            ok = all(result == expected for result in results.values())
+            failed = failed or not ok
+            verdicts = ', '.join(f"{name} {'aceita' if result else 'recusa'}" for name, result in results.items())
+            print(f"{'✓' if ok else '✗'} {value!r:<20} {'aceita' if expected else 'recusada'}: {verdicts}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
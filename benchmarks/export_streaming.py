@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Verifica que a exportação de um grupo usa memória constante.
+
+Carrega um grupo pequeno e outro grande e mede, com tracemalloc, o pico
+de memória alocada enquanto a exportação é consumida (como faz a rota,
+bloco a bloco) em cada formato. O pico do grupo grande não pode crescer
+com o número de linhas.
+
+Execute: python -m benchmarks.export_streaming --rows 200000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from benchmarks.support import load_app
+
+# Pico do grupo grande aceito, relativo ao do grupo pequeno
+MAX_PEAK_RATIO = 1.5
+
+
+def load(db, group_sizes):
+    """Cria um grupo por tamanho, com tarefas e notas (10%); retorna os ids."""
+    from sqlalchemy import insert
+    from models import User, TaskGroup, Tarefa, Note
+
+    user = User(username='export', password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+
+    group_ids = []
+    now = datetime(2026, 1, 1)
+    for size in group_sizes:
+        group = TaskGroup(name=f'Grupo {size}', admin_id=user.id)
+        db.session.add(group)
+        db.session.flush()
+        group_ids.append(group.id)
+        for offset in range(0, size, 20000):
+            db.session.execute(insert(Tarefa), [
+                {'data': date(2020, 1, 1) + timedelta(days=i % 2000),
+                 'descricao': f'Tarefa {i}: reunião com o cliente, "pauta", revisão', 'created_at': now,
+                 'user_id': user.id, 'task_group_id': group.id}
+                for i in range(offset, min(offset + 20000, size))])
+        db.session.execute(insert(Note), [
+            {'title': f'Nota {i}', 'content': 'Conteúdo da nota. ' * 200, 'created_at': now,
+             'updated_at': now, 'version': 1, 'user_id': user.id, 'task_group_id': group.id}
+            for i in range(size // 10)])
+    db.session.commit()
+    return group_ids
+
+
+def measure(db, kind, group_id, fmt, compress):
+    """Consome a exportação e retorna (bytes gerados, pico de memória em bytes, segundos)."""
+    import export
+
+    db.session.rollback()
+    tracemalloc.start()
+    started = time.perf_counter()
+    total = 0
+    for chunk in export.export_chunks(kind, group_id, fmt, compress):
+        total += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=200000, help='tarefas do grupo grande')
+    args = parser.parse_args()
+
+    app = load_app()
+    from models import db
+    from migrations import upgrade
+
+    small_rows = max(args.rows // 20, 1000)
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+        small, large = load(db, [small_rows, args.rows])
+
+        failures = 0
+        for kind in ('tasks', 'notes'):
+            for fmt, compress in (('csv', False), ('jsonl', False), ('csv', True)):
+                _, small_peak, _ = measure(db, kind, small, fmt, compress)
+                size, large_peak, elapsed = measure(db, kind, large, fmt, compress)
+                ok = large_peak <= small_peak * MAX_PEAK_RATIO
+                failures += not ok
+                label = f"{kind} {fmt}{' gzip' if compress else ''}"
+                print(f"{'✓' if ok else '✗'} {label:<16} {size / 1e6:7.1f} MB em {elapsed:.1f}s, "
+                      f"pico {small_peak / 1e6:.1f} MB ({small_rows} tarefas) / "
+                      f"{large_peak / 1e6:.1f} MB ({args.rows} tarefas)")
+
+    if failures:
+        print(f'✗ {failures} exportação(ões) com memória crescendo com o tamanho do grupo', file=sys.stderr)
+        sys.exit(1)
+    print('✓ Memória da exportação independente do tamanho do grupo')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Confere que os blocos de mês em cache são compartilhados entre usuários.
+
+Dois membros do mesmo grupo abrem a linha do tempo (e um mês anterior via
+/tarefas/mes): o segundo deve reaproveitar os blocos renderizados para o
+primeiro, sem novas entradas no cache, e cada um deve ver "Você" só nas
+próprias tarefas e o nome do outro nas demais.
+
+Execute: python -m benchmarks.fragment_sharing
+"""
+import re
+import sys
+from datetime import date
+
+from benchmarks.support import load_app, login
+
+_AUTHOR = re.compile(r'<td class="task-author" data-user-id="\d+">(.*?)</td>')
+
+
+def seed(db):
+    from models import User, TaskGroup, Tarefa
+
+    users = []
+    for username in ('ana', 'bruno'):
+        user = User(username=username, is_admin=False)
+        user.set_password('benchmark')
+        users.append(user)
+    db.session.add_all(users)
+    db.session.flush()
+    group = TaskGroup(name='Casa', admin_id=users[0].id)
+    group.members.extend(users)
+    db.session.add(group)
+    db.session.flush()
+    today = date.today()
+    previous = date(today.year - 1, 12, 1) if today.month == 1 else date(today.year, today.month - 1, 1)
+    db.session.add_all([Tarefa(data=day.replace(day=1 + i), descricao=f'Tarefa {i}', user_id=users[i % 2].id,
+                               task_group_id=group.id)
+                        for day in (today, previous) for i in range(4)])
+    db.session.commit()
+    return previous
+
+
+def authors(html):
+    return sorted(_AUTHOR.findall(html))
+
+
+def main():
+    app = load_app()
+    from models import db
+    from migrations import upgrade
+    import fragment_cache
+
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+        previous = seed(db)
+    month = f'{previous.year:04d}-{previous.month:02d}'
+
+    failed = False
+
+    def check(ok, message):
+        nonlocal failed
+        failed = failed or not ok
+        print(f"{'✓' if ok else '✗'} {message}")
+
+    entries = []
+    for username, other in (('ana', 'bruno'), ('bruno', 'ana')):
+        client = app.test_client()
+        login(client, username, 'benchmark')
+        page = client.get('/').get_data(as_text=True)
+        block = client.get(f'/tarefas/mes?mes={month}').get_json()['html']
+        entries.append(len(fragment_cache._memory))
+        expected = sorted(['<strong>Você</strong>'] * 2 + [other] * 2)
+        check(authors(page) == expected and authors(block) == expected,
+              f'{username}: "Você" nas próprias tarefas e "{other}" nas demais')
+
+    check(entries[0] == 2 and entries[1] == 2,
+          f'blocos compartilhados: {entries[0]} entradas após o 1º usuário, {entries[1]} após o 2º')
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
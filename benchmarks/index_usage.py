@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Confere, via EXPLAIN QUERY PLAN, que as consultas das páginas usam os índices.
+
+Cria um banco pelas migrações, popula com dados sintéticos, executa as
+consultas reais de queries.py capturando o SQL enviado ao SQLite e
+verifica o plano de cada uma.
+
+Execute: python -m benchmarks.index_usage
+"""
+import sys
+from datetime import date, timedelta
+
+from benchmarks.support import load_app
+
+# Consulta -> índices aceitos no plano (basta um deles aparecer)
+EXPECTED_INDEXES = {
+    'linha do tempo (mês)': {'ix_tarefas_group_data'},
+    'linha do tempo (filtro de autor)': {'ix_tarefas_user_data', 'ix_tarefas_group_data'},
+    'cabeçalhos dos meses': {'ix_tarefas_group_data'},
+    'lista de notas': {'ix_notes_group_updated'},
+    'membros do grupo': {'ix_user_taskgroup_taskgroup'},
+    'painel de administração': {'ix_task_groups_admin'},
+    'token do feed .ics': {'ix_users_feed_token'},
+    'sincronização incremental': {'ix_sync_revisions_group'},
+}
+
+
+def seed(db):
+    from models import User, TaskGroup, Tarefa, Note
+
+    admin = User(username='admin', is_admin=True, password_hash='-')
+    db.session.add(admin)
+    users = [User(username=f'user{i:03d}', password_hash='-') for i in range(50)]
+    db.session.add_all(users)
+    db.session.flush()
+
+    groups = [TaskGroup(name=f'Grupo {i}', admin_id=admin.id) for i in range(20)]
+    db.session.add_all(groups)
+    db.session.flush()
+    for i, user in enumerate(users):
+        groups[i % len(groups)].members.append(user)
+
+    start = date(2022, 1, 1)
+    db.session.add_all([
+        Tarefa(data=start + timedelta(days=i % 1000), descricao=f'Tarefa {i}',
+               user_id=users[i % len(users)].id, task_group_id=groups[i % len(groups)].id)
+        for i in range(5000)
+    ])
+    db.session.add_all([
+        Note(title=f'Nota {i}', content='', user_id=users[i % len(users)].id,
+             task_group_id=groups[i % len(groups)].id)
+        for i in range(1000)
+    ])
+    db.session.commit()
+    return groups, users
+
+
+def capture(engine, run):
+    """Executa `run()` e retorna as instruções SELECT (sql, parâmetros) enviadas."""
+    from sqlalchemy import event
+
+    captured = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        run()
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    return captured
+
+
+def query_plan(engine, statement, parameters):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    return [row[-1] for row in rows]
+
+
+def main():
+    app = load_app()
+    from models import db
+    from migrations import upgrade
+    import queries
+    import ics_feed
+    import delta_sync
+
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+        groups, users = seed(db)
+        engine = db.engine
+        group_ids = [group.id for group in groups[:5]]
+        group_id = groups[0].id
+        user_id = users[0].id
+        admin_id = groups[0].admin_id
+
+        checks = {
+            'linha do tempo (mês)': lambda: queries.timeline_page(group_ids, 2023, 6),
+            'linha do tempo (filtro de autor)': lambda: queries.timeline_page(
+                group_ids, 2023, 6, selected_user_id=user_id),
+            'cabeçalhos dos meses': lambda: queries.month_summary(group_ids),
+            'lista de notas': lambda: queries.notes_sidebar_query(group_ids).all(),
+            'membros do grupo': lambda: queries.member_directory([group_id]),
+            'painel de administração': lambda: queries.admin_group_stats(admin_id),
+            'token do feed .ics': lambda: ics_feed.user_for_token('token-inexistente'),
+            'sincronização incremental': lambda: delta_sync.sync_page(group_ids, limit=100),
+        }
+
+        failures = 0
+        for name, run in checks.items():
+            db.session.expunge_all()
+            statements = capture(engine, run)
+            plan = [line for statement, params in statements
+                    for line in query_plan(engine, statement, params)]
+
+            used = {index for index in EXPECTED_INDEXES[name] if any(index in line for line in plan)}
+            ok = bool(used)
+            failures += not ok
+
+            print(f"{'✓' if ok else '✗'} {name}")
+            for line in plan:
+                print(f'    {line}')
+
+    if failures:
+        print(f'✗ {failures} consulta(s) sem o índice esperado', file=sys.stderr)
+        sys.exit(1)
+    print('✓ Todas as consultas usam os índices esperados')
+
+
+if __name__ == '__main__':
+    main()
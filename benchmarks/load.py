@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Teste de carga com o gunicorn: vários workers compartilhando um arquivo SQLite.
+
+Popula um banco temporário com o gerador de dados sintéticos
+(benchmarks/datagen.py), sobe a aplicação no gunicorn em localhost (com os
+mesmos workers e threads do Dockerfile, configuráveis) e simula usuários
+logados em etapas de concorrência crescente. Cada usuário virtual é:
+
+- um leitor, que navega pelas páginas segundo o --mix (lista de tarefas,
+  notas, meses da linha do tempo, novas tarefas) com uma pausa aleatória
+  média de --think segundos entre os cliques; ou
+- um editor (fração --editors), com uma nota aberta que o autosave grava
+  a cada --autosave segundos, como o editor de notas.
+
+Por etapa relata vazão, latência p50/p95/p99 por rota, taxa de erros e
+ocorrências de "database is locked" no log do gunicorn, e falha se algum
+erro passar de --max-error-rate ou se o banco travar. O resultado pode
+ser gravado em JSON (--json) para comparar execuções.
+
+Execute: python -m benchmarks.load --workers 4 --threads 16 --concurrency 4,8,16,32 --duration 20
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from urllib.parse import urlencode
+
+from benchmarks import datagen
+from benchmarks.support import ROOT, load_app
+
+# Peso de cada página na navegação dos leitores
+DEFAULT_MIX = 'index=40,notas=20,tarefas_mes=25,adicionar=15'
+
+# Status esperado de cada rota (qualquer outro conta como erro)
+EXPECTED_STATUS = {'index': 200, 'notas': 200, 'tarefas_mes': 200, 'adicionar': 302, 'autosave': 200,
+                   'login': 302}
+
+_CSRF = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"|value="([^"]+)"[^>]*name="csrf_token"')
+
+_LOCKED = 'database is locked'
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def parse_mix(value):
+    """'index=40,notas=20' -> {'index': 40.0, 'notas': 20.0}."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in EXPECTED_STATUS or name in ('autosave', 'login'):
+            raise argparse.ArgumentTypeError(f'rota desconhecida no mix: {name}')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'peso inválido para {name}: {weight!r}')
+    return mix
+
+
+class Session:
+    """Conexão HTTP persistente com os cookies de um usuário (sem seguir redirecionamentos)."""
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self.cookies = {}
+        self.csrf_token = None
+
+    def request(self, method, path, form=None):
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        for attempt in (1, 2):
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # O gunicorn fecha conexões ociosas (keep-alive de 2s): como o
+                # navegador, tenta de novo uma vez numa conexão nova
+                self.connection.close()
+                if attempt == 2:
+                    raise
+            except (http.client.HTTPException, OSError):
+                self.connection.close()  # a próxima requisição reconecta
+                raise
+        for cookie in response.headers.get_all('Set-Cookie') or []:
+            name, _, value = cookie.split(';', 1)[0].partition('=')
+            self.cookies[name.strip()] = value
+        return response, data
+
+    def close(self):
+        self.connection.close()
+
+
+def login(port, username, retries=20):
+    """Sessão logada; espera e repete se o pool de senhas recusar (503)."""
+    session = Session(port)
+    for _ in range(retries):
+        _, page = session.request('GET', '/login')
+        match = _CSRF.search(page.decode())
+        session.csrf_token = match.group(1) or match.group(2)
+        started = time.perf_counter()
+        response, _ = session.request('POST', '/login', {'csrf_token': session.csrf_token, 'username': username,
+                                                         'password': datagen.PASSWORD})
+        elapsed = time.perf_counter() - started
+        if response.status == 302:
+            return session, elapsed
+        if response.status != 503:
+            raise RuntimeError(f'Login de "{username}" falhou (HTTP {response.status})')
+        time.sleep(float(response.getheader('Retry-After') or 1))
+    raise RuntimeError(f'Login de "{username}" recusado {retries} vezes (pool de senhas saturado)')
+
+
+def seed(db_path, args, n_virtual):
+    """Banco com os dados sintéticos; retorna os usuários virtuais (nome, grupos, nota própria)."""
+    app = load_app(db_path)
+    from models import db, User, Note, user_taskgroup
+    from migrations import upgrade
+
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+        dataset = datagen.generate_from_args(db, args)
+
+        users = User.query.filter(User.username != 'admin').order_by(User.id).limit(n_virtual).all()
+        virtual = []
+        for i in range(n_virtual):
+            user = users[i % len(users)]
+            group_ids = [row.taskgroup_id for row in db.session.execute(
+                user_taskgroup.select().where(user_taskgroup.c.user_id == user.id))]
+            # Cada editor tem sua própria nota: conflitos de versão não são o que se mede aqui
+            note = Note(title=f'Carga {i}', content='', user_id=user.id, task_group_id=group_ids[0])
+            db.session.add(note)
+            db.session.flush()
+            virtual.append({'username': user.username, 'group_ids': group_ids, 'note_id': note.id})
+        db.session.commit()
+        db.engine.dispose()
+    return dataset, virtual
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(db_path, port, args, log):
+    environ = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', SECRET_KEY='benchmark',
+                   CACHE_DIR=os.path.join(os.path.dirname(db_path), 'cache'))
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+               '--worker-class', args.worker_class, '--threads', str(args.threads), '--timeout', '120']
+    if args.access_log:
+        command += ['--access-logfile', '-']
+    command.append('app:app')
+    process = subprocess.Popen(command, cwd=ROOT, env=environ, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn terminou na inicialização (código {process.returncode}); veja {log.name}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/login')
+            if connection.getresponse().status == 200:
+                connection.close()
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn não respondeu em 60s')
+
+
+def _reader(session, user, mix, think, deadline, rng, samples):
+    names, weights = list(mix), list(mix.values())
+    today = date.today()
+    months = [f'{today.year + (today.month - 1 + offset) // 12}-{(today.month - 1 + offset) % 12 + 1:02d}'
+              for offset in range(-3, 3)]
+    while time.monotonic() < deadline:
+        route = rng.choices(names, weights)[0]
+        if route == 'index':
+            request = ('GET', '/', None)
+        elif route == 'notas':
+            request = ('GET', '/notas', None)
+        elif route == 'tarefas_mes':
+            request = ('GET', f'/tarefas/mes?mes={rng.choice(months)}', None)
+        else:
+            request = ('POST', '/adicionar', {'csrf_token': session.csrf_token, 'data': today.isoformat(),
+                                              'descricao': 'Tarefa do teste de carga',
+                                              'task_group_id': rng.choice(user['group_ids'])})
+        _timed(session, route, request, samples)
+        if think:
+            time.sleep(min(rng.expovariate(1 / think), max(0, deadline - time.monotonic())))
+
+
+def _editor(session, user, interval, deadline, rng, samples):
+    # Os editores não começam todos no mesmo instante
+    next_save = time.monotonic() + rng.uniform(0, interval)
+    version, n = None, 0
+    while True:
+        time.sleep(max(0, next_save - time.monotonic()))
+        if time.monotonic() >= deadline:
+            break
+        n += 1
+        form = {'csrf_token': session.csrf_token, 'title': 'Nota do teste de carga',
+                'content': f'Texto digitado pelo teste de carga, revisão {n}. ' * 20}
+        if version is not None:
+            form['base_version'] = version
+        response, data = _timed(session, 'autosave', ('POST', f"/notas/{user['note_id']}/atualizar", form), samples)
+        if response is not None and response.status in (200, 409):
+            version = json.loads(data).get('version', version)
+        next_save += interval
+
+
+def _timed(session, route, request, samples):
+    method, path, form = request
+    started = time.perf_counter()
+    try:
+        response, data = session.request(method, path, form)
+    except (http.client.HTTPException, OSError):
+        samples.append((route, time.perf_counter() - started, 0))
+        return None, None
+    samples.append((route, time.perf_counter() - started, response.status))
+    return response, data
+
+
+def _count_locked(log_path, offset):
+    """Ocorrências de 'database is locked' no log a partir de `offset`; retorna (ocorrências, novo offset)."""
+    with open(log_path, errors='replace') as f:
+        f.seek(offset)
+        text = f.read()
+        # Cada traceback repete a mensagem; conta só a linha final da exceção
+        count = sum(1 for line in text.splitlines()
+                    if _LOCKED in line and line.startswith('sqlalchemy.exc.OperationalError'))
+        return count, f.tell()
+
+
+def run_step(sessions, virtual, concurrency, args, log_path, log_offset):
+    n_editors = round(concurrency * args.editors)
+    deadline = time.monotonic() + args.duration
+    samples_per_thread = []
+    threads = []
+    for i in range(concurrency):
+        samples = []
+        samples_per_thread.append(samples)
+        rng = random.Random(args.seed * 1000 + concurrency * 100 + i)
+        if i < n_editors:
+            target = _editor
+            target_args = (sessions[i], virtual[i], args.autosave, deadline, rng, samples)
+        else:
+            target = _reader
+            target_args = (sessions[i], virtual[i], args.mix, args.think, deadline, rng, samples)
+        threads.append(threading.Thread(target=target, args=target_args, daemon=True))
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for thread_samples in samples_per_thread for sample in thread_samples]
+    locked, log_offset = _count_locked(log_path, log_offset)
+
+    routes = {}
+    for route in sorted({route for route, _, _ in samples}):
+        latencies = [latency * 1000 for name, latency, _ in samples if name == route]
+        statuses = [status for name, _, status in samples if name == route]
+        errors = sum(1 for status in statuses if status != EXPECTED_STATUS[route]
+                     and not (route == 'autosave' and status == 409))
+        routes[route] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'error_rate': round(errors / len(latencies), 4),
+            'conflicts': sum(1 for status in statuses if status == 409),
+            'p50_ms': round(statistics.median(latencies), 2),
+            'p95_ms': round(_percentile(latencies, 95), 2),
+            'p99_ms': round(_percentile(latencies, 99), 2),
+            'max_ms': round(max(latencies), 2),
+        }
+    total_errors = sum(route['errors'] for route in routes.values())
+    return {
+        'concurrency': concurrency,
+        'editors': n_editors,
+        'seconds': round(elapsed, 2),
+        'requests': len(samples),
+        'throughput': round(len(samples) / elapsed, 1),
+        'errors': total_errors,
+        'error_rate': round(total_errors / len(samples), 4) if samples else 0,
+        'locked': locked,
+        'routes': routes,
+    }, log_offset
+
+
+def _print_step(step, out):
+    print(f"\n=== {step['concurrency']} usuários ({step['editors']} editando notas), {step['seconds']:.0f}s ===",
+          file=out)
+    print(f"Vazão: {step['throughput']:.1f} req/s, {step['requests']} requisições, "
+          f"{step['errors']} erros ({step['error_rate']:.1%}), {step['locked']} \"database is locked\"", file=out)
+    print(f"  {'rota':<12} {'req':>6} {'erros':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8}", file=out)
+    for name, route in step['routes'].items():
+        print(f"  {name:<12} {route['requests']:>6} {route['errors']:>6} {route['p50_ms']:>8.1f} "
+              f"{route['p95_ms']:>8.1f} {route['p99_ms']:>8.1f} {route['max_ms']:>8.1f}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    datagen.add_arguments(parser)
+    parser.add_argument('--workers', type=int, default=4, help='workers do gunicorn')
+    parser.add_argument('--threads', type=int, default=16, help='threads por worker')
+    parser.add_argument('--worker-class', default='gthread', help='classe de worker do gunicorn')
+    parser.add_argument('--concurrency', default='4,8,16,32',
+                        help='usuários simultâneos de cada etapa, separados por vírgula')
+    parser.add_argument('--duration', type=float, default=20, help='segundos por etapa')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'peso de cada página na navegação (padrão: {DEFAULT_MIX})')
+    parser.add_argument('--think', type=float, default=0.5, help='pausa média entre cliques, em segundos')
+    parser.add_argument('--editors', type=float, default=0.25, help='fração dos usuários editando uma nota')
+    parser.add_argument('--autosave', type=float, default=1.5, help='intervalo do autosave, em segundos')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='taxa de erros aceita por etapa')
+    parser.add_argument('--access-log', action='store_true', help='incluir o log de acesso no log do gunicorn')
+    parser.add_argument('--json', dest='json_path', help="grava o resultado em JSON ('-' para a saída padrão)")
+    args = parser.parse_args()
+
+    steps = [int(value) for value in args.concurrency.split(',')]
+    out = sys.stderr if args.json_path == '-' else sys.stdout
+
+    directory = tempfile.mkdtemp(prefix='agenda-load-')
+    db_path = os.path.join(directory, 'load.db')
+    log_path = os.path.join(directory, 'gunicorn.log')
+
+    seed_started = time.perf_counter()
+    dataset, virtual = seed(db_path, args, max(steps))
+    print(f"Dados: {dataset['users']} usuários, {dataset['groups']} grupos, {dataset['tasks']} tarefas, "
+          f"{dataset['notes']} notas (gerados em {time.perf_counter() - seed_started:.1f}s)", file=out)
+
+    port = _free_port()
+    results = []
+    failed = False
+    with open(log_path, 'w') as log:
+        process = start_gunicorn(db_path, port, args, log)
+        print(f'gunicorn: {args.workers} workers {args.worker_class} x {args.threads} threads '
+              f'em 127.0.0.1:{port} (log em {log_path})', file=out)
+        sessions = []
+        try:
+            logins = [login(port, user['username']) for user in virtual]
+            sessions = [session for session, _ in logins]
+            login_ms = [elapsed * 1000 for _, elapsed in logins]
+            print(f'{len(sessions)} logins: mediana {statistics.median(login_ms):.0f} ms, '
+                  f'máx {max(login_ms):.0f} ms', file=out)
+
+            log_offset = 0
+            for concurrency in steps:
+                step, log_offset = run_step(sessions, virtual, concurrency, args, log_path, log_offset)
+                results.append(step)
+                _print_step(step, out)
+                if step['locked'] or any(route['error_rate'] > args.max_error_rate
+                                         for route in step['routes'].values()):
+                    failed = True
+        finally:
+            for session in sessions:
+                session.close()
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        'benchmark': 'load',
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'settings': {'workers': args.workers, 'threads': args.threads, 'worker_class': args.worker_class,
+                     'duration': args.duration, 'mix': args.mix, 'think': args.think,
+                     'editors': args.editors, 'autosave': args.autosave},
+        'dataset': dataset,
+        'steps': results,
+        'ok': not failed,
+    }
+    if args.json_path == '-':
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    elif args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'\nResultado gravado em {args.json_path}', file=out)
+
+    if failed:
+        print(f'\n✗ Erros acima de {args.max_error_rate:.1%} ou "database is locked"; veja {log_path}', file=out)
+        sys.exit(1)
+    print('\n✓ Nenhuma etapa passou do limite de erros', file=out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Mede logins por segundo na rota /login para cada conjunto de parâmetros do Argon2.
+
+Para cada conjunto, cria o usuário com um hash daqueles parâmetros, troca o
+pool de passwords.py por um com o mesmo custo e dispara logins simultâneos
+(uma thread por cliente). Relata logins aceitos por segundo, recusas 503
+do pool saturado e latência. Ao final confere que um login com hash de
+parâmetros antigos refaz o hash com os atuais.
+
+Execute: python -m benchmarks.password_hashing --clients 8 --logins 40 --threads 2 --queue 8
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks.support import load_app
+
+# Nome -> variáveis de ambiente do Argon2 (vazio = padrões do argon2-cffi)
+PARAMETER_SETS = [
+    ('leve (t=2, 19 MiB, p=1)', {'ARGON2_TIME_COST': '2', 'ARGON2_MEMORY_COST': '19456',
+                                 'ARGON2_PARALLELISM': '1'}),
+    ('padrão (t=3, 64 MiB, p=4)', {}),
+    ('forte (t=4, 128 MiB, p=4)', {'ARGON2_TIME_COST': '4', 'ARGON2_MEMORY_COST': '131072',
+                                   'ARGON2_PARALLELISM': '4'}),
+]
+
+PASSWORD = 'benchmark-senha'
+
+
+def _use_pool(environ, threads, queue):
+    import passwords
+    passwords._pool = passwords.PasswordPool(passwords.hasher_from_env(environ),
+                                             threads=threads, queue=queue)
+    return passwords._pool
+
+
+def _set_user_hash(app, password_hash):
+    from models import db, User
+
+    with app.app_context():
+        user = User.query.filter_by(username='bench').first()
+        if user is None:
+            user = User(username='bench')
+            db.session.add(user)
+        user.password_hash = password_hash
+        db.session.commit()
+
+
+def run_set(app, name, environ, clients, logins, threads, queue):
+    pool = _use_pool(environ, threads, queue)
+    _set_user_hash(app, pool.hasher.hash(PASSWORD))
+
+    results = []
+    lock = threading.Lock()
+
+    def client_loop(n):
+        client = app.test_client()
+        for _ in range(n):
+            started = time.perf_counter()
+            response = client.post('/login', data={'username': 'bench', 'password': PASSWORD})
+            elapsed = time.perf_counter() - started
+            client.get('/logout')
+            with lock:
+                results.append((response.status_code, elapsed))
+
+    per_client = max(1, logins // clients)
+    workers = [threading.Thread(target=client_loop, args=(per_client,)) for _ in range(clients)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    accepted = [latency * 1000 for status, latency in results if status == 302]
+    rejected = sum(1 for status, _ in results if status == 503)
+    print(f'{name}:')
+    print(f'    {len(accepted) / elapsed:.1f} logins/s ({len(accepted)} aceitos, '
+          f'{rejected} recusados com 503, {elapsed:.1f}s)')
+    if accepted:
+        print(f'    latência (ms): p50={statistics.median(accepted):.0f} máx={max(accepted):.0f}')
+
+
+def check_rehash(app, threads, queue):
+    """Login com hash de parâmetros antigos deve gravar um hash com os atuais."""
+    from models import User
+
+    old_pool = _use_pool(PARAMETER_SETS[0][1], threads, queue)
+    _set_user_hash(app, old_pool.hasher.hash(PASSWORD))
+    new_pool = _use_pool(PARAMETER_SETS[1][1], threads, queue)
+
+    response = app.test_client().post('/login', data={'username': 'bench', 'password': PASSWORD})
+    with app.app_context():
+        password_hash = User.query.filter_by(username='bench').first().password_hash
+    ok = response.status_code == 302 and not new_pool.hasher.check_needs_rehash(password_hash)
+    print(f"{'✓' if ok else '✗'} Hash refeito no login após mudança de parâmetros")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clients', type=int, default=8, help='clientes simultâneos')
+    parser.add_argument('--logins', type=int, default=40, help='logins por conjunto de parâmetros')
+    parser.add_argument('--threads', type=int, default=2, help='threads do pool (ARGON2_THREADS)')
+    parser.add_argument('--queue', type=int, default=8, help='fila do pool (ARGON2_QUEUE)')
+    args = parser.parse_args()
+
+    app = load_app()
+    from models import db
+    from migrations import upgrade
+
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+
+    print(f'{args.clients} clientes, pool com {args.threads} threads e fila de {args.queue}\n')
+    for name, environ in PARAMETER_SETS:
+        run_set(app, name, environ, args.clients, args.logins, args.threads, args.queue)
+    print()
+    if not check_rehash(app, args.threads, args.queue):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
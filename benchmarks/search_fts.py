@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Mede a latência da busca textual (FTS5) em um banco com muitas linhas.
+
+Cria o banco pelas migrações (índices e triggers de busca incluídos),
+carrega tarefas e notas sintéticas com vocabulário de frequência
+variada, de modo que há termos raros, médios e muito comuns, e executa
+search.search() restrita aos grupos de um usuário, como a rota /busca.
+
+Relata p50/p95 de cada tipo de consulta e compara com o limite de 10 ms.
+
+Execute: python -m benchmarks.search_fts --rows 1000000
+"""
+import argparse
+import itertools
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.support import load_app
+
+# Limite de latência (p50) por consulta, em milissegundos
+BUDGET_MS = 10.0
+
+COMMON_WORDS = ['reunião', 'cliente', 'relatório', 'entrega', 'revisão', 'projeto',
+                'orçamento', 'equipe', 'contrato', 'visita', 'ligação', 'pagamento']
+
+# Consulta -> texto digitado
+QUERIES = {
+    'termo raro': 'termo02000',
+    'termo médio': 'termo00300',
+    'termo comum': 'reunião',
+    'sem acento': 'orcamento',
+    'duas palavras': 'cliente termo00020',
+    'duas palavras raras': 'termo00300 termo01000',
+}
+
+
+def _vocabulary_sampler(rng, size=10000):
+    """Palavras com frequência de Zipf: termo00000 muito comum, termo09999 raro."""
+    words = [f'termo{i:05d}' for i in range(size)]
+    cum_weights = list(itertools.accumulate(1.0 / (i + 1) for i in range(size)))
+    return lambda k: rng.choices(words, cum_weights=cum_weights, k=k)
+
+
+def _text(rng, sample, n_words):
+    words = sample(n_words) + rng.sample(COMMON_WORDS, 2)
+    rng.shuffle(words)
+    return ' '.join(words)
+
+
+def load(db, rows, n_groups, seed=42):
+    """Carrega `rows` linhas (90% tarefas, 10% notas) com INSERTs em lote."""
+    from sqlalchemy import insert
+    from models import User, TaskGroup, Tarefa, Note, user_taskgroup
+
+    rng = random.Random(seed)
+    sample = _vocabulary_sampler(rng)
+
+    user = User(username='busca', password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+    groups = [TaskGroup(name=f'Grupo {i}', admin_id=user.id) for i in range(n_groups)]
+    db.session.add_all(groups)
+    db.session.flush()
+    group_ids = [group.id for group in groups]
+    db.session.execute(insert(user_taskgroup), [
+        {'user_id': user.id, 'taskgroup_id': group_id} for group_id in group_ids[:5]])
+
+    n_notes = rows // 10
+    n_tasks = rows - n_notes
+    start = date(2020, 1, 1)
+    now = datetime(2026, 1, 1)
+    batch = 20000
+    for offset in range(0, n_tasks, batch):
+        db.session.execute(insert(Tarefa), [
+            {'data': start + timedelta(days=i % 2000), 'descricao': _text(rng, sample, 8),
+             'created_at': now, 'user_id': user.id, 'task_group_id': group_ids[i % n_groups]}
+            for i in range(offset, min(offset + batch, n_tasks))])
+    for offset in range(0, n_notes, batch):
+        db.session.execute(insert(Note), [
+            {'title': _text(rng, sample, 3), 'content': _text(rng, sample, 60),
+             'created_at': now, 'updated_at': now, 'version': 1,
+             'user_id': user.id, 'task_group_id': group_ids[i % n_groups]}
+            for i in range(offset, min(offset + batch, n_notes))])
+    db.session.commit()
+    return group_ids[:5]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=1000000, help='tarefas + notas a carregar')
+    parser.add_argument('--groups', type=int, default=500, help='grupos (o usuário pertence a 5)')
+    parser.add_argument('--repeat', type=int, default=30, help='execuções de cada consulta')
+    args = parser.parse_args()
+
+    app = load_app()
+    from models import db
+    from migrations import upgrade
+    import search
+
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+
+        started = time.perf_counter()
+        group_ids = load(db, args.rows, args.groups)
+        with db.engine.begin() as conn:
+            search.optimize(conn)
+        print(f'{args.rows} linhas carregadas e indexadas em {time.perf_counter() - started:.0f}s '
+              f'(usuário em 5 de {args.groups} grupos)\n')
+
+        failures = 0
+        for name, query in QUERIES.items():
+            search.search(query, group_ids)  # aquece o cache de páginas
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                results, _, ranked = search.search(query, group_ids)
+                timings.append((time.perf_counter() - started) * 1000)
+                db.session.rollback()
+
+            p50 = statistics.median(timings)
+            p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+            ok = p50 <= BUDGET_MS
+            failures += not ok
+            print(f"{'✓' if ok else '✗'} {name:<20} \"{query}\": p50={p50:.1f} ms p95={p95:.1f} ms "
+                  f"({len(results)} resultados na 1ª página, {'relevância' if ranked else 'mais recentes'})")
+
+    if failures:
+        print(f'✗ {failures} consulta(s) acima de {BUDGET_MS:.0f} ms', file=sys.stderr)
+        sys.exit(1)
+    print(f'✓ Todas as consultas abaixo de {BUDGET_MS:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Confere a ordem e a paginação da busca (/busca) nos dois modos.
+
+- Paginação: cada tarefa e nota encontrada aparece uma única vez ao
+  percorrer as páginas, com ids em ordem inversa à das datas (o caso em
+  que janelas cortadas por um critério e páginas ordenadas por outro
+  repetiam a página 1 na página 2).
+- Mais recentes primeiro: tarefas antigas com ids altos não escondem notas
+  criadas depois delas.
+- Páginas além de SEARCH_MAX_PAGES (inclusive números enormes em ?page=)
+  vêm vazias, sem erro.
+
+O modo "mais recentes" vale para termos com mais de RANK_MAX_MATCHES
+linhas; o roteiro reduz o limite para exercitá-lo com poucos dados.
+
+Execute: python -m benchmarks.search_order
+"""
+import sys
+from datetime import date, datetime, timedelta
+
+from benchmarks.support import load_app
+
+PER_PAGE = 10
+
+
+def seed(db):
+    from models import User, TaskGroup, Tarefa, Note
+
+    user = User(username='ana', password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+    group = TaskGroup(name='Casa', admin_id=user.id)
+    group.members.append(user)
+    db.session.add(group)
+    db.session.flush()
+    # Notas antes das tarefas (ids menores), mas criadas depois de todas elas
+    db.session.add_all([Note(title=f'Reunião nota {i}', content='', user_id=user.id, task_group_id=group.id,
+                             created_at=datetime(2026, 3, 1, 12, i))
+                        for i in range(7)])
+    db.session.flush()
+    # Ids em ordem inversa à das datas da tarefa e da criação
+    db.session.add_all([Tarefa(data=date(2025, 1, 1) + timedelta(days=45 - i), descricao=f'Reunião {i}',
+                               user_id=user.id, task_group_id=group.id,
+                               created_at=datetime(2025, 1, 1) + timedelta(days=45 - i))
+                        for i in range(45)])
+    db.session.commit()
+    return group.id
+
+
+def all_pages(group_id):
+    import search
+
+    seen, modes = [], set()
+    page = 1
+    while True:
+        results, has_next, ranked = search.search('reuniao', [group_id], page, per_page=PER_PAGE)
+        seen += [(result['kind'], result['id']) for result in results]
+        modes.add(ranked)
+        if not has_next:
+            return seen, modes
+        page += 1
+
+
+def main():
+    app = load_app()
+    from models import db, Tarefa, Note
+    from migrations import upgrade
+    import search
+
+    failed = False
+
+    def check(ok, message):
+        nonlocal failed
+        failed = failed or not ok
+        print(f"{'✓' if ok else '✗'} {message}")
+
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+        group_id = seed(db)
+        total = Tarefa.query.count() + Note.query.count()
+        created = {('tarefa', row.id): row.created_at for row in Tarefa.query}
+        created.update({('nota', row.id): row.created_at for row in Note.query})
+
+        for name, limit in (('relevância', search.RANK_MAX_MATCHES), ('mais recentes', 10)):
+            search.RANK_MAX_MATCHES = limit
+            seen, modes = all_pages(group_id)
+            check(modes == {name == 'relevância'} and len(seen) == len(set(seen)) == total,
+                  f'{name}: {len(set(seen))} de {total} resultados, {len(seen) - len(set(seen))} repetidos')
+            if name == 'mais recentes':
+                dates = [created[key] for key in seen]
+                check(dates == sorted(dates, reverse=True), f'{name}: em ordem de criação decrescente')
+                first_page = [kind for kind, _ in seen[:PER_PAGE]]
+                check(first_page[:7] == ['nota'] * 7,
+                      f'{name}: notas novas antes das tarefas antigas ({first_page[:8]})')
+
+            for page in (search.SEARCH_MAX_PAGES + 1, 2 ** 62, 10 ** 30):
+                results, has_next, _ = search.search('reuniao', [group_id], page, per_page=PER_PAGE)
+                check(results == [] and not has_next, f'{name}: página {page} vazia')
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
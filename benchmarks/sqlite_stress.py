@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Teste de estresse do SQLite com vários processos escritores simultâneos.
+
+Simula o que acontece com os workers do gunicorn: cada processo abre sua
+própria conexão com o mesmo arquivo e repete, dentro de um contexto de
+requisição POST, uma escrita de tarefa e um salvamento de nota do tipo
+leitura-modificação-escrita (como o autosave). Leitores opcionais fazem
+consultas no contexto de um GET ao mesmo tempo.
+
+Relata erros "database is locked", latência (p50/p95/máx) e vazão, com o
+perfil de produção do SQLite ligado e/ou desligado.
+
+Execute: python -m benchmarks.sqlite_stress --writers 8 --ops 200 --readers 2 --compare
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+from benchmarks.support import load_app
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _worker(role, db_path, tuning, n_ops, ids):
+    """Processo escritor ou leitor; retorna latências e contagem de erros."""
+    os.environ['SQLITE_TUNING'] = 'True' if tuning else 'False'
+    app = load_app(db_path)
+    from sqlalchemy.exc import OperationalError
+    from models import db, Tarefa, Note
+
+    latencies = []
+    locked = 0
+    other_errors = 0
+
+    for i in range(n_ops):
+        started = time.perf_counter()
+        try:
+            if role == 'writer':
+                with app.test_request_context('/', method='POST'):
+                    db.session.add(Tarefa(data=date(2026, 1, 1 + i % 28), descricao=f'stress {i}',
+                                          user_id=ids['user_id'], task_group_id=ids['group_id']))
+                    db.session.commit()
+
+                    # Leitura seguida de escrita, como no autosave de notas
+                    note = db.session.get(Note, ids['note_id'])
+                    note.content = f'{os.getpid()}:{i}'
+                    note.version = note.version + 1
+                    db.session.commit()
+            else:
+                with app.test_request_context('/', method='GET'):
+                    Tarefa.query.filter_by(task_group_id=ids['group_id']).order_by(
+                        Tarefa.data.desc()).limit(50).all()
+                    db.session.commit()
+        except OperationalError as e:
+            db.session.rollback()
+            if 'locked' in str(e) or 'busy' in str(e):
+                locked += 1
+            else:
+                other_errors += 1
+        latencies.append(time.perf_counter() - started)
+
+    return {'role': role, 'latencies': latencies, 'locked': locked, 'errors': other_errors}
+
+
+def _seed(db_path):
+    app = load_app(db_path)
+    from models import db, User, TaskGroup, Note
+    from migrations import upgrade
+
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+        user = User(username='stress', is_admin=True, password_hash='-')
+        db.session.add(user)
+        db.session.flush()
+        group = TaskGroup(name='Estresse', admin_id=user.id)
+        db.session.add(group)
+        db.session.flush()
+        note = Note(title='Estresse', content='', user_id=user.id, task_group_id=group.id)
+        db.session.add(note)
+        db.session.commit()
+        return {'user_id': user.id, 'group_id': group.id, 'note_id': note.id}
+
+
+def run(tuning, writers, readers, n_ops):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='agenda-stress-'), 'stress.db')
+
+    # spawn: cada processo importa a aplicação do zero, como um worker do gunicorn
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        ids = pool.apply(_seed, (db_path,))
+
+    jobs = [('writer', db_path, tuning, n_ops, ids)] * writers + \
+           [('reader', db_path, tuning, n_ops, ids)] * readers
+
+    started = time.perf_counter()
+    with context.Pool(len(jobs)) as pool:
+        results = pool.starmap(_worker, jobs)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n=== Perfil de produção {'LIGADO' if tuning else 'DESLIGADO'} "
+          f"({writers} escritores, {readers} leitores, {n_ops} operações cada) ===")
+    for role in ('writer', 'reader'):
+        group = [r for r in results if r['role'] == role]
+        if not group:
+            continue
+        latencies = [latency * 1000 for r in group for latency in r['latencies']]
+        locked = sum(r['locked'] for r in group)
+        errors = sum(r['errors'] for r in group)
+        name = 'Escritores' if role == 'writer' else 'Leitores'
+        print(f'{name}: {len(latencies)} operações, {locked} "database is locked", '
+              f'{errors} outros erros')
+        print(f'    latência (ms): p50={statistics.median(latencies):.1f} '
+              f'p95={_percentile(latencies, 95):.1f} máx={max(latencies):.1f}')
+    total_ops = (writers + readers) * n_ops
+    print(f'Vazão: {total_ops / elapsed:.0f} operações/s em {elapsed:.1f}s')
+
+    return sum(r['locked'] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--writers', type=int, default=8, help='processos escritores')
+    parser.add_argument('--readers', type=int, default=2, help='processos leitores')
+    parser.add_argument('--ops', type=int, default=200, help='operações por processo')
+    parser.add_argument('--compare', action='store_true',
+                        help='rodar também com o perfil desligado, para comparação')
+    args = parser.parse_args()
+
+    if args.compare:
+        run(False, args.writers, args.readers, args.ops)
+    locked = run(True, args.writers, args.readers, args.ops)
+    if locked:
+        raise SystemExit(f'✗ {locked} erro(s) "database is locked" com o perfil ligado')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Utilitários compartilhados pelos scripts de benchmark.
+
+Os scripts rodam contra um banco SQLite temporário, nunca contra o banco
+configurado em DATABASE_URL.
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(db_path=None):
+    """Importa a aplicação apontando para um banco SQLite temporário."""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='agenda-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    from app import app
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    return app
+
+
+class QueryCounter:
+    """Conta as instruções SQL executadas enquanto estiver ativo."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        # BEGIN emitido pelo perfil do SQLite não é uma consulta
+        if not statement.startswith('BEGIN'):
+            self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine):
+    """Context manager que registra as instruções SQL enviadas ao engine."""
+    from sqlalchemy import event
+
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+def login(client, username, password):
+    """Faz login pelo formulário e falha se as credenciais forem recusadas."""
+    response = client.post('/login', data={'username': username, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f'Login de "{username}" falhou (HTTP {response.status_code})')
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Confere que a sincronização incremental (/api/v1/sync) reproduz o servidor.
+
+Um cliente simulado faz a sincronização completa e depois aplica as
+páginas incrementais como o README descreve: item a item, na ordem das
+revisões, por (tipo, id) — lápide remove, item vivo substitui. Depois de
+cada rodada de alterações (criação, edição, exclusão e mudanças de grupo
+entre grupos que o cliente vê, para um grupo que ele não vê e de volta),
+o conteúdo do cliente deve ser igual às tarefas e notas visíveis no banco.
+
+Execute: python -m benchmarks.sync_consistency
+"""
+import sys
+from datetime import date
+
+from benchmarks.support import load_app
+
+
+def seed(db):
+    from models import User, TaskGroup, Tarefa, Note, user_taskgroup
+
+    user = User(username='cliente', password_hash='-')
+    other = User(username='outro', password_hash='-')
+    db.session.add_all([user, other])
+    db.session.flush()
+    groups = [TaskGroup(name=f'Grupo {i}', admin_id=user.id) for i in range(3)]
+    db.session.add_all(groups)
+    db.session.flush()
+    # O cliente vê os dois primeiros grupos; o terceiro é só do outro usuário
+    db.session.execute(user_taskgroup.insert(), [
+        {'user_id': user.id, 'taskgroup_id': groups[0].id},
+        {'user_id': user.id, 'taskgroup_id': groups[1].id},
+        {'user_id': other.id, 'taskgroup_id': groups[2].id},
+    ])
+    db.session.add_all([Tarefa(data=date(2026, 1, 1 + i), descricao=f'Tarefa {i}', user_id=user.id,
+                               task_group_id=groups[i % 2].id) for i in range(6)])
+    db.session.add_all([Note(title=f'Nota {i}', content='', user_id=user.id,
+                             task_group_id=groups[i % 2].id) for i in range(4)])
+    db.session.commit()
+    return [group.id for group in groups]
+
+
+def server_state(visible):
+    from models import Tarefa, Note
+
+    state = {}
+    for kind, model in (('task', Tarefa), ('note', Note)):
+        for row in model.query.filter(model.task_group_id.in_(visible)):
+            state[(kind, row.id)] = row.task_group_id
+    return state
+
+
+def pull(client, visible, cursor):
+    """Aplica as páginas até has_more ser falso; retorna o novo cursor."""
+    from delta_sync import sync_page
+
+    while True:
+        page = sync_page(visible, cursor, limit=3)
+        if page['reset']:
+            client.clear()
+        for change in page['changes']:
+            key = (change['type'], change['id'])
+            if change['deleted']:
+                client.pop(key, None)
+            else:
+                client[key] = change[change['type']]['task_group_id']
+        cursor = page['cursor']
+        if not page['has_more']:
+            return cursor
+
+
+def main():
+    app = load_app()
+    from models import db, Tarefa, Note
+    from migrations import upgrade
+
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+        first, second, hidden = seed(db)
+        visible = [first, second]
+
+        task_ids = [row.id for row in Tarefa.query.order_by(Tarefa.id)]
+        note_ids = [row.id for row in Note.query.order_by(Note.id)]
+
+        def move(model, id, group_id):
+            db.session.get(model, id).task_group_id = group_id
+            db.session.commit()
+
+        def delete(model, id):
+            db.session.delete(db.session.get(model, id))
+            db.session.commit()
+
+        def edit(model, id):
+            row = db.session.get(model, id)
+            if model is Tarefa:
+                row.descricao += ' (editada)'
+            else:
+                row.content += ' (editada)'
+            db.session.commit()
+
+        rounds = [
+            ('mudança entre grupos visíveis', [(move, Tarefa, task_ids[0], second),
+                                               (move, Note, note_ids[0], second)]),
+            ('mudança e volta na mesma rodada', [(move, Tarefa, task_ids[1], first),
+                                                 (move, Tarefa, task_ids[1], second),
+                                                 (move, Tarefa, task_ids[1], first)]),
+            ('mudança para grupo não visível', [(move, Tarefa, task_ids[2], hidden),
+                                                (move, Note, note_ids[1], hidden)]),
+            ('volta de grupo não visível', [(move, Tarefa, task_ids[2], second),
+                                            (move, Note, note_ids[1], first)]),
+            ('edição e exclusão', [(edit, Tarefa, task_ids[3], None), (delete, Tarefa, task_ids[4], None),
+                                   (edit, Note, note_ids[2], None), (delete, Note, note_ids[3], None)]),
+            ('mudança de item já movido', [(move, Tarefa, task_ids[0], first),
+                                           (move, Note, note_ids[0], first)]),
+        ]
+
+        client = {}
+        cursor = pull(client, visible, None)
+        failed = client != server_state(visible)
+        print(f"{'✗' if failed else '✓'} sincronização completa: {len(client)} itens")
+
+        for name, operations in rounds:
+            for operation, model, id, group_id in operations:
+                if operation is move:
+                    operation(model, id, group_id)
+                else:
+                    operation(model, id)
+            cursor = pull(client, visible, cursor)
+            expected = server_state(visible)
+            ok = client == expected
+            failed = failed or not ok
+            print(f"{'✓' if ok else '✗'} {name}")
+            if not ok:
+                missing = sorted(set(expected) - set(client))
+                extra = sorted(set(client) - set(expected))
+                wrong = sorted(key for key in set(client) & set(expected) if client[key] != expected[key])
+                print(f'    faltando: {missing}  sobrando: {extra}  grupo errado: {wrong}')
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
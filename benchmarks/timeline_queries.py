@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Verifica que a linha do tempo de tarefas (rota `/`) não sofre de N+1.
+
+Popula o banco com poucos e depois com muitos autores e tarefas e confere
+que o número de instruções SQL da página não cresce com o volume de linhas.
+
+Execute: python -m benchmarks.timeline_queries
+"""
+import sys
+from datetime import date, timedelta
+
+from benchmarks.support import load_app, count_queries, login
+
+# Limite de instruções SQL aceitas para renderizar a página inicial
+MAX_QUERIES = 8
+
+
+def seed(db, n_users, n_groups, n_tasks):
+    from models import User, TaskGroup, Tarefa
+
+    admin = User(username='admin', is_admin=True)
+    admin.set_password('benchmark')
+    db.session.add(admin)
+    users = [admin]
+    for i in range(n_users - 1):
+        user = User(username=f'user{i:04d}', is_admin=False)
+        user.password_hash = admin.password_hash
+        users.append(user)
+    db.session.add_all(users)
+    db.session.flush()
+
+    groups = [TaskGroup(name=f'Grupo {i}', admin_id=admin.id) for i in range(n_groups)]
+    db.session.add_all(groups)
+    db.session.flush()
+    for group in groups:
+        group.members.append(admin)
+
+    start = date(2024, 1, 1)
+    db.session.add_all([
+        Tarefa(data=start + timedelta(days=i % 700),
+               descricao=f'Tarefa {i}',
+               user_id=users[i % len(users)].id,
+               task_group_id=groups[i % len(groups)].id)
+        for i in range(n_tasks)
+    ])
+    db.session.commit()
+
+
+def measure(n_users, n_groups, n_tasks):
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(db, n_users, n_groups, n_tasks)
+        engine = db.engine
+
+    client = app.test_client()
+    login(client, 'admin', 'benchmark')
+    # Primeira requisição aquece os caches de usuário e de grupos; mede-se a seguinte
+    client.get('/')
+    with count_queries(engine) as counter:
+        response = client.get('/')
+    if response.status_code != 200:
+        raise RuntimeError(f'GET / retornou HTTP {response.status_code}')
+    return counter.count
+
+
+def main():
+    small = measure(n_users=2, n_groups=3, n_tasks=10)
+    large = measure(n_users=200, n_groups=3, n_tasks=2000)
+    print(f'Consultas em /: {small} (10 tarefas), {large} (2000 tarefas)')
+
+    if large != small or large > MAX_QUERIES:
+        print(f'✗ A linha do tempo executou {large} consultas (limite: {MAX_QUERIES}, '
+              f'esperado constante)', file=sys.stderr)
+        sys.exit(1)
+    print('✓ Número de consultas constante')
+
+
+if __name__ == '__main__':
+    main()
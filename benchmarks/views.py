@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Mede as rotas mais usadas contra orçamentos de consultas SQL e de latência.
+
+Popula um banco temporário com o gerador de dados sintéticos
+(benchmarks/datagen.py) e chama, pelo cliente de teste do Flask, as
+rotas index, notas, atualizar_nota, adicionar, login e admin_dashboard:
+algumas execuções de aquecimento e depois --repeat execuções medidas. Os
+usuários comuns entram como o usuário mais ativo, que participa dos
+maiores grupos (o pior caso das páginas).
+
+Para cada rota registra o número de instruções SQL (máximo entre as
+execuções) e a latência (mediana, p95, máxima) e falha se algum valor
+passar do orçamento em BUDGETS (ou no arquivo de --budgets). O resultado
+sai em JSON (--json) para comparar execuções ao longo do tempo; com
+--compare o script mostra a variação em relação a um resultado anterior.
+
+Execute: python -m benchmarks.views --tasks 20000 --notes 2000 --repeat 20 --json resultado.json
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+
+from benchmarks import datagen
+from benchmarks.support import ROOT, load_app, count_queries, login
+
+# Orçamento por rota: máximo de instruções SQL e latência p95 (ms).
+# A latência do login é dominada pelo Argon2 (passwords.py).
+BUDGETS = {
+    'index': {'queries': 6, 'p95_ms': 100},
+    'notas': {'queries': 6, 'p95_ms': 300},
+    'atualizar_nota': {'queries': 5, 'p95_ms': 30},
+    'adicionar': {'queries': 4, 'p95_ms': 30},
+    'login': {'queries': 4, 'p95_ms': 1000},
+    'admin_dashboard': {'queries': 6, 'p95_ms': 100},
+}
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _check(response, expected, name):
+    if response.status_code != expected:
+        raise RuntimeError(f'{name} retornou HTTP {response.status_code} (esperado {expected})')
+    return response
+
+
+def _scenarios(app, dataset):
+    """Nome da rota -> função que faz uma requisição e confere o status."""
+    user = app.test_client()
+    login(user, dataset['heavy_user'], datagen.PASSWORD)
+    admin = app.test_client()
+    login(admin, 'admin', datagen.PASSWORD)
+
+    note_id = dataset['note_id']
+    state = {'n': 0, 'version': None}
+
+    def index():
+        _check(user.get('/'), 200, 'index')
+
+    def notas():
+        _check(user.get('/notas'), 200, 'notas')
+
+    def atualizar_nota():
+        # Autosave com versão base, como o editor faz
+        state['n'] += 1
+        data = {'content': f'Conteúdo salvo pelo benchmark ({state["n"]})', 'title': 'Nota do benchmark'}
+        if state['version'] is not None:
+            data['base_version'] = state['version']
+        response = _check(user.post(f'/notas/{note_id}/atualizar', data=data), 200, 'atualizar_nota')
+        state['version'] = response.get_json()['version']
+
+    def adicionar():
+        _check(user.post('/adicionar', data={'task_group_id': dataset['group_id'],
+                                             'data': date.today().isoformat(),
+                                             'descricao': 'Tarefa do benchmark'}), 302, 'adicionar')
+
+    def login_view():
+        # Cliente novo a cada vez: sem sessão, o login verifica a senha
+        _check(app.test_client().post('/login', data={'username': dataset['heavy_user'],
+                                                      'password': datagen.PASSWORD}), 302, 'login')
+
+    def admin_dashboard():
+        _check(admin.get('/admin'), 200, 'admin_dashboard')
+
+    return {'index': index, 'notas': notas, 'atualizar_nota': atualizar_nota, 'adicionar': adicionar,
+            'login': login_view, 'admin_dashboard': admin_dashboard}
+
+
+def measure(engine, request, warmup, repeat):
+    for _ in range(warmup):
+        request()
+
+    queries, latencies = [], []
+    for _ in range(repeat):
+        with count_queries(engine) as counter:
+            started = time.perf_counter()
+            request()
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+
+    return {
+        'queries': max(queries),
+        'queries_min': min(queries),
+        'median_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(_percentile(latencies, 95), 2),
+        'max_ms': round(max(latencies), 2),
+    }
+
+
+def check_budget(result, budget):
+    """Lista das violações do orçamento (vazia se a rota está dentro dele)."""
+    violations = []
+    if 'queries' in budget and result['queries'] > budget['queries']:
+        violations.append(f"{result['queries']} consultas > {budget['queries']}")
+    if 'p95_ms' in budget and result['p95_ms'] > budget['p95_ms']:
+        violations.append(f"p95 {result['p95_ms']:.1f} ms > {budget['p95_ms']} ms")
+    return violations
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _print_comparison(results, previous, out):
+    print(f"\nComparação com {previous.get('revision') or '?'} ({previous.get('started_at', '?')}):", file=out)
+    for name, result in results.items():
+        before = previous.get('views', {}).get(name)
+        if not before:
+            continue
+        change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+        print(f"  {name:<16} consultas {before['queries']:>3} → {result['queries']:<3} "
+              f"p95 {before['p95_ms']:>8.1f} → {result['p95_ms']:<8.1f} ms ({change:+.0f}%)", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    datagen.add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=20, help='execuções medidas por rota')
+    parser.add_argument('--warmup', type=int, default=3, help='execuções de aquecimento por rota')
+    parser.add_argument('--views', help='rotas a medir, separadas por vírgula (padrão: todas)')
+    parser.add_argument('--budgets', help='arquivo JSON com orçamentos que substituem os padrões')
+    parser.add_argument('--json', dest='json_path', help="grava o resultado em JSON ('-' para a saída padrão)")
+    parser.add_argument('--compare', help='resultado JSON anterior para comparação')
+    args = parser.parse_args()
+
+    budgets = {name: dict(budget) for name, budget in BUDGETS.items()}
+    if args.budgets:
+        with open(args.budgets) as f:
+            for name, budget in json.load(f).items():
+                budgets.setdefault(name, {}).update(budget)
+
+    # Com o JSON na saída padrão, o relatório vai para stderr
+    out = sys.stderr if args.json_path == '-' else sys.stdout
+
+    app = load_app()
+    from models import db
+    from migrations import upgrade
+
+    started_at = datetime.now().isoformat(timespec='seconds')
+    with app.app_context():
+        upgrade(db.engine, verbose=False)
+        seed_started = time.perf_counter()
+        dataset = datagen.generate_from_args(db, args)
+        seed_elapsed = time.perf_counter() - seed_started
+        engine = db.engine
+
+    print(f"Dados: {dataset['users']} usuários, {dataset['groups']} grupos, {dataset['memberships']} participações, "
+          f"{dataset['tasks']} tarefas, {dataset['notes']} notas (gerados em {seed_elapsed:.1f}s)", file=out)
+
+    scenarios = _scenarios(app, dataset)
+    names = args.views.split(',') if args.views else list(scenarios)
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"✗ Rota(s) desconhecida(s): {', '.join(unknown)}")
+
+    results = {}
+    failed = False
+    for name in names:
+        result = measure(engine, scenarios[name], args.warmup, args.repeat)
+        result['budget'] = budgets.get(name, {})
+        violations = check_budget(result, result['budget'])
+        result['ok'] = not violations
+        results[name] = result
+        failed = failed or bool(violations)
+        mark = '✗' if violations else '✓'
+        print(f"{mark} {name:<16} {result['queries']:>3} consultas  mediana {result['median_ms']:>7.1f} ms  "
+              f"p95 {result['p95_ms']:>7.1f} ms" + (f"  ({'; '.join(violations)})" if violations else ''),
+              file=out)
+
+    report = {
+        'benchmark': 'views',
+        'started_at': started_at,
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'settings': {'repeat': args.repeat, 'warmup': args.warmup},
+        'dataset': dataset,
+        'views': results,
+        'ok': not failed,
+    }
+
+    if args.compare:
+        with open(args.compare) as f:
+            _print_comparison(results, json.load(f), out)
+
+    if args.json_path == '-':
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    elif args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'\nResultado gravado em {args.json_path}', file=out)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
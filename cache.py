@@ -0,0 +1,229 @@
+"""
+Estruturas de cache em processo e contadores de versão compartilhados.
+
+Cada worker do gunicorn tem sua própria memória, então um cache em
+processo não percebe alterações feitas por outro worker (ou por scripts
+como create_user.py). Para isso existem os contadores de geração: um
+arquivo pequeno por escopo, lido a cada uso do cache e incrementado a cada
+alteração. Uma entrada de cache guarda a geração em que foi criada e só é
+válida enquanto a geração atual for a mesma.
+
+No sentido inverso, WorkerStore guarda dados de um worker (métricas,
+consultas lentas) em um arquivo JSON próprio, que os demais workers leem
+para somar os de todos.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos (uso em desenvolvimento)
+    fcntl = None
+
+_MISSING = object()
+
+_worker_stores = {}
+_worker_stores_lock = threading.Lock()
+
+
+class LRUCache:
+    """
+    Cache LRU limitado, com expiração opcional (TTL em segundos).
+
+    Seguro para uso por várias threads do mesmo processo.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class GenerationCounter:
+    """
+    Contador inteiro persistido em arquivo, compartilhado entre processos.
+
+    `current()` lê o valor (0 se o arquivo não existir); `bump()` o
+    incrementa de forma atômica e retorna o novo valor.
+    """
+
+    def __init__(self, directory, name):
+        self.path = os.path.join(directory, f'{name}.gen')
+
+    def current(self):
+        try:
+            with open(self.path) as f:
+                return int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def changed_at(self):
+        """Instante (UTC) do último incremento; None se o contador nunca foi incrementado."""
+        try:
+            return datetime.fromtimestamp(int(os.stat(self.path).st_mtime), tz=timezone.utc)
+        except FileNotFoundError:
+            return None
+
+    def bump(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                value = self.current() + 1
+                tmp_path = f'{self.path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    f.write(str(value))
+                os.replace(tmp_path, self.path)
+                return value
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class WorkerStore:
+    """
+    Dados de um worker gravados em <directory>/<pid>.json.
+
+    As subclasses guardam os dados em memória sob `_lock`, marcam `_dirty`
+    a cada alteração e implementam `payload()`, o conteúdo do arquivo. O
+    arquivo é regravado (temporário + rename) no máximo a cada
+    `flush_interval` segundos; `others()` lê os arquivos dos demais workers.
+    """
+
+    def __init__(self, directory, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        self.path = os.path.join(directory, f'{self.pid}.json')
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._flushed_at = 0.0
+
+    def payload(self):
+        raise NotImplementedError
+
+    def maybe_flush(self):
+        if self._dirty and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Grava os dados do worker (arquivo temporário + rename)."""
+        with self._lock:
+            data = json.dumps(self.payload())
+            self._dirty = False
+            self._flushed_at = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def _files(self):
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+        return [entry for entry in entries if entry.name.endswith('.json')]
+
+    def others(self, max_age=None):
+        """
+        Dados gravados pelos demais workers.
+
+        Com max_age, apaga em vez de ler os arquivos sem atualização há mais
+        de max_age segundos (workers que não existem mais).
+        """
+        result = []
+        for entry in self._files():
+            if entry.path == self.path:
+                continue
+            try:
+                if max_age is not None and time.time() - entry.stat().st_mtime > max_age:
+                    os.remove(entry.path)
+                    continue
+                with open(entry.path) as f:
+                    result.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                pass  # apagado ou sendo substituído por outro worker
+        return result
+
+    def remove_all(self):
+        """Apaga os arquivos de todos os workers."""
+        for entry in self._files():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # outro worker apagou primeiro
+
+
+def worker_store(name, factory):
+    """WorkerStore `name` do worker atual (recriado com factory() se o processo mudou, após um fork)."""
+    pid = os.getpid()
+    store = _worker_stores.get(name)
+    if store is None or store.pid != pid:
+        with _worker_stores_lock:
+            store = _worker_stores.get(name)
+            if store is None or store.pid != pid:
+                store = _worker_stores[name] = factory()
+    return store
+
+
+def default_cache_dir(app):
+    """
+    Diretório dos contadores de geração.
+
+    Usa CACHE_DIR se configurado; senão uma pasta `cache` ao lado do banco
+    SQLite (compartilhada pelos workers e pelos scripts); senão a pasta
+    instance da aplicação.
+    """
+    if app.config.get('CACHE_DIR'):
+        return app.config['CACHE_DIR']
+
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    if uri.startswith('sqlite:////'):
+        return os.path.join(os.path.dirname(uri[len('sqlite:///'):]), 'cache')
+    return os.path.join(app.instance_path, 'cache')
+
+
+def generation_counter(app, name):
+    """Contador de geração `name` da aplicação (criado uma vez por processo)."""
+    counters = app.extensions.setdefault('generation_counters', {})
+    if name not in counters:
+        counters[name] = GenerationCounter(default_cache_dir(app), name)
+    return counters[name]
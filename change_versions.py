@@ -0,0 +1,253 @@
+"""
+Versões de alteração por grupo e GET condicional (ETag) das páginas.
+
+A tabela `change_versions(scope, version)` guarda um contador por escopo
+("group:<id>"). Triggers no SQLite o incrementam a cada INSERT, UPDATE ou
+DELETE em tarefas, notas, membros e no próprio grupo, qualquer que seja o
+caminho da escrita (ORM, UPDATE em lote, scripts). A migração 0006 cria a
+tabela e os triggers; a 0007 acrescenta as versões por grupo e mês das
+tarefas ("month:<id>:AAAA-MM"), usadas pelo cache de fragmentos.
+
+As páginas e endpoints JSON calculam um ETag forte a partir do usuário,
+dos parâmetros de filtro e das versões dos grupos visíveis. Se o
+navegador envia o mesmo ETag em If-None-Match, a resposta é um 304 sem
+consultar tarefas ou notas: apenas uma leitura na chave primária de
+change_versions.
+"""
+import hashlib
+import os
+import re
+from datetime import date, datetime, timezone
+from functools import wraps
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from sqlalchemy import bindparam, text
+from models import db
+import membership
+
+_TABLE = """CREATE TABLE IF NOT EXISTS change_versions (
+    scope VARCHAR(64) PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    changed_at TIMESTAMP
+)"""
+
+
+def _bump_scope(scope_expr, when='TRUE'):
+    return (f"INSERT INTO change_versions (scope, version, changed_at) SELECT {scope_expr}, 1, CURRENT_TIMESTAMP "
+            f"WHERE {when} ON CONFLICT (scope) DO UPDATE SET version = version + 1, "
+            f"changed_at = CURRENT_TIMESTAMP;")
+
+
+def _bump(group_expr, when='TRUE'):
+    return _bump_scope(f"'group:' || {group_expr}", when)
+
+
+def _month_scope(row):
+    return f"'month:' || {row}.task_group_id || ':' || strftime('%Y-%m', {row}.data)"
+
+
+def _triggers(table, group_column, update_columns):
+    prefix = f'{table}_change_version'
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {table} BEGIN
+            {_bump('new.' + group_column)}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {prefix}_update AFTER UPDATE{update_columns} ON {table} BEGIN
+            {_bump('old.' + group_column)}
+            {_bump('new.' + group_column, f'new.{group_column} IS NOT old.{group_column}')}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {table} BEGIN
+            {_bump('old.' + group_column)}
+        END""",
+    ]
+
+
+# Versão por grupo e mês das tarefas ("month:<grupo>:AAAA-MM"): uma escrita
+# invalida apenas os blocos já renderizados daquele mês (fragment_cache.py)
+_MONTH_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS tarefas_month_version_insert AFTER INSERT ON tarefas BEGIN
+        {_bump_scope(_month_scope('new'))}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tarefas_month_version_update AFTER UPDATE ON tarefas BEGIN
+        {_bump_scope(_month_scope('old'))}
+        {_bump_scope(_month_scope('new'), f"{_month_scope('new')} IS NOT {_month_scope('old')}")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tarefas_month_version_delete AFTER DELETE ON tarefas BEGIN
+        {_bump_scope(_month_scope('old'))}
+    END""",
+]
+
+
+SCHEMA = ([_TABLE]
+          + _triggers('tarefas', 'task_group_id', '')
+          + _triggers('notes', 'task_group_id', '')
+          + _triggers('user_taskgroup', 'taskgroup_id', '')
+          # Nome e descrição do grupo aparecem nas páginas; o id não muda
+          + _triggers('task_groups', 'id', ' OF name, description, admin_id')
+          + _MONTH_TRIGGERS)
+
+# Triggers criados por último (migração 0007): se existem, os demais também
+_TRIGGER_CHECK = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'tarefas_month_version_insert'"
+
+_CHANGES_SQL = text('SELECT scope, version, changed_at FROM change_versions WHERE scope IN :scopes').bindparams(
+    bindparam('scopes', expanding=True))
+
+_VERSIONS_SQL = text('SELECT scope, version FROM change_versions WHERE scope IN :scopes').bindparams(
+    bindparam('scopes', expanding=True))
+
+# Verdadeiro depois que os triggers foram encontrados neste processo
+_installed = False
+
+# Identifica a versão dos templates e do código: um deploy muda todos os ETags
+_build_id = None
+
+
+def install(conn):
+    """Cria a tabela e os triggers (idempotente)."""
+    for statement in SCHEMA:
+        conn.execute(text(statement))
+
+
+def reinstall_triggers(conn):
+    """Recria os triggers com a definição atual (após mudar o SQL de SCHEMA)."""
+    for statement in SCHEMA:
+        match = re.match(r'CREATE TRIGGER IF NOT EXISTS (\w+)', statement)
+        if match:
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {match.group(1)}'))
+    install(conn)
+
+
+def is_installed():
+    """
+    Os triggers existem neste banco?
+
+    Sem eles (banco criado só com create_all) as versões nunca mudariam e
+    os ETags ficariam presos, então o GET condicional é desativado.
+    """
+    global _installed
+    if not _installed:
+        connection = db.session.connection()
+        _installed = (connection.dialect.name == 'sqlite'
+                      and connection.execute(text(_TRIGGER_CHECK)).first() is not None)
+    return _installed
+
+
+def group_versions(group_ids):
+    """Versão atual de cada grupo ({id: versão}; 0 para grupos sem alterações)."""
+    if not group_ids:
+        return {}
+    scopes = [f'group:{int(group_id)}' for group_id in group_ids]
+    rows = db.session.execute(_VERSIONS_SQL, {'scopes': scopes}).all()
+    versions = {scope: version for scope, version in rows}
+    return {int(group_id): versions.get(f'group:{int(group_id)}', 0) for group_id in group_ids}
+
+
+def group_changes(group_ids):
+    """
+    Versão de cada grupo e o instante (UTC) da alteração mais recente entre eles.
+
+    Retorna ({id: versão}, datetime ou None se nenhum grupo foi alterado
+    desde que as datas passaram a ser registradas).
+    """
+    if not group_ids:
+        return {}, None
+    scopes = {f'group:{int(group_id)}': int(group_id) for group_id in group_ids}
+    rows = db.session.execute(_CHANGES_SQL, {'scopes': list(scopes)}).all()
+    versions = dict.fromkeys(scopes.values(), 0)
+    changed = [str(changed_at) for _, _, changed_at in rows if changed_at]
+    for scope, version, _ in rows:
+        versions[scopes[scope]] = version
+    last_changed = None
+    if changed:
+        last_changed = datetime.fromisoformat(max(changed)).replace(tzinfo=timezone.utc)
+    return versions, last_changed
+
+
+def month_versions(group_ids, year, month):
+    """Versão das tarefas de cada grupo no mês ({id: versão}; 0 se nunca alteradas)."""
+    if not group_ids:
+        return {}
+    suffix = f'{year:04d}-{month:02d}'
+    scopes = [f'month:{int(group_id)}:{suffix}' for group_id in group_ids]
+    rows = db.session.execute(_VERSIONS_SQL, {'scopes': scopes}).all()
+    versions = {scope: version for scope, version in rows}
+    return {int(group_id): versions.get(f'month:{int(group_id)}:{suffix}', 0) for group_id in group_ids}
+
+
+def build_id():
+    """Identifica a versão dos templates e do código (muda a cada deploy)."""
+    global _build_id
+    if _build_id is None:
+        root = current_app.root_path
+        mtimes = []
+        for directory, _, files in os.walk(os.path.join(root, current_app.template_folder)):
+            mtimes.extend(os.stat(os.path.join(directory, name)).st_mtime_ns for name in files)
+        mtimes.append(os.stat(os.path.join(root, 'app.py')).st_mtime_ns)
+        _build_id = str(max(mtimes))
+    return _build_id
+
+
+def etag_for(user, group_ids, *params):
+    """
+    ETag da resposta para o usuário, a sessão, os grupos visíveis e os parâmetros.
+
+    As páginas embutem o token CSRF da sessão, então o segredo CSRF da
+    sessão (criado aqui se ainda não existir) entra no ETag: depois de um
+    novo login ou de a sessão expirar, o navegador recebe a página com o
+    token novo em vez de um 304 com o antigo.
+
+    Retorna None quando o GET condicional não se aplica (triggers ausentes
+    ou mensagens flash pendentes, que só aparecem em uma página renderizada).
+    """
+    if '_flashes' in session or not is_installed():
+        return None
+
+    generate_csrf()
+    csrf_secret = session.get(current_app.config['WTF_CSRF_FIELD_NAME'])
+    versions = group_versions(sorted(group_ids))
+    parts = [build_id(), user.id, int(user.is_admin), getattr(user, 'version', 0), csrf_secret,
+             date.today().isoformat(), sorted(versions.items()), params]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def not_modified(etag):
+    """Resposta 304 se o navegador já tem a versão `etag`, senão None."""
+    if etag and etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+        return _cache_headers(response, etag)
+    return None
+
+
+def with_etag(response, etag):
+    """Aplica o ETag (se houver) à resposta gerada pela view."""
+    response = make_response(response)
+    if etag and response.status_code == 200:
+        _cache_headers(response, etag)
+    return response
+
+
+def _cache_headers(response, etag):
+    response.set_etag(etag)
+    # Privado (depende do usuário) e sempre revalidado com o servidor
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def conditional(view):
+    """
+    Decorator de GET condicional para views de leitura dos grupos do usuário.
+
+    O ETag cobre o caminho com a query string (filtros), o usuário, a
+    sessão e as versões de todos os seus grupos (os nomes aparecem nos
+    seletores).
+    Usar abaixo de @login_required.
+    """
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        etag = etag_for(current_user, membership.group_ids(), request.full_path)
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        return with_etag(view(*args, **kwargs), etag)
+    return decorated_view
@@ -12,6 +12,8 @@ Uso: python create_user.py
 
 from app import app, db
 from models import User
+import membership
+import user_cache
 import getpass
 import sys
 
@@ -102,6 +104,7 @@ def change_password():
             # Atualizar senha
             selected_user.set_password(password)
             db.session.commit()
+            user_cache.invalidate()
 
             print(f"\n✅ Senha do usuário '{selected_user.username}' alterada com sucesso!\n")
             return True
@@ -182,6 +185,9 @@ def delete_user():
             username = selected_user.username
             db.session.delete(selected_user)
             db.session.commit()
+            # Remover o usuário dos caches dos workers
+            membership.invalidate()
+            user_cache.invalidate()
 
             print(f"\n✅ Usuário '{username}' deletado com sucesso!\n")
             return True
@@ -233,6 +239,8 @@ def create_admin():
             user.set_password(password)
             db.session.add(user)
             db.session.commit()
+            # O SQLite pode reutilizar o id de um usuário removido
+            user_cache.invalidate()
 
         print(f"\n✅ Administrador '{username}' criado com sucesso!\n")
         return True
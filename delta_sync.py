@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Sincronização incremental de tarefas e notas (/api/v1/sync) para clientes offline.
+
+A tabela `sync_revisions` guarda, para cada tarefa ou nota e cada grupo em
+que ela está, a revisão da última alteração: um número global crescente
+(AUTOINCREMENT), comum a tarefas e notas. Triggers no SQLite a atualizam
+em qualquer escrita (rotas, API em lote, importação, scripts), inclusive
+exclusões: a linha vira uma lápide (`deleted = 1`) com revisão nova. Uma
+tarefa ou nota movida de grupo deixa uma lápide no grupo de origem, para
+que os membros que só veem aquele grupo a retirem.
+
+O cliente guarda o cursor devolvido por cada página e pede só o que mudou
+depois dele, em páginas limitadas, na ordem das revisões. O cursor também
+identifica os grupos do usuário e o horizonte das lápides descartadas
+quando foi emitido: se os grupos mudaram (entrada ou saída de um grupo),
+ou se lápides posteriores ao cursor foram descartadas depois disso
+(`prune`), a resposta recomeça do zero com `reset: true` e o cliente
+substitui os dados locais.
+
+Execute: python delta_sync.py prune --days 90   (descarta lápides antigas)
+"""
+import argparse
+import hashlib
+import heapq
+import re
+import sys
+from datetime import datetime, timedelta
+from itertools import islice
+from sqlalchemy import text
+from sqlalchemy.orm import undefer
+from models import db, Tarefa, Note
+from task_api import task_to_dict
+
+# Alterações por página da sincronização
+SYNC_PAGE_SIZE = 200
+SYNC_MAX_PAGE_SIZE = 1000
+
+# Escopo em change_versions com a revisão até a qual as lápides foram descartadas
+_HORIZON_SCOPE = 'sync:horizon'
+
+KINDS = {'task': Tarefa, 'note': Note}
+
+
+def _track(kind, row, group_column, deleted, when=None):
+    """SQL que registra uma revisão nova da linha no grupo (substituindo a anterior)."""
+    condition = f' AND {when}' if when else ''
+    where = f' WHERE {when}' if when else ''
+    return f"""DELETE FROM sync_revisions WHERE kind = '{kind}' AND entity_id = {row}.id
+            AND group_id = {row}.{group_column}{condition};
+        INSERT INTO sync_revisions (kind, entity_id, group_id, deleted)
+            SELECT '{kind}', {row}.id, {row}.{group_column}, {deleted}{where};"""
+
+
+def _triggers(table, kind):
+    moved = 'new.task_group_id IS NOT old.task_group_id'
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_sync_insert AFTER INSERT ON {table} BEGIN
+            {_track(kind, 'new', 'task_group_id', 0)}
+        END""",
+        # Numa mudança de grupo a lápide do grupo de origem vem antes: quem vê os
+        # dois grupos aplica as revisões em ordem e termina com a linha viva
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_sync_update AFTER UPDATE ON {table} BEGIN
+            {_track(kind, 'old', 'task_group_id', 1, when=moved)}
+            {_track(kind, 'new', 'task_group_id', 0)}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_sync_delete AFTER DELETE ON {table} BEGIN
+            {_track(kind, 'old', 'task_group_id', 1)}
+        END""",
+    ]
+
+
+SCHEMA = ([
+    """CREATE TABLE IF NOT EXISTS sync_revisions (
+        revision INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind VARCHAR(8) NOT NULL,
+        entity_id INTEGER NOT NULL,
+        group_id INTEGER NOT NULL,
+        deleted BOOLEAN NOT NULL DEFAULT 0,
+        changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )""",
+    # Uma linha por (tarefa ou nota, grupo): os triggers substituem a anterior
+    'CREATE UNIQUE INDEX IF NOT EXISTS ix_sync_revisions_entity ON sync_revisions (kind, entity_id, group_id)',
+    'CREATE INDEX IF NOT EXISTS ix_sync_revisions_group ON sync_revisions (group_id, revision)',
+]
+    + _triggers('tarefas', 'task')
+    + _triggers('notes', 'note')
+    + [
+    # Um grupo apagado não é visível para ninguém: suas lápides não servem mais
+    """CREATE TRIGGER IF NOT EXISTS task_groups_sync_delete AFTER DELETE ON task_groups BEGIN
+        DELETE FROM sync_revisions WHERE group_id = old.id;
+    END""",
+])
+
+_BACKFILL = [
+    "INSERT INTO sync_revisions (kind, entity_id, group_id) SELECT 'task', id, task_group_id FROM tarefas ORDER BY id",
+    "INSERT INTO sync_revisions (kind, entity_id, group_id) SELECT 'note', id, task_group_id FROM notes ORDER BY id",
+]
+
+# Uma consulta por grupo, cada uma já ordenada pelo índice (group_id, revision) e
+# limitada à página; juntas por heapq.merge. Com `group_id IN (...)` o SQLite
+# ordenaria todas as revisões posteriores ao cursor a cada página
+_PAGE_SQL = text(
+    'SELECT revision, kind, entity_id, group_id, deleted FROM sync_revisions '
+    'WHERE group_id = :group_id AND revision > :after ORDER BY revision LIMIT :limit')
+
+_HORIZON_SQL = text('SELECT version FROM change_versions WHERE scope = :scope')
+
+_TRIGGER_CHECK = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'tarefas_sync_insert'"
+
+# Verdadeiro depois que os triggers foram encontrados neste processo
+_installed = False
+
+
+class CursorError(ValueError):
+    """Cursor de sincronização malformado."""
+
+
+def install(conn):
+    """Cria a tabela, registra as linhas existentes (banco sem registros) e cria os triggers."""
+    conn.execute(text(SCHEMA[0]))
+    empty = conn.execute(text('SELECT 1 FROM sync_revisions LIMIT 1')).first() is None
+    if empty:
+        for statement in _BACKFILL:
+            conn.execute(text(statement))
+    for statement in SCHEMA[1:]:
+        conn.execute(text(statement))
+
+
+def reinstall_triggers(conn):
+    """Recria os triggers com a definição atual (após mudar o SQL de SCHEMA)."""
+    for statement in SCHEMA:
+        match = re.match(r'CREATE TRIGGER IF NOT EXISTS (\w+)', statement)
+        if match:
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {match.group(1)}'))
+    install(conn)
+
+
+def is_installed():
+    """As revisões da sincronização existem neste banco? (não existem em bancos criados só com create_all)"""
+    global _installed
+    if not _installed:
+        connection = db.session.connection()
+        _installed = (connection.dialect.name == 'sqlite'
+                      and connection.execute(text(_TRIGGER_CHECK)).first() is not None)
+    return _installed
+
+
+def _groups_digest(group_ids):
+    return hashlib.sha1(','.join(str(group_id) for group_id in group_ids).encode()).hexdigest()[:12]
+
+
+def encode_cursor(revision, horizon, group_ids):
+    return f'{revision}.{horizon}.{_groups_digest(group_ids)}'
+
+
+def decode_cursor(value):
+    """Converte o cursor 'revisão.horizonte.grupos' em (revisão, horizonte, digest); CursorError se inválido."""
+    parts = value.split('.')
+    if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit() or not parts[2]:
+        raise CursorError('Cursor inválido.')
+    return int(parts[0]), int(parts[1]), parts[2]
+
+
+def _horizon():
+    return db.session.execute(_HORIZON_SQL, {'scope': _HORIZON_SCOPE}).scalar() or 0
+
+
+def note_to_dict(note):
+    """Representação JSON de uma nota (com o conteúdo)."""
+    return {
+        'id': note.id,
+        'title': note.title,
+        'content': note.content or '',
+        'task_group_id': note.task_group_id,
+        'user_id': note.user_id,
+        'version': note.version,
+        'created_at': note.created_at.isoformat() if note.created_at else None,
+        'updated_at': note.updated_at.isoformat() if note.updated_at else None,
+    }
+
+
+def _load(kind, ids):
+    if not ids:
+        return {}
+    model = KINDS[kind]
+    query = model.query.filter(model.id.in_(ids))
+    if model is Note:
+        query = query.options(undefer(Note.content))
+    return {row.id: row for row in query}
+
+
+def sync_page(group_ids, cursor=None, limit=SYNC_PAGE_SIZE):
+    """
+    Alterações nos grupos `group_ids` posteriores ao cursor, na ordem das revisões.
+
+    Retorna um dict com `changes` (tarefas e notas atuais ou lápides),
+    `cursor` (para a próxima chamada), `has_more` e `reset` (o cliente deve
+    descartar os dados locais antes de aplicar esta página). Lança
+    CursorError se o cursor for malformado.
+    """
+    group_ids = sorted(group_ids)
+    horizon = _horizon()
+    after, reset = 0, False
+    if cursor:
+        after, cursor_horizon, digest = decode_cursor(cursor)
+        # Lápides posteriores ao cursor descartadas depois que ele foi emitido
+        pruned = cursor_horizon < horizon and after < horizon
+        if digest != _groups_digest(group_ids) or pruned:
+            after, reset = 0, True
+
+    per_group = [db.session.execute(_PAGE_SQL, {'group_id': group_id, 'after': after, 'limit': limit + 1}).all()
+                 for group_id in group_ids]
+    rows = list(islice(heapq.merge(*per_group, key=lambda row: row.revision), limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    alive = {kind: [row.entity_id for row in rows if row.kind == kind and not row.deleted] for kind in KINDS}
+    loaded = {kind: _load(kind, ids) for kind, ids in alive.items()}
+    serializers = {'task': task_to_dict, 'note': note_to_dict}
+
+    changes = []
+    for row in rows:
+        change = {'type': row.kind, 'id': row.entity_id, 'group_id': row.group_id,
+                  'revision': row.revision, 'deleted': bool(row.deleted)}
+        if not row.deleted:
+            entity = loaded[row.kind].get(row.entity_id)
+            if entity is None:
+                continue
+            change[row.kind] = serializers[row.kind](entity)
+        changes.append(change)
+
+    return {
+        'changes': changes,
+        'cursor': encode_cursor(rows[-1].revision if rows else after, horizon, group_ids),
+        'has_more': has_more,
+        'reset': reset,
+        'groups': group_ids,
+    }
+
+
+def prune(days):
+    """
+    Descarta as lápides com mais de `days` dias.
+
+    Clientes com cursor anterior às lápides descartadas recebem `reset`
+    na próxima sincronização. Retorna o número de lápides removidas.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    horizon = db.session.execute(text('SELECT max(revision) FROM sync_revisions WHERE changed_at < :cutoff'),
+                                 {'cutoff': cutoff}).scalar()
+    if horizon is None:
+        return 0
+    removed = db.session.execute(text('DELETE FROM sync_revisions WHERE deleted = 1 AND revision <= :horizon'),
+                                 {'horizon': horizon}).rowcount
+    db.session.execute(text('INSERT INTO change_versions (scope, version, changed_at) '
+                            'VALUES (:scope, :horizon, CURRENT_TIMESTAMP) ON CONFLICT (scope) DO UPDATE '
+                            'SET version = max(version, excluded.version), changed_at = CURRENT_TIMESTAMP'),
+                       {'scope': _HORIZON_SCOPE, 'horizon': horizon})
+    db.session.commit()
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manutenção da sincronização incremental.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    prune_parser = subparsers.add_parser('prune', help='descarta lápides antigas')
+    prune_parser.add_argument('--days', type=int, default=90, help='idade mínima das lápides descartadas')
+    args = parser.parse_args()
+
+    from app import app
+    from sqlite_profile import write_transaction
+
+    with app.app_context(), write_transaction():
+        if not is_installed():
+            print('✗ Sincronização não instalada: execute as migrações do banco', file=sys.stderr)
+            sys.exit(1)
+        removed = prune(args.days)
+    print(f'✓ {removed} lápide(s) com mais de {args.days} dias descartada(s)')
+
+
+if __name__ == '__main__':
+    main()
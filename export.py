@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Exportação das tarefas e notas de um grupo em CSV ou JSON lines.
+
+As linhas são lidas do banco em blocos (`yield_per`, sem carregar o grupo
+inteiro em memória) e convertidas em bytes à medida que chegam, de modo
+que a rota de exportação responde com um gerador e a memória usada não
+depende do tamanho do grupo. A compressão gzip, opcional, também é feita
+em fluxo.
+
+O CSV começa com BOM UTF-8 para que o Excel reconheça os acentos.
+
+Execute: python export.py tasks --group 3 --format csv > tarefas.csv
+         python export.py notes --group 3 --format jsonl --gzip -o notas.jsonl.gz
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime
+from sqlalchemy import select
+from models import db, User, Tarefa, Note
+
+FORMATS = ('csv', 'jsonl')
+
+# Tipo de exportação -> (colunas, linhas por bloco lido do banco)
+EXPORTS = {
+    'tasks': ([Tarefa.id, Tarefa.data, Tarefa.descricao, Tarefa.user_id,
+               User.username.label('autor'), Tarefa.created_at], 1000),
+    # Notas podem ter centenas de KB de conteúdo: blocos menores
+    'notes': ([Note.id, Note.title, Note.content, Note.user_id, User.username.label('autor'),
+               Note.created_at, Note.updated_at, Note.version], 100),
+}
+
+_CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson'}
+
+
+def _statement(kind, group_id):
+    columns, chunk_size = EXPORTS[kind]
+    model = Tarefa if kind == 'tasks' else Note
+    order = (Tarefa.data, Tarefa.id) if kind == 'tasks' else (Note.id,)
+    return (select(*columns)
+            .join(User, User.id == model.user_id)
+            .where(model.task_group_id == group_id)
+            .order_by(*order)
+            .execution_options(yield_per=chunk_size))
+
+
+def fields(kind):
+    """Nomes das colunas exportadas."""
+    return [column.key for column in EXPORTS[kind][0]]
+
+
+def _partitions(kind, group_id):
+    """Blocos de linhas do grupo, lidos sob demanda do cursor."""
+    result = db.session.execute(_statement(kind, group_id))
+    yield from result.partitions()
+
+
+def _value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunks(partitions, names):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _jsonl_chunks(partitions, names):
+    for rows in partitions:
+        lines = [json.dumps(dict(zip(names, map(_value, row))), ensure_ascii=False) for row in rows]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Comprime em gzip, em fluxo, uma sequência de blocos de bytes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = cabeçalho gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(kind, group_id, fmt, compress=False):
+    """
+    Gerador de blocos de bytes com a exportação de `kind` ('tasks' ou 'notes').
+
+    Deve ser consumido dentro do contexto da aplicação (na rota, com
+    stream_with_context). Lança ValueError para tipo ou formato inválidos.
+    """
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise ValueError('Tipo ou formato de exportação inválido.')
+
+    encode = _csv_chunks if fmt == 'csv' else _jsonl_chunks
+    chunks = encode(_partitions(kind, group_id), fields(kind))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def content_type(fmt, compress=False):
+    return 'application/gzip' if compress else _CONTENT_TYPES[fmt]
+
+
+def filename(kind, group_id, fmt, compress=False):
+    name = f"{'tarefas' if kind == 'tasks' else 'notas'}-grupo-{group_id}.{fmt}"
+    return name + '.gz' if compress else name
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exporta as tarefas ou notas de um grupo.')
+    parser.add_argument('kind', choices=sorted(EXPORTS), help='o que exportar')
+    parser.add_argument('--group', type=int, required=True, help='id do grupo')
+    parser.add_argument('--format', choices=FORMATS, default='csv', help='formato (padrão: csv)')
+    parser.add_argument('--gzip', action='store_true', help='comprimir a saída com gzip')
+    parser.add_argument('-o', '--output', help='arquivo de saída (padrão: saída padrão)')
+    args = parser.parse_args()
+
+    from app import app
+    from models import TaskGroup
+
+    with app.app_context():
+        if db.session.get(TaskGroup, args.group) is None:
+            print(f'✗ Grupo {args.group} não encontrado', file=sys.stderr)
+            sys.exit(1)
+
+        output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for chunk in export_chunks(args.kind, args.group, args.format, args.gzip):
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+
+    if args.output:
+        print(f'✓ Exportação gravada em {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,10 @@
 Formulários da aplicação usando Flask-WTF para proteção CSRF e validação.
 """
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, TextAreaField, DateField, SelectField, HiddenField
-from wtforms.validators import DataRequired, Length, EqualTo, ValidationError
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import (StringField, PasswordField, TextAreaField, DateField, SelectField, BooleanField,
+                     SelectMultipleField, HiddenField)
+from wtforms.validators import DataRequired, Length, EqualTo, ValidationError, AnyOf
 from models import User
 
 
@@ -66,6 +68,16 @@ class EditTaskForm(FlaskForm):
     ], coerce=int)
 
 
+class ImportTasksForm(FlaskForm):
+    """Formulário de importação de tarefas (CSV ou .ics)"""
+    arquivo = FileField('Arquivo (.csv ou .ics)', validators=[
+        FileRequired(message='Selecione um arquivo.'),
+        FileAllowed(['csv', 'ics'], message='Envie um arquivo .csv ou .ics.')
+    ])
+    task_group_id = SelectField('Grupo das tarefas sem grupo no arquivo', coerce=int)
+    dry_run = BooleanField('Apenas simular (validar sem gravar)', default=True)
+
+
 class TaskGroupForm(FlaskForm):
     """Formulário para criar/editar grupos de tarefas"""
     name = StringField('Nome do Grupo', validators=[
@@ -83,6 +95,13 @@ class DeleteForm(FlaskForm):
 
 
 class ManageMemberForm(FlaskForm):
-    """Formulário para adicionar/remover membros de grupos"""
-    action = HiddenField('Ação', validators=[DataRequired()])
-    user_id = SelectField('Usuário', validators=[DataRequired()], coerce=int)
+    """
+    Formulário para adicionar/remover membros de grupos (um ou vários de uma vez).
+
+    Os usuários não são listados como choices: a existência e o
+    pertencimento são verificados em SQL na própria operação em lote.
+    """
+    action = HiddenField('Ação', validators=[DataRequired(), AnyOf(['add', 'remove'])])
+    user_id = SelectMultipleField('Usuários', coerce=int, validate_choice=False, validators=[
+        DataRequired(message='Selecione ao menos um usuário.')
+    ])
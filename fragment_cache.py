@@ -0,0 +1,160 @@
+"""
+Cache dos blocos de mês já renderizados da linha do tempo.
+
+Meses passados quase nunca mudam, mas cada visita à linha do tempo
+consultava e renderizava de novo as linhas de cada mês exibido. Aqui o
+HTML do bloco (primeira página do mês) e o cursor da página seguinte são
+guardados uma vez e reaproveitados.
+
+A chave cobre tudo o que aparece no bloco:
+
+- o conjunto de grupos exibidos, com seus nomes
+- os filtros (grupo e usuário) e o mês
+- a versão das tarefas de cada grupo naquele mês, mantida por triggers
+  (change_versions.month_versions); uma escrita em uma tarefa muda só a
+  versão do seu mês, e os demais meses continuam no cache
+- a geração dos usuários (nomes dos autores) e a versão do código
+
+Quem vê não entra na chave: usuários com os mesmos grupos (ou o mesmo
+grupo selecionado) compartilham os blocos. A única parte pessoal do
+bloco, o autor "Você" nas próprias tarefas, é aplicada depois da leitura
+do cache por `for_viewer`.
+
+Entradas antigas nunca são lidas de novo (a chave muda) e saem pelo LRU.
+
+Dois níveis: um LRU limitado em memória por worker e, opcionalmente
+(FRAGMENT_CACHE_DISK), um diretório compartilhado por todos os workers
+do gunicorn, com um arquivo por bloco.
+"""
+import hashlib
+import json
+import os
+from flask import current_app
+from flask_login import current_user
+from markupsafe import Markup, escape
+from cache import LRUCache, default_cache_dir
+import change_versions
+import membership
+from queries import month_key
+
+_memory = None
+_disk = None
+
+
+class DiskStore:
+    """
+    Blocos renderizados em arquivos JSON, um por chave.
+
+    A gravação é atômica (arquivo temporário + rename), então workers
+    concorrentes nunca leem um arquivo pela metade. A cada `prune_every`
+    gravações, os arquivos mais antigos além de `max_files` são apagados.
+    """
+
+    def __init__(self, directory, max_files=5000, prune_every=100):
+        self.directory = directory
+        self.max_files = max_files
+        self.prune_every = prune_every
+        self._writes = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return tuple(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self._path(key)}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(list(value), f)
+        os.replace(tmp_path, self._path(key))
+
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        """Apaga os arquivos mais antigos além de `max_files`."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_files, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # outro worker apagou primeiro
+
+
+def _stores():
+    global _memory, _disk
+    if _memory is None:
+        config = current_app.config
+        _memory = LRUCache(maxsize=config.get('FRAGMENT_CACHE_SIZE', 512))
+        if config.get('FRAGMENT_CACHE_DISK'):
+            _disk = DiskStore(os.path.join(default_cache_dir(current_app), 'fragments'),
+                              max_files=config.get('FRAGMENT_CACHE_DISK_MAX_FILES', 5000))
+    return _memory, _disk
+
+
+def _key(group_ids, year, month, selected_group_id, selected_user_id):
+    # Mesmo critério do filtro de grupo das consultas da linha do tempo
+    if selected_group_id and selected_group_id in group_ids:
+        scope_ids = [selected_group_id]
+    else:
+        scope_ids = sorted(group_ids)
+
+    names = {group.id: group.name for group in membership.groups()}
+    versions = change_versions.month_versions(scope_ids, year, month)
+    # A versão do retrato do usuário é a geração atual dos usuários (user_cache)
+    parts = [change_versions.build_id(), month_key(year, month), selected_group_id, selected_user_id,
+             [(group_id, names.get(group_id), versions[group_id]) for group_id in scope_ids],
+             getattr(current_user, 'version', 0)]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def for_viewer(html):
+    """Linhas de tarefas (_tarefas_linhas.html) com o autor "Você" nas tarefas do usuário atual."""
+    cell = f'<td class="task-author" data-user-id="{current_user.id}">'
+    own = f'{cell}{escape(current_user.username)}</td>'
+    return Markup(str(html).replace(own, f'{cell}<strong>Você</strong></td>'))
+
+
+def month_block(group_ids, year, month, selected_group_id, selected_user_id, render):
+    """
+    HTML do bloco do mês (já com `for_viewer`) e cursor da próxima página,
+    do cache ou de `render()`.
+
+    `render` é chamado sem argumentos quando o bloco não está no cache e
+    deve retornar (html, next_cursor). Sem os triggers de versão (banco
+    criado só com create_all) o cache é ignorado.
+    """
+    if not change_versions.is_installed():
+        html, next_cursor = render()
+        return for_viewer(html), next_cursor
+
+    memory, disk = _stores()
+    key = _key(group_ids, year, month, selected_group_id, selected_user_id)
+
+    value = memory.get(key)
+    if value is None and disk is not None:
+        value = disk.get(key)
+        if value is not None:
+            memory.set(key, value)
+    if value is None:
+        html, next_cursor = render()
+        value = (str(html), next_cursor)
+        memory.set(key, value)
+        if disk is not None:
+            disk.set(key, value)
+
+    html, next_cursor = value
+    return for_viewer(html), next_cursor
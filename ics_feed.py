@@ -0,0 +1,197 @@
+"""
+Feeds iCalendar (.ics) das tarefas, para assinatura em aplicativos de calendário.
+
+Cada usuário tem um token secreto (users.feed_token) que autentica as URLs
+de assinatura, sem sessão nem senha: o feed pessoal (todos os grupos do
+usuário) e um feed por grupo. Trocar o token invalida os links antigos.
+
+Os aplicativos consultam o feed a cada poucos minutos. Para que isso não
+custe uma consulta de todas as tarefas a cada vez:
+
+- o ETag e o Last-Modified vêm das versões dos grupos (change_versions),
+  então uma consulta sem alterações recebe 304 após uma leitura por chave
+  primária;
+- os eventos de cada grupo são gerados em fluxo (yield_per) e guardados
+  em um LRU por (grupo, versão, janela); o feed pessoal junta os blocos
+  dos grupos, e só o grupo alterado é gerado de novo.
+
+Só entram as tarefas dentro da janela de datas configurada
+(ICS_FEED_PAST_DAYS para trás e ICS_FEED_FUTURE_DAYS para frente).
+"""
+import hashlib
+import secrets
+from datetime import date, datetime, time, timedelta, timezone
+from flask import current_app, request
+from sqlalchemy import select
+from werkzeug.http import is_resource_modified
+from cache import LRUCache, generation_counter
+from models import db, User, Tarefa
+import change_versions
+
+# Tarefas lidas do banco por bloco ao gerar os eventos de um grupo
+EVENTS_CHUNK_SIZE = 500
+
+# Intervalo de atualização sugerido aos aplicativos de calendário
+REFRESH_INTERVAL = 'PT15M'
+
+_blocks = None
+
+
+def _block_cache():
+    global _blocks
+    if _blocks is None:
+        _blocks = LRUCache(maxsize=current_app.config.get('ICS_FEED_CACHE_SIZE', 256))
+    return _blocks
+
+
+# ============= TOKENS =============
+
+def new_token(user_id):
+    """Gera e grava um novo token para o usuário (o anterior deixa de valer)."""
+    token = secrets.token_urlsafe(24)
+    User.query.filter(User.id == user_id).update({'feed_token': token}, synchronize_session=False)
+    db.session.commit()
+    return token
+
+
+def token_for(user_id):
+    """Token atual do usuário (None se ainda não foi gerado)."""
+    return db.session.query(User.feed_token).filter(User.id == user_id).scalar()
+
+
+def user_for_token(token):
+    """(id, username) do dono do token; None se o token não existir."""
+    if not token:
+        return None
+    return db.session.query(User.id, User.username).filter(User.feed_token == token).first()
+
+
+# ============= ICALENDAR =============
+
+def window(today=None):
+    """Datas (inclusivas) das tarefas que entram no feed."""
+    today = today or date.today()
+    config = current_app.config
+    return (today - timedelta(days=config.get('ICS_FEED_PAST_DAYS', 90)),
+            today + timedelta(days=config.get('ICS_FEED_FUTURE_DAYS', 365)))
+
+
+def escape_text(value):
+    """Escapa um valor de texto (RFC 5545, 3.3.11)."""
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n'))
+
+
+def fold(line):
+    """Quebra a linha em partes de até 75 bytes, sem dividir caracteres UTF-8."""
+    parts, current, size = [], [], 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        # Linhas de continuação começam com um espaço, que conta no limite
+        if size + width > 75:
+            parts.append(''.join(current))
+            current, size = [' '], 1
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def _event(row, group_name, host):
+    summary = row.descricao.strip().splitlines()[0] if row.descricao.strip() else ''
+    description = f'{row.descricao}\n\nGrupo: {group_name}\nCriado por: {row.username}'
+    stamp = row.created_at.strftime('%Y%m%dT%H%M%SZ') if row.created_at else '19700101T000000Z'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:tarefa-{row.id}@{host}',
+        f'DTSTAMP:{stamp}',
+        f"DTSTART;VALUE=DATE:{row.data.strftime('%Y%m%d')}",
+        f"DTEND;VALUE=DATE:{(row.data + timedelta(days=1)).strftime('%Y%m%d')}",
+        f'SUMMARY:{escape_text(summary)}',
+        f'DESCRIPTION:{escape_text(description)}',
+        f'CATEGORIES:{escape_text(group_name)}',
+        'TRANSP:TRANSPARENT',
+        'END:VEVENT',
+    ]
+    return ''.join(fold(line) for line in lines)
+
+
+def _group_events(group, start, end, host):
+    """Gera, em blocos de bytes, os VEVENTs das tarefas do grupo na janela."""
+    statement = (select(Tarefa.id, Tarefa.data, Tarefa.descricao, Tarefa.created_at, User.username)
+                 .join(User, User.id == Tarefa.user_id)
+                 .where(Tarefa.task_group_id == group.id, Tarefa.data >= start, Tarefa.data <= end)
+                 .order_by(Tarefa.data, Tarefa.id)
+                 .execution_options(yield_per=EVENTS_CHUNK_SIZE))
+    for rows in db.session.execute(statement).partitions():
+        yield ''.join(_event(row, group.name, host) for row in rows).encode('utf-8')
+
+
+def _group_block(group, version, start, end, host, users_generation):
+    """Eventos do grupo, do cache quando a versão do grupo não mudou."""
+    if version is None:
+        return b''.join(_group_events(group, start, end, host))
+
+    key = (group.id, group.name, version, start, end, host, users_generation)
+    block = _block_cache().get(key)
+    if block is None:
+        block = b''.join(_group_events(group, start, end, host))
+        _block_cache().set(key, block)
+    return block
+
+
+def _calendar(name, blocks):
+    header = ''.join(fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Agenda de Tarefas//PT-BR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+        f'X-PUBLISHED-TTL:{REFRESH_INTERVAL}',
+        f'REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}',
+    ])
+    yield header.encode('utf-8')
+    yield from blocks
+    yield b'END:VCALENDAR\r\n'
+
+
+def feed_response(name, groups):
+    """
+    Resposta com o feed dos grupos (GroupRef), ou 304 se o cliente já o tem.
+
+    Sem os triggers de versão (banco criado só com create_all), o feed é
+    gerado a cada consulta e o ETag é calculado a partir do conteúdo.
+    """
+    start, end = window()
+    host = request.host
+    response = current_app.response_class(mimetype='text/calendar')
+    response.headers['Cache-Control'] = 'private, no-cache'
+
+    if not change_versions.is_installed():
+        blocks = (_group_block(group, None, start, end, host, None) for group in groups)
+        response.set_data(b''.join(_calendar(name, blocks)))
+        response.add_etag()
+        return response.make_conditional(request)
+
+    versions, last_changed = change_versions.group_changes([group.id for group in groups])
+    users_generation = generation_counter(current_app, 'users').current()
+
+    # Para clientes que só enviam If-Modified-Since: a janela muda a cada
+    # dia e a lista de grupos muda com a geração "membership"
+    candidates = [last_changed, datetime.combine(date.today(), time(), tzinfo=timezone.utc),
+                  generation_counter(current_app, 'membership').changed_at()]
+    last_modified = max(moment for moment in candidates if moment is not None)
+    parts = [name, host, start, end, users_generation,
+             [(group.id, group.name, versions[group.id]) for group in groups]]
+    etag = hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response.status_code = 304
+        return response
+
+    blocks = (_group_block(group, versions[group.id], start, end, host, users_generation) for group in groups)
+    response.set_data(b''.join(_calendar(name, blocks)))
+    return response
@@ -2,17 +2,21 @@
 """
 Script para inicializar o banco de dados
 Execute: python init_db.py
+
+Mantido por compatibilidade: equivale a `python migrations.py`, que cria
+as tabelas em um banco novo e aplica as migrações pendentes em um banco
+existente.
 """
 
 import sys
 from app import app, db
+from migrations import upgrade
 
 def init_database():
-    """Cria as tabelas do banco de dados"""
+    """Cria as tabelas e aplica as migrações pendentes"""
     try:
         with app.app_context():
-            # Criar todas as tabelas (não faz nada se já existirem)
-            db.create_all()
+            upgrade(db.engine)
             print("✓ Banco de dados inicializado com sucesso!")
             print(f"✓ Arquivo: {app.config['SQLALCHEMY_DATABASE_URI']}")
     except Exception as e:
@@ -0,0 +1,370 @@
+"""
+Eventos de alteração enviados ao navegador em tempo real (Server-Sent Events).
+
+As páginas de tarefas e notas assinam /eventos e se atualizam sozinhas
+quando outro membro do grupo cria, edita ou apaga uma tarefa ou nota, em
+vez de depender de recarregamentos.
+
+O "broker" entre os workers do gunicorn é a própria base SQLite: triggers
+gravam cada alteração na tabela `change_log` (id crescente, grupo, tipo,
+linha afetada), qualquer que seja o caminho da escrita (ORM, UPDATE em
+lote, importação, scripts). Em cada worker, uma única thread (o hub) lê as
+linhas novas a cada LIVE_EVENTS_POLL_INTERVAL segundos, por faixa de chave
+primária, e acorda as conexões abertas; cada conexão filtra os eventos
+dos grupos do seu usuário. O custo de leitura é, portanto, uma consulta
+por worker por intervalo, independente do número de assinantes.
+
+O id da última linha entregue vai no campo `id` do SSE: ao reconectar, o
+navegador o envia em Last-Event-ID e recebe o que perdeu (do buffer do hub
+ou, se já saiu dele, da tabela). Se nem a tabela tem mais esses eventos, a
+página é avisada para recarregar ("resync"). A tabela guarda apenas as
+últimas LOG_SIZE alterações (um trigger apaga as antigas em lotes).
+
+Cada conexão ocupa uma thread do worker (gunicorn com --worker-class
+gthread) e é encerrada após LIVE_EVENTS_STREAM_SECONDS; o navegador
+reconecta sozinho. Acima de LIVE_EVENTS_MAX_STREAMS conexões por worker a
+assinatura é recusada com 503, sem tomar as threads das páginas.
+"""
+import json
+import threading
+import time
+from collections import deque
+from sqlalchemy import text
+from models import db
+
+# Alterações mantidas em change_log (as mais antigas são apagadas em lotes de PRUNE_BATCH)
+LOG_SIZE = 50000
+PRUNE_BATCH = 1000
+
+# Eventos recentes guardados em memória pelo hub de cada worker
+BUFFER_SIZE = 5000
+
+# Linhas lidas por consulta do hub
+READ_BATCH = 1000
+
+# Eventos distintos por mensagem; acima disso a página recarrega (ex.: importação em massa)
+MAX_EVENTS_PER_MESSAGE = 200
+
+# Espera do navegador antes de reconectar (milissegundos)
+RETRY_MS = 3000
+
+_TABLE = """CREATE TABLE IF NOT EXISTS change_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind VARCHAR(32) NOT NULL,
+    group_id INTEGER NOT NULL,
+    entity_id INTEGER,
+    user_id INTEGER,
+    month VARCHAR(7),
+    version INTEGER,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)"""
+
+
+def _log(kind, group, entity='NULL', user='NULL', month='NULL', version='NULL', when=None):
+    where = f' WHERE {when}' if when else ''
+    return (f"INSERT INTO change_log (kind, group_id, entity_id, user_id, month, version) "
+            f"SELECT '{kind}', {group}, {entity}, {user}, {month}, {version}{where};")
+
+
+def _task_month(row):
+    return f"strftime('%Y-%m', {row}.data)"
+
+
+SCHEMA = [
+    _TABLE,
+
+    # Tarefas: uma tarefa que muda de grupo ou de mês gera um evento para
+    # cada lado, para que as duas linhas do tempo sejam atualizadas
+    f"""CREATE TRIGGER IF NOT EXISTS tarefas_change_log_insert AFTER INSERT ON tarefas BEGIN
+        {_log('task.created', 'new.task_group_id', 'new.id', 'new.user_id', _task_month('new'))}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tarefas_change_log_update AFTER UPDATE ON tarefas BEGIN
+        {_log('task.updated', 'old.task_group_id', 'old.id', 'old.user_id', _task_month('old'))}
+        {_log('task.updated', 'new.task_group_id', 'new.id', 'new.user_id', _task_month('new'),
+              when=f"new.task_group_id IS NOT old.task_group_id OR {_task_month('new')} IS NOT {_task_month('old')}")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tarefas_change_log_delete AFTER DELETE ON tarefas BEGIN
+        {_log('task.deleted', 'old.task_group_id', 'old.id', 'old.user_id', _task_month('old'))}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS notes_change_log_insert AFTER INSERT ON notes BEGIN
+        {_log('note.created', 'new.task_group_id', 'new.id', 'new.user_id', version='new.version')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notes_change_log_update AFTER UPDATE ON notes BEGIN
+        {_log('note.deleted', 'old.task_group_id', 'old.id', 'old.user_id',
+              when='new.task_group_id IS NOT old.task_group_id')}
+        {_log('note.updated', 'new.task_group_id', 'new.id', 'new.user_id', version='new.version')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notes_change_log_delete AFTER DELETE ON notes BEGIN
+        {_log('note.deleted', 'old.task_group_id', 'old.id', 'old.user_id')}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS user_taskgroup_change_log_insert AFTER INSERT ON user_taskgroup BEGIN
+        {_log('member.added', 'new.taskgroup_id', user='new.user_id')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS user_taskgroup_change_log_delete AFTER DELETE ON user_taskgroup BEGIN
+        {_log('member.removed', 'old.taskgroup_id', user='old.user_id')}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS task_groups_change_log_update
+        AFTER UPDATE OF name, description, admin_id ON task_groups BEGIN
+        {_log('group.updated', 'new.id')}
+    END""",
+
+    # Mantém só as últimas LOG_SIZE linhas, apagando em lotes (uma vez a cada PRUNE_BATCH inserções)
+    f"""CREATE TRIGGER IF NOT EXISTS change_log_prune AFTER INSERT ON change_log
+        WHEN new.id % {PRUNE_BATCH} = 0 BEGIN
+        DELETE FROM change_log WHERE id <= new.id - {LOG_SIZE};
+    END""",
+]
+
+_COLUMNS = 'id, kind, group_id, entity_id, user_id, month, version'
+
+_READ_SQL = text(f'SELECT {_COLUMNS} FROM change_log WHERE id > :after ORDER BY id LIMIT :limit')
+
+_HEAD_SQL = text('SELECT coalesce(max(id), 0) FROM change_log')
+
+_OLDEST_SQL = text('SELECT min(id) FROM change_log')
+
+_TRIGGER_CHECK = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'tarefas_change_log_insert'"
+
+# Verdadeiro depois que os triggers foram encontrados neste processo
+_installed = False
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def install(conn):
+    """Cria a tabela e os triggers (idempotente)."""
+    for statement in SCHEMA:
+        conn.execute(text(statement))
+
+
+def is_installed():
+    """O log de alterações existe neste banco? (não existe em bancos criados só com create_all)"""
+    global _installed
+    if not _installed:
+        connection = db.session.connection()
+        _installed = (connection.dialect.name == 'sqlite'
+                      and connection.execute(text(_TRIGGER_CHECK)).first() is not None)
+    return _installed
+
+
+def _event(row):
+    event = {'type': row.kind, 'group_id': row.group_id}
+    if row.entity_id is not None:
+        event['id'] = row.entity_id
+    if row.user_id is not None:
+        event['user_id'] = row.user_id
+    if row.month is not None:
+        event['month'] = row.month
+    if row.version is not None:
+        event['version'] = row.version
+    return row.id, event
+
+
+class Hub:
+    """
+    Leitor de change_log compartilhado pelas conexões SSE de um worker.
+
+    A thread só consulta o banco enquanto houver assinantes. O buffer
+    guarda os últimos BUFFER_SIZE eventos; `complete_after` é o id a
+    partir do qual ele está completo (eventos anteriores só na tabela).
+    """
+
+    def __init__(self, app, poll_interval=0.5):
+        self.app = app
+        self.poll_interval = poll_interval
+        self.condition = threading.Condition()
+        self.buffer = deque(maxlen=BUFFER_SIZE)
+        self.head = 0
+        self.complete_after = 0
+        self.subscribers = 0
+        self._idle = True
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def _execute(self, statement, params=None):
+        with self.app.app_context(), db.engine.connect() as conn:
+            return conn.execute(statement, params or {}).all()
+
+    def subscribe(self, max_subscribers):
+        """Registra um assinante; False se o worker já está no limite."""
+        with self.condition:
+            if self.subscribers >= max_subscribers:
+                return False
+            self.subscribers += 1
+
+        # Os demais assinantes esperam aqui até o hub ler o fim da tabela,
+        # para não partirem de um cursor defasado
+        try:
+            with self._start_lock:
+                if self._idle:
+                    self._restart()
+        except Exception:
+            self.unsubscribe()
+            raise
+        return True
+
+    def unsubscribe(self):
+        with self.condition:
+            self.subscribers -= 1
+            if not self.subscribers:
+                self._idle = True
+
+    def _restart(self):
+        # Em repouso a thread não lê a tabela: recomeça do fim dela
+        head = self._execute(_HEAD_SQL)[0][0]
+        with self.condition:
+            self.buffer.clear()
+            self.head = self.complete_after = head
+            self._idle = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='live-events', daemon=True)
+                self._thread.start()
+            self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.subscribers > 0)
+            time.sleep(self.poll_interval)
+            try:
+                rows = self._execute(_READ_SQL, {'after': self.head, 'limit': READ_BATCH})
+            except Exception:
+                self.app.logger.exception('Erro ao ler change_log')
+                continue
+            if rows:
+                self._publish([_event(row) for row in rows])
+
+    def _publish(self, events):
+        with self.condition:
+            # Leitura iniciada antes de um _restart: descarta o que já ficou para trás
+            events = [event for event in events if event[0] > self.head]
+            if not events:
+                return
+            for event in events:
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.complete_after = self.buffer[0][0]
+                self.buffer.append(event)
+            self.head = events[-1][0]
+            self.condition.notify_all()
+
+    def wait(self, cursor, timeout):
+        """Espera até haver eventos depois de `cursor` (ou o tempo acabar)."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.head > cursor, timeout)
+            return self.head
+
+    def events_after(self, cursor):
+        """
+        Eventos com id > cursor até o fim do buffer.
+
+        Retorna None se o cursor é anterior ao buffer e os eventos
+        precisam ser lidos da tabela.
+        """
+        with self.condition:
+            if cursor < self.complete_after:
+                return None
+            return [event for event in self.buffer if event[0] > cursor]
+
+    def read_after(self, cursor, limit):
+        """
+        Eventos com id > cursor lidos da tabela (reconexão após um tempo longo).
+
+        Retorna None se alguns já foram apagados ou se passam de `limit`.
+        """
+        oldest = self._execute(_OLDEST_SQL)[0][0]
+        if oldest is not None and oldest > cursor + 1:
+            return None
+        rows = self._execute(_READ_SQL, {'after': cursor, 'limit': limit + 1})
+        if len(rows) > limit:
+            return None
+        return [_event(row) for row in rows]
+
+
+def hub(app):
+    """Hub do worker atual (criado no primeiro uso)."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = Hub(app, poll_interval=app.config.get('LIVE_EVENTS_POLL_INTERVAL', 0.5))
+        return _hub
+
+
+def _visible(event, user_id, group_ids):
+    if event['type'].startswith('member.'):
+        # A página só se importa com a entrada ou saída do próprio usuário
+        return event['user_id'] == user_id
+    return event['group_id'] in group_ids
+
+
+def coalesce(events):
+    """
+    Junta eventos redundantes de uma mensagem.
+
+    Para a linha do tempo basta saber quais meses de quais grupos mudaram;
+    de uma nota, só importa o último estado.
+    """
+    merged = {}
+    for event in events:
+        if event['type'].startswith('task.'):
+            key = ('task', event['group_id'], event['month'])
+        elif event['type'].startswith('note.'):
+            key = ('note', event['id'])
+        else:
+            key = (event['type'], event['group_id'], event.get('user_id'))
+        merged.pop(key, None)
+        merged[key] = event
+    return list(merged.values())
+
+
+def _message(event_name, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_name}')
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream(app, user_id, group_ids, cursor, ready=None, duration=300, heartbeat=15):
+    """
+    Gera as mensagens SSE de um assinante já registrado no hub.
+
+    `cursor` é o id do último evento que o navegador já tem. Em uma
+    conexão nova, `ready` traz as versões atuais dos grupos, para a página
+    conferir se mudou algo entre o carregamento e a assinatura. Quem
+    chama libera o assinante (Hub.unsubscribe) quando a resposta é fechada.
+    """
+    live = hub(app)
+    deadline = time.monotonic() + duration
+    yield f'retry: {RETRY_MS}\n\n'
+    if ready is not None:
+        yield _message('ready', ready, cursor)
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+
+        head = live.wait(cursor, min(heartbeat, remaining))
+        if head <= cursor:
+            yield ': ping\n\n'
+            continue
+
+        events = live.events_after(cursor)
+        if events is None:
+            events = live.read_after(cursor, MAX_EVENTS_PER_MESSAGE * 10)
+        if events is None:
+            yield _message('resync', {}, head)
+            return
+
+        cursor = events[-1][0] if events else head
+        visible = coalesce([event for _, event in events if _visible(event, user_id, group_ids)])
+        if len(visible) > MAX_EVENTS_PER_MESSAGE:
+            yield _message('resync', {}, cursor)
+            return
+        if visible:
+            yield _message('changes', visible, cursor)
@@ -0,0 +1,94 @@
+"""
+Serviço de pertencimento a grupos usado nas verificações de autorização.
+
+Resolve os grupos de um usuário uma única vez por requisição (em `g`) e
+mantém entre requisições um cache em processo, carimbado com a geração do
+contador compartilhado "membership". Qualquer alteração de membros, nome
+ou existência de grupos deve chamar `invalidate()` após o commit; isso
+incrementa a geração e invalida as entradas em todos os workers.
+
+Assim, verificações como "a nota pertence a um grupo do usuário?" viram
+um teste em um frozenset, sem consulta ao banco na maioria das requisições.
+"""
+from collections import namedtuple
+from flask import current_app, g
+from flask_login import current_user
+from cache import LRUCache, generation_counter
+from models import db, TaskGroup, user_taskgroup
+from queries import member_directory
+
+# Grupo resumido (usado nos filtros e seletores dos templates)
+GroupRef = namedtuple('GroupRef', ['id', 'name'])
+
+# user_id -> (geração, grupos, ids dos grupos)
+_cache = LRUCache(maxsize=4096)
+
+# frozenset de ids de grupos -> (geração, membros)
+_members_cache = LRUCache(maxsize=1024)
+
+
+def _counter():
+    return generation_counter(current_app, 'membership')
+
+
+def _generation():
+    # Lida uma vez por requisição
+    if '_membership_generation' not in g:
+        g._membership_generation = _counter().current()
+    return g._membership_generation
+
+
+def _resolve(user_id):
+    per_request = g.setdefault('_membership', {})
+    if user_id in per_request:
+        return per_request[user_id]
+
+    # A geração é lida antes da consulta: se mudar no meio, a entrada
+    # gravada já nasce desatualizada e é descartada na próxima leitura
+    generation = _generation()
+    entry = _cache.get(user_id)
+    if entry is None or entry[0] != generation:
+        rows = (db.session.query(TaskGroup.id, TaskGroup.name)
+                .join(user_taskgroup, user_taskgroup.c.taskgroup_id == TaskGroup.id)
+                .filter(user_taskgroup.c.user_id == user_id)
+                .order_by(TaskGroup.id)
+                .all())
+        groups = tuple(GroupRef(group_id, name) for group_id, name in rows)
+        entry = (generation, groups, frozenset(group.id for group in groups))
+        _cache.set(user_id, entry)
+
+    per_request[user_id] = entry
+    return entry
+
+
+def groups(user_id=None):
+    """Grupos (id, nome) do usuário; por padrão o usuário logado."""
+    return _resolve(current_user.id if user_id is None else user_id)[1]
+
+
+def group_ids(user_id=None):
+    """frozenset com os ids dos grupos do usuário; por padrão o usuário logado."""
+    return _resolve(current_user.id if user_id is None else user_id)[2]
+
+
+def members(group_ids):
+    """
+    Membros distintos (id, nome) dos grupos, ordenados pelo nome.
+
+    Cacheado por conjunto de grupos e invalidado junto com os grupos
+    (a geração muda sempre que um membro entra ou sai).
+    """
+    key = frozenset(group_ids)
+    generation = _generation()
+    entry = _members_cache.get(key)
+    if entry is None or entry[0] != generation:
+        entry = (generation, tuple(member_directory(key)))
+        _members_cache.set(key, entry)
+    return entry[1]
+
+
+def invalidate():
+    """Invalida o cache de todos os workers. Chamar após o commit da alteração."""
+    _counter().bump()
+    g.pop('_membership_generation', None)
+    g.pop('_membership', None)
@@ -0,0 +1,273 @@
+"""
+Métricas por requisição: consultas SQL, tempo de SQL, de templates, de Argon2 e total.
+
+Os eventos do SQLAlchemy (before/after_cursor_execute), os sinais de
+renderização do Flask e o início e o fim de cada requisição alimentam um
+registro por requisição em `g`. Ao final:
+
+- a resposta leva o cabeçalho `Server-Timing` (visível nas ferramentas de
+  desenvolvedor do navegador), com o tempo de SQL e o número de consultas,
+  o tempo de templates, o de Argon2 (quando houve) e o total da view;
+- os valores entram em histogramas por rota (endpoint) do worker.
+
+Cada worker grava seus histogramas em um arquivo JSON próprio
+(<cache>/metrics/<pid>.json) no máximo a cada METRICS_FLUSH_INTERVAL
+segundos; a rota /metrics soma os arquivos de todos os workers, sem
+serviço externo. Arquivos de workers que não existem mais continuam
+somando até ficarem METRICS_MAX_AGE segundos sem atualização.
+
+O tempo medido vai até o fim da view: o corpo de respostas em streaming
+(exportações, /eventos) não entra no total.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from cache import WorkerStore, default_cache_dir, worker_store
+
+# Limites superiores dos baldes dos histogramas (o último balde é +Inf)
+TIME_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Nome no Server-Timing e no /metrics -> descrição
+TIMERS = {
+    'total': 'tempo total da view',
+    'sql': 'tempo das instruções SQL',
+    'template': 'renderização de templates',
+    'argon2': 'hash e verificação de senhas (Argon2)',
+}
+
+
+class RequestTimings:
+    """Medições de uma requisição (guardadas em `g`)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.timers = {'sql': 0.0, 'template': 0.0}
+        self.template_depth = 0
+        self.template_started = 0.0
+        self.status = None
+
+    def add(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def server_timing(self, total):
+        parts = [f'sql;dur={self.timers["sql"] * 1000:.1f};desc="{self.queries} consultas"',
+                 f'template;dur={self.timers["template"] * 1000:.1f}']
+        for name, seconds in self.timers.items():
+            if name not in ('sql', 'template'):
+                parts.append(f'{name};dur={seconds * 1000:.1f}')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def _histogram(bounds):
+    return {'count': 0, 'sum': 0.0, 'buckets': [0] * (len(bounds) + 1)}
+
+
+def _observe(histogram, bounds, value):
+    histogram['count'] += 1
+    histogram['sum'] += value
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            histogram['buckets'][i] += 1
+            return
+    histogram['buckets'][-1] += 1
+
+
+def _merge_histogram(target, source):
+    target['count'] += source['count']
+    target['sum'] += source['sum']
+    target['buckets'] = [a + b for a, b in zip(target['buckets'], source['buckets'])]
+
+
+class Registry(WorkerStore):
+    """Histogramas por rota de um worker, gravados periodicamente no diretório compartilhado."""
+
+    def __init__(self, directory, flush_interval=5):
+        super().__init__(directory, flush_interval)
+        self._routes = {}
+
+    def record(self, route, timings, total):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {'status': {}, 'queries': _histogram(QUERY_BUCKETS), 'timers': {}}
+            status = f'{timings.status // 100}xx'
+            entry['status'][status] = entry['status'].get(status, 0) + 1
+            _observe(entry['queries'], QUERY_BUCKETS, timings.queries)
+            for name, seconds in list(timings.timers.items()) + [('total', total)]:
+                if name not in entry['timers']:
+                    entry['timers'][name] = _histogram(TIME_BUCKETS_MS)
+                _observe(entry['timers'][name], TIME_BUCKETS_MS, seconds * 1000)
+            self._dirty = True
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._routes))
+
+    def payload(self):
+        return {'pid': self.pid, 'routes': self._routes}
+
+
+def registry(app):
+    """Registro do worker atual."""
+    def create():
+        directory = app.config.get('METRICS_DIR') or os.path.join(default_cache_dir(app), 'metrics')
+        return Registry(directory, app.config.get('METRICS_FLUSH_INTERVAL', 5))
+    return worker_store('metrics', create)
+
+
+def _current():
+    if has_request_context():
+        return g.get('_request_timings')
+    return None
+
+
+@contextmanager
+def timed(name):
+    """Soma a duração do bloco ao temporizador `name` da requisição atual (se houver)."""
+    timings = _current()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.add(name, time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current() is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current()
+    started = getattr(context, '_metrics_started', None)
+    if timings is None or started is None:
+        return
+    timings.add('sql', time.perf_counter() - started)
+    # BEGIN emitido pelo perfil do SQLite não é uma consulta
+    if not statement.startswith('BEGIN'):
+        timings.queries += 1
+
+
+def _before_render(sender, template, context, **extra):
+    timings = _current()
+    if timings is not None:
+        # Só o template mais externo conta (os internos já estão dentro dele)
+        if timings.template_depth == 0:
+            timings.template_started = time.perf_counter()
+        timings.template_depth += 1
+
+
+def _rendered(sender, template, context, **extra):
+    timings = _current()
+    if timings is not None and timings.template_depth:
+        timings.template_depth -= 1
+        if timings.template_depth == 0:
+            timings.add('template', time.perf_counter() - timings.template_started)
+
+
+def init_app(app, db):
+    """Liga as medições (se METRICS estiver ativo) às requisições, ao engine e aos templates."""
+    if not app.config.get('METRICS', True):
+        return
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def _start_timings():
+        g._request_timings = RequestTimings()
+
+    @app.after_request
+    def _server_timing(response):
+        timings = g.get('_request_timings')
+        if timings is not None:
+            timings.status = response.status_code
+            response.headers['Server-Timing'] = timings.server_timing(time.perf_counter() - timings.started)
+        return response
+
+    @app.teardown_request
+    def _record_timings(exc):
+        timings = g.pop('_request_timings', None)
+        if timings is None:
+            return
+        if timings.status is None:
+            timings.status = 500  # exceção sem resposta
+        route = request.url_rule.endpoint if request.url_rule else 'sem_rota'
+        current = registry(app)
+        current.record(route, timings, time.perf_counter() - timings.started)
+        try:
+            current.maybe_flush()
+        except OSError:
+            app.logger.exception('Falha ao gravar as métricas em %s', current.directory)
+
+
+def collect(app):
+    """
+    Histogramas somados de todos os workers.
+
+    Retorna {'workers': n, 'routes': {rota: {'status', 'queries', 'timers'}}}.
+    Apaga os arquivos sem atualização há mais de METRICS_MAX_AGE segundos.
+    """
+    current = registry(app)
+    snapshots = [current.snapshot()]
+    snapshots += [data.get('routes', {}) for data in current.others(app.config.get('METRICS_MAX_AGE', 86400))]
+
+    routes = {}
+    for snapshot in snapshots:
+        for route, source in snapshot.items():
+            target = routes.setdefault(route, {'status': {}, 'queries': _histogram(QUERY_BUCKETS), 'timers': {}})
+            for status, count in source['status'].items():
+                target['status'][status] = target['status'].get(status, 0) + count
+            _merge_histogram(target['queries'], source['queries'])
+            for name, histogram in source['timers'].items():
+                _merge_histogram(target['timers'].setdefault(name, _histogram(TIME_BUCKETS_MS)), histogram)
+    return {'workers': len(snapshots), 'routes': routes}
+
+
+def _histogram_lines(name, labels, histogram, bounds, scale=1):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(bounds) + ['+Inf'], histogram['buckets']):
+        cumulative += count
+        le = bound if bound == '+Inf' else f'{bound / scale:g}'
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram["sum"] / scale:g}')
+    lines.append(f'{name}_count{{{labels}}} {histogram["count"]}')
+    return lines
+
+
+def prometheus(collected):
+    """Texto no formato de exposição do Prometheus (tempos em segundos)."""
+    lines = ['# HELP agenda_metrics_workers Workers cujas métricas foram somadas',
+             '# TYPE agenda_metrics_workers gauge',
+             f'agenda_metrics_workers {collected["workers"]}',
+             '# HELP agenda_requests_total Requisições por rota e classe de status',
+             '# TYPE agenda_requests_total counter']
+    routes = sorted(collected['routes'].items())
+    for route, entry in routes:
+        for status, count in sorted(entry['status'].items()):
+            lines.append(f'agenda_requests_total{{route="{route}",status="{status}"}} {count}')
+
+    lines += ['# HELP agenda_request_queries Instruções SQL por requisição',
+              '# TYPE agenda_request_queries histogram']
+    for route, entry in routes:
+        lines += _histogram_lines('agenda_request_queries', f'route="{route}"', entry['queries'], QUERY_BUCKETS)
+
+    for timer, description in TIMERS.items():
+        name = f'agenda_request_{timer}_seconds'
+        lines += [f'# HELP {name} {description.capitalize()} por requisição', f'# TYPE {name} histogram']
+        for route, entry in routes:
+            histogram = entry['timers'].get(timer)
+            if histogram:
+                lines += _histogram_lines(name, f'route="{route}"', histogram, TIME_BUCKETS_MS, scale=1000)
+    return '\n'.join(lines) + '\n'
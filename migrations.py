@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Migrações versionadas do esquema do banco de dados.
+
+Cada migração tem um número de versão crescente e é aplicada uma única vez;
+as versões já aplicadas ficam registradas na tabela `schema_migrations`.
+Executado na inicialização do container, antes do gunicorn.
+
+Para adicionar uma migração, crie uma função que recebe a conexão e
+acrescente-a ao final de MIGRATIONS com o próximo número de versão.
+As migrações devem ser idempotentes: a migração inicial cria as tabelas a
+partir dos modelos atuais, então em um banco novo as colunas e índices
+declarados nos modelos já existem quando as migrações seguintes rodam.
+
+Execute: python migrations.py          (aplica as migrações pendentes)
+         python migrations.py status   (lista as migrações)
+"""
+import sys
+from datetime import datetime
+from sqlalchemy import inspect, text
+from models import db
+import search
+import change_versions
+import live_events
+import delta_sync
+
+
+# ============= AUXILIARES =============
+
+def column_exists(conn, table, column):
+    return column in {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def add_column_if_missing(conn, table, column, ddl):
+    """Adiciona a coluna `column` com a definição `ddl`, se ainda não existir."""
+    if not column_exists(conn, table, column):
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def create_index_if_missing(conn, name, table, columns, unique=False):
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    conn.execute(text(f'CREATE {kind} IF NOT EXISTS {name} ON {table} ({", ".join(columns)})'))
+
+
+# ============= MIGRAÇÕES =============
+
+def m0001_baseline(conn):
+    """Tabelas iniciais (equivalente ao antigo db.create_all())."""
+    db.metadata.create_all(conn)
+
+
+def m0002_note_version(conn):
+    """Coluna de versão das notas (detecção de conflitos no autosave)."""
+    add_column_if_missing(conn, 'notes', 'version', 'INTEGER NOT NULL DEFAULT 1')
+
+
+def m0003_hot_path_indexes(conn):
+    """Índices compostos para as consultas das páginas de tarefas e notas."""
+    create_index_if_missing(conn, 'ix_tarefas_group_data', 'tarefas', ['task_group_id', 'data'])
+    create_index_if_missing(conn, 'ix_tarefas_user_data', 'tarefas', ['user_id', 'data'])
+    create_index_if_missing(conn, 'ix_notes_group_updated', 'notes', ['task_group_id', 'updated_at'])
+    create_index_if_missing(conn, 'ix_user_taskgroup_taskgroup', 'user_taskgroup', ['taskgroup_id'])
+
+
+def m0004_admin_dashboard_indexes(conn):
+    """Índices das contagens e da última atividade do painel de administração."""
+    create_index_if_missing(conn, 'ix_tarefas_group_created', 'tarefas', ['task_group_id', 'created_at'])
+    create_index_if_missing(conn, 'ix_task_groups_admin', 'task_groups', ['admin_id', 'name'])
+
+
+def m0005_search_index(conn):
+    """Índices FTS5 de tarefas e notas, triggers de sincronização e carga inicial."""
+    if conn.dialect.name == 'sqlite':
+        search.install(conn)
+
+
+def m0006_change_versions(conn):
+    """Contadores de versão por grupo (ETag das páginas) e triggers que os incrementam."""
+    if conn.dialect.name == 'sqlite':
+        change_versions.install(conn)
+
+
+def m0007_month_versions(conn):
+    """Versões por grupo e mês das tarefas (cache dos blocos da linha do tempo)."""
+    if conn.dialect.name == 'sqlite':
+        change_versions.install(conn)
+
+
+def m0008_calendar_feeds(conn):
+    """Token dos feeds .ics por usuário e data da última alteração de cada versão."""
+    add_column_if_missing(conn, 'users', 'feed_token', 'VARCHAR(64)')
+    create_index_if_missing(conn, 'ix_users_feed_token', 'users', ['feed_token'], unique=True)
+    if conn.dialect.name == 'sqlite':
+        add_column_if_missing(conn, 'change_versions', 'changed_at', 'TIMESTAMP')
+        change_versions.reinstall_triggers(conn)
+
+
+def m0009_change_log(conn):
+    """Registro de alterações lido pelos eventos em tempo real (SSE) e seus triggers."""
+    if conn.dialect.name == 'sqlite':
+        live_events.install(conn)
+
+
+def m0010_sync_revisions(conn):
+    """Revisões e lápides de tarefas e notas (sincronização incremental, /api/v1/sync)."""
+    if conn.dialect.name == 'sqlite':
+        delta_sync.install(conn)
+
+
+def m0011_sync_move_order(conn):
+    """Triggers da sincronização com a lápide do grupo de origem antes da linha movida."""
+    if conn.dialect.name == 'sqlite':
+        delta_sync.reinstall_triggers(conn)
+
+
+MIGRATIONS = [
+    (1, 'baseline', m0001_baseline),
+    (2, 'note_version', m0002_note_version),
+    (3, 'hot_path_indexes', m0003_hot_path_indexes),
+    (4, 'admin_dashboard_indexes', m0004_admin_dashboard_indexes),
+    (5, 'search_index', m0005_search_index),
+    (6, 'change_versions', m0006_change_versions),
+    (7, 'month_versions', m0007_month_versions),
+    (8, 'calendar_feeds', m0008_calendar_feeds),
+    (9, 'change_log', m0009_change_log),
+    (10, 'sync_revisions', m0010_sync_revisions),
+    (11, 'sync_move_order', m0011_sync_move_order),
+]
+
+
+# ============= EXECUÇÃO =============
+
+def _ensure_migrations_table(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER PRIMARY KEY, '
+        'name VARCHAR(120) NOT NULL, '
+        'applied_at TIMESTAMP NOT NULL)'))
+
+
+def applied_versions(engine):
+    """Versões já aplicadas no banco."""
+    with engine.begin() as conn:
+        _ensure_migrations_table(conn)
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def upgrade(engine, verbose=True):
+    """
+    Aplica as migrações pendentes, em ordem, cada uma em sua transação.
+
+    Retorna a lista de versões aplicadas nesta execução.
+    """
+    done = applied_versions(engine)
+    applied = []
+
+    for version, name, migration in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            migration(conn)
+            conn.execute(text('INSERT INTO schema_migrations (version, name, applied_at) '
+                              'VALUES (:version, :name, :applied_at)'),
+                         {'version': version, 'name': name, 'applied_at': datetime.utcnow()})
+        applied.append(version)
+        if verbose:
+            print(f'✓ Migração {version:04d} ({name}) aplicada')
+
+    return applied
+
+
+def status(engine):
+    done = applied_versions(engine)
+    for version, name, _ in MIGRATIONS:
+        mark = '✓' if version in done else ' '
+        print(f'[{mark}] {version:04d} {name}')
+
+
+def main():
+    from app import app
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'upgrade'
+    try:
+        with app.app_context():
+            if command == 'status':
+                status(db.engine)
+            elif command == 'upgrade':
+                applied = upgrade(db.engine)
+                if not applied:
+                    print('✓ Banco de dados já está atualizado')
+                print(f"✓ Arquivo: {app.config['SQLALCHEMY_DATABASE_URI']}")
+            else:
+                print(f'Comando desconhecido: {command} (use "upgrade" ou "status")', file=sys.stderr)
+                sys.exit(2)
+    except Exception as e:
+        print(f'✗ Erro ao migrar banco de dados: {e}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
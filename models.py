@@ -1,23 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
 from datetime import datetime
+from passwords import hash_password, verify_password
 
 db = SQLAlchemy()
 
-# Inicializar Argon2 Password Hasher
-# Argon2id é a variante recomendada que combina resistência a ataques de tempo e memória
-ph = PasswordHasher()
-
 # Tabela associativa para relacionamento many-to-many entre User e TaskGroup
 user_taskgroup = db.Table('user_taskgroup',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
-    db.Column('taskgroup_id', db.Integer, db.ForeignKey('task_groups.id'), primary_key=True)
+    db.Column('taskgroup_id', db.Integer, db.ForeignKey('task_groups.id'), primary_key=True),
+    # A chave primária começa por user_id; este índice atende buscas pelo grupo
+    db.Index('ix_user_taskgroup_taskgroup', 'taskgroup_id')
 )
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Autenticação dos feeds .ics (ics_feed.py)
+        db.Index('ix_users_feed_token', 'feed_token', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -25,6 +26,9 @@ class User(UserMixin, db.Model):
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Token secreto das URLs de assinatura da agenda (.ics); None até ser gerado
+    feed_token = db.Column(db.String(64))
+
     # Relacionamento com tarefas
     tarefas = db.relationship('Tarefa', backref='usuario', lazy=True, cascade='all, delete-orphan')
 
@@ -39,16 +43,22 @@ class User(UserMixin, db.Model):
         Cria hash da senha usando Argon2id.
         Argon2 é o vencedor do Password Hashing Competition e oferece
         melhor proteção contra ataques de força bruta e rainbow tables.
+        O cálculo roda no pool limitado de passwords.py.
+        """
+        self.password_hash = hash_password(password)
+
+    def verify_password(self, password):
         """
-        self.password_hash = ph.hash(password)
+        Verifica a senha usando Argon2.
+
+        Retorna (correta, precisa_refazer_hash); o hash deve ser refeito
+        quando os parâmetros de custo mudaram desde que foi gerado.
+        """
+        return verify_password(self.password_hash, password)
 
     def check_password(self, password):
         """Verifica se a senha está correta usando Argon2."""
-        try:
-            ph.verify(self.password_hash, password)
-            return True
-        except VerifyMismatchError:
-            return False
+        return self.verify_password(password)[0]
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -56,6 +66,10 @@ class User(UserMixin, db.Model):
 
 class TaskGroup(db.Model):
     __tablename__ = 'task_groups'
+    __table_args__ = (
+        # Painel de administração: grupos do admin ordenados pelo nome
+        db.Index('ix_task_groups_admin', 'admin_id', 'name'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
@@ -78,6 +92,13 @@ class TaskGroup(db.Model):
 
 class Tarefa(db.Model):
     __tablename__ = 'tarefas'
+    __table_args__ = (
+        # Linha do tempo: filtro por grupo (ou autor) ordenado por data
+        db.Index('ix_tarefas_group_data', 'task_group_id', 'data'),
+        db.Index('ix_tarefas_user_data', 'user_id', 'data'),
+        # Painel de administração: última tarefa criada em cada grupo
+        db.Index('ix_tarefas_group_created', 'task_group_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     data = db.Column(db.Date, nullable=False)
@@ -92,6 +113,10 @@ class Tarefa(db.Model):
 
 class Note(db.Model):
     __tablename__ = 'notes'
+    __table_args__ = (
+        # Lista de notas: filtro por grupo ordenado pela última atualização
+        db.Index('ix_notes_group_updated', 'task_group_id', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -101,5 +126,8 @@ class Note(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     task_group_id = db.Column(db.Integer, db.ForeignKey('task_groups.id'), nullable=False)
 
+    # Versão do conteúdo, incrementada a cada salvamento (detecção de conflitos)
+    version = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+
     def __repr__(self):
         return f'<Note {self.id}: {self.title}>'
@@ -0,0 +1,101 @@
+"""
+Hashing e verificação de senhas com Argon2 em um pool limitado de threads.
+
+O Argon2 é caro de propósito (por padrão 64 MiB e 3 iterações por
+verificação). Executado direto nos workers, um pico de logins ocupa todos
+eles e trava as demais páginas. Aqui cada processo mantém um pool com
+poucas threads (a biblioteca libera o GIL durante o cálculo) e uma fila
+limitada: quando pool e fila estão cheios, `PasswordPoolBusy` é lançada na
+hora, para que a rota responda 503 em vez de acumular requisições.
+
+Parâmetros (variáveis de ambiente, lidas no primeiro uso):
+
+- ARGON2_TIME_COST, ARGON2_MEMORY_COST (KiB), ARGON2_PARALLELISM:
+  custo do hash; ao mudarem, senhas antigas são refeitas no próximo login;
+- ARGON2_THREADS: threads de hashing por processo;
+- ARGON2_QUEUE: requisições que podem aguardar além das em execução.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from argon2 import PasswordHasher, DEFAULT_TIME_COST, DEFAULT_MEMORY_COST, DEFAULT_PARALLELISM
+from argon2.exceptions import VerifyMismatchError, VerificationError, InvalidHashError
+import metrics
+
+
+class PasswordPoolBusy(RuntimeError):
+    """O pool de hashing está saturado; tente novamente em instantes."""
+
+
+def hasher_from_env(environ=None):
+    """PasswordHasher com os parâmetros de custo do ambiente (ou os padrões do argon2)."""
+    environ = os.environ if environ is None else environ
+    return PasswordHasher(
+        time_cost=int(environ.get('ARGON2_TIME_COST', DEFAULT_TIME_COST)),
+        memory_cost=int(environ.get('ARGON2_MEMORY_COST', DEFAULT_MEMORY_COST)),
+        parallelism=int(environ.get('ARGON2_PARALLELISM', DEFAULT_PARALLELISM)),
+    )
+
+
+class PasswordPool:
+    """Executor limitado para hash/verificação de senhas."""
+
+    def __init__(self, hasher, threads=2, queue=8):
+        self.hasher = hasher
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='argon2')
+        # Vagas = threads em execução + requisições aguardando na fila
+        self._slots = threading.BoundedSemaphore(threads + queue)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy('Pool de hashing de senhas saturado')
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _verify(self, password_hash, password):
+        try:
+            self.hasher.verify(password_hash, password)
+        except (VerifyMismatchError, VerificationError, InvalidHashError):
+            return False, False
+        return True, self.hasher.check_needs_rehash(password_hash)
+
+    def hash(self, password):
+        """Hash Argon2id da senha."""
+        return self._run(self.hasher.hash, password)
+
+    def verify(self, password_hash, password):
+        """
+        Verifica a senha.
+
+        Retorna (correta, precisa_refazer_hash); o segundo valor indica que
+        o hash foi gerado com parâmetros diferentes dos atuais.
+        """
+        return self._run(self._verify, password_hash, password)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool do processo, criado no primeiro uso com a configuração do ambiente."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordPool(hasher_from_env(),
+                                     threads=int(os.environ.get('ARGON2_THREADS', '2')),
+                                     queue=int(os.environ.get('ARGON2_QUEUE', '8')))
+    return _pool
+
+
+def hash_password(password):
+    with metrics.timed('argon2'):
+        return get_pool().hash(password)
+
+
+def verify_password(password_hash, password):
+    with metrics.timed('argon2'):
+        return get_pool().verify(password_hash, password)
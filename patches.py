@@ -0,0 +1,67 @@
+"""
+Aplicação de edições incrementais (patches) ao conteúdo das notas.
+
+O editor envia apenas os trechos alterados em vez do texto inteiro. Cada
+edição substitui o intervalo [start, end) pelo texto `text`, e as edições
+são aplicadas em sequência (as posições de cada uma se referem ao texto
+resultante da edição anterior).
+
+As posições são contadas em unidades UTF-16, que é como o JavaScript mede
+strings; por isso o texto é manipulado na codificação UTF-16.
+"""
+
+# Limite de edições aceitas em uma única requisição
+MAX_EDITS = 100
+
+
+class PatchError(ValueError):
+    """Patch inválido ou incompatível com o conteúdo atual da nota."""
+
+
+def utf16_length(text):
+    """Comprimento do texto em unidades UTF-16 (equivalente a `str.length` no JS)."""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def apply_edits(content, edits, expected_length=None):
+    """
+    Aplica a lista de edições ao conteúdo e retorna o novo texto.
+
+    `edits` é uma lista de dicts com 'start', 'end' e 'text'. Se
+    `expected_length` for informado, o resultado precisa ter esse tamanho
+    (em UTF-16), o que detecta patches calculados sobre outro texto.
+    Lança PatchError se algo não for válido.
+    """
+    if not isinstance(edits, list):
+        raise PatchError('A lista de edições é inválida.')
+    if len(edits) > MAX_EDITS:
+        raise PatchError(f'Máximo de {MAX_EDITS} edições por requisição.')
+
+    buffer = (content or '').encode('utf-16-le')
+
+    for edit in edits:
+        if not isinstance(edit, dict):
+            raise PatchError('Edição inválida.')
+
+        start = edit.get('start')
+        end = edit.get('end')
+        text = edit.get('text', '')
+        if (not isinstance(start, int) or not isinstance(end, int)
+                or isinstance(start, bool) or isinstance(end, bool)
+                or not isinstance(text, str)):
+            raise PatchError('Edição inválida.')
+        if not 0 <= start <= end <= len(buffer) // 2:
+            raise PatchError('Edição fora dos limites do texto.')
+
+        buffer = buffer[:start * 2] + text.encode('utf-16-le', 'surrogatepass') + buffer[end * 2:]
+
+    try:
+        # Falha se alguma edição cortou um par substituto (emoji, etc.) ao meio
+        result = buffer.decode('utf-16-le')
+    except UnicodeDecodeError:
+        raise PatchError('Edição divide um caractere ao meio.')
+
+    if expected_length is not None and utf16_length(result) != expected_length:
+        raise PatchError('O tamanho do texto resultante não confere.')
+
+    return result
@@ -0,0 +1,387 @@
+"""
+Consultas de leitura usadas pelas páginas da aplicação.
+
+Centraliza as consultas "quentes" (linha do tempo de tarefas, etc.) para que
+os relacionamentos exibidos nos templates sejam carregados junto com as
+linhas principais, evitando o problema de N+1 consultas.
+"""
+from datetime import date
+from sqlalchemy import exists, extract, func, literal, select, tuple_
+from sqlalchemy.orm import contains_eager, load_only, undefer
+from models import db, User, Tarefa, TaskGroup, Note, user_taskgroup
+
+# Quantidade máxima de tarefas devolvidas por página da linha do tempo
+TIMELINE_PAGE_SIZE = 200
+
+# Linhas por página nas tabelas do painel de administração
+ADMIN_PAGE_SIZE = 20
+
+# Sugestões por página na busca de usuários para adicionar a um grupo
+MEMBER_SEARCH_LIMIT = 20
+
+# Usuários aceitos em uma única operação de adicionar/remover membros
+MEMBER_BULK_LIMIT = 500
+
+# Nomes dos meses em português
+MESES_NOMES = {
+    1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril',
+    5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto',
+    9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
+}
+
+
+def _filter_tasks(query, group_ids, selected_group_id=None, selected_user_id=None):
+    """Aplica à consulta os filtros de grupo/usuário da linha do tempo."""
+    query = query.filter(Tarefa.task_group_id.in_(group_ids))
+
+    # Aplicar filtro de grupo apenas se o usuário pertence a ele
+    if selected_group_id and selected_group_id in group_ids:
+        query = query.filter(Tarefa.task_group_id == selected_group_id)
+
+    if selected_user_id:
+        query = query.filter(Tarefa.user_id == selected_user_id)
+
+    return query
+
+
+def timeline_query(group_ids, selected_group_id=None, selected_user_id=None):
+    """
+    Retorna a consulta das tarefas visíveis ao usuário, já com grupo e autor.
+
+    Grupo e autor são carregados via JOIN na mesma instrução (contains_eager),
+    de modo que `tarefa.task_group.name` e `tarefa.usuario.username` no
+    template não disparam consultas adicionais.
+    """
+    query = (Tarefa.query
+             .join(Tarefa.task_group)
+             .join(Tarefa.usuario)
+             .options(contains_eager(Tarefa.task_group),
+                      contains_eager(Tarefa.usuario)))
+    query = _filter_tasks(query, group_ids, selected_group_id, selected_user_id)
+    return query.order_by(Tarefa.data, Tarefa.id)
+
+
+# ============= JANELAS MENSAIS =============
+
+def month_key(year, month):
+    """Chave textual de um mês, no formato AAAA-MM."""
+    return f'{year:04d}-{month:02d}'
+
+
+def parse_month_key(value):
+    """Converte 'AAAA-MM' em (ano, mês); retorna None se for inválido."""
+    try:
+        year, month = (int(part) for part in value.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    if not 1 <= month <= 12 or year < 1:
+        return None
+    return year, month
+
+
+def month_name(year, month):
+    """Nome do mês exibido nos cabeçalhos da linha do tempo."""
+    return f'{MESES_NOMES[month]} de {year}'
+
+
+def month_bounds(year, month):
+    """Intervalo [início, fim) de datas de um mês."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def month_summary(group_ids, selected_group_id=None, selected_user_id=None):
+    """
+    Lista os meses que têm tarefas, com a quantidade de tarefas de cada um.
+
+    O agrupamento é feito no banco (GROUP BY ano/mês), então o custo não
+    depende de carregar as tarefas. Retorna dicts com 'ano', 'mes', 'chave',
+    'nome' e 'total', em ordem cronológica.
+    """
+    year = extract('year', Tarefa.data)
+    month = extract('month', Tarefa.data)
+    query = db.session.query(year.label('ano'), month.label('mes'), func.count(Tarefa.id))
+    query = _filter_tasks(query, group_ids, selected_group_id, selected_user_id)
+    rows = query.group_by(year, month).order_by(year, month).all()
+
+    return [{
+        'ano': int(ano),
+        'mes': int(mes),
+        'chave': month_key(int(ano), int(mes)),
+        'nome': month_name(int(ano), int(mes)),
+        'total': total,
+    } for ano, mes, total in rows]
+
+
+def month_total(group_ids, year, month, selected_group_id=None, selected_user_id=None):
+    """Quantidade de tarefas de um único mês."""
+    start, end = month_bounds(year, month)
+    query = db.session.query(func.count(Tarefa.id))
+    query = _filter_tasks(query, group_ids, selected_group_id, selected_user_id)
+    return query.filter(Tarefa.data >= start, Tarefa.data < end).scalar()
+
+
+def initial_month(months, today=None):
+    """
+    Escolhe o mês exibido ao abrir a página.
+
+    Usa o mês atual se houver tarefas nele; senão o próximo mês com tarefas;
+    senão o mês mais recente. Retorna o índice em `months` (ou None).
+    """
+    if not months:
+        return None
+    today = today or date.today()
+    current = (today.year, today.month)
+    for index, month in enumerate(months):
+        if (month['ano'], month['mes']) >= current:
+            return index
+    return len(months) - 1
+
+
+def encode_cursor(tarefa):
+    """Cursor de paginação (data, id) da última tarefa de uma página."""
+    return f'{tarefa.data.isoformat()}:{tarefa.id}'
+
+
+def decode_cursor(value):
+    """Converte o cursor 'AAAA-MM-DD:id' em (date, id); None se inválido."""
+    try:
+        data, task_id = value.split(':')
+        return date.fromisoformat(data), int(task_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def timeline_page(group_ids, year, month, selected_group_id=None, selected_user_id=None,
+                  after=None, limit=TIMELINE_PAGE_SIZE):
+    """
+    Uma página de tarefas de um mês, paginada por chave (data, id).
+
+    `after` é o cursor (data, id) da última tarefa já exibida. Retorna a
+    lista de tarefas e o cursor da próxima página (None se não houver mais).
+    """
+    start, end = month_bounds(year, month)
+    query = (timeline_query(group_ids, selected_group_id, selected_user_id)
+             .filter(Tarefa.data >= start, Tarefa.data < end))
+    if after:
+        query = query.filter(tuple_(Tarefa.data, Tarefa.id) > tuple_(*after))
+
+    # Buscar uma linha a mais para saber se existe próxima página
+    tarefas = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(tarefas) > limit:
+        tarefas = tarefas[:limit]
+        next_cursor = encode_cursor(tarefas[-1])
+    return tarefas, next_cursor
+
+
+def task_list_page(group_ids, selected_group_id=None, selected_user_id=None, date_from=None,
+                   date_to=None, after=None, limit=TIMELINE_PAGE_SIZE):
+    """
+    Página de tarefas da API JSON, ordenada por (data, id) e paginada por chave.
+
+    `date_from` e `date_to` são inclusivos. Retorna a lista de tarefas e o
+    cursor da próxima página (None se não houver mais).
+    """
+    query = _filter_tasks(Tarefa.query, group_ids, selected_group_id, selected_user_id)
+    if date_from:
+        query = query.filter(Tarefa.data >= date_from)
+    if date_to:
+        query = query.filter(Tarefa.data <= date_to)
+    if after:
+        query = query.filter(tuple_(Tarefa.data, Tarefa.id) > tuple_(*after))
+
+    tarefas = query.order_by(Tarefa.data, Tarefa.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(tarefas) > limit:
+        tarefas = tarefas[:limit]
+        next_cursor = encode_cursor(tarefas[-1])
+    return tarefas, next_cursor
+
+
+# ============= ANOTAÇÕES =============
+
+def notes_sidebar_query(group_ids, selected_group_id=None, selected_user_id=None):
+    """
+    Consulta leve das notas para a lista lateral.
+
+    Carrega apenas id, título, data de atualização, autor e grupo; o
+    conteúdo (que pode ter centenas de KB) fica adiado e não é lido.
+    """
+    query = (Note.query
+             .join(Note.usuario)
+             .join(Note.task_group)
+             .options(load_only(Note.id, Note.title, Note.updated_at,
+                                Note.user_id, Note.task_group_id),
+                      contains_eager(Note.usuario).load_only(User.id, User.username),
+                      contains_eager(Note.task_group).load_only(TaskGroup.id, TaskGroup.name))
+             .filter(Note.task_group_id.in_(group_ids)))
+
+    # Aplicar filtro de grupo apenas se o usuário pertence a ele
+    if selected_group_id and selected_group_id in group_ids:
+        query = query.filter(Note.task_group_id == selected_group_id)
+
+    if selected_user_id:
+        query = query.filter(Note.user_id == selected_user_id)
+
+    return query.order_by(Note.updated_at.desc())
+
+
+def note_detail(note_id, group_ids):
+    """
+    Busca uma nota completa (com conteúdo), apenas se estiver nos grupos dados.
+
+    Retorna None se a nota não existir ou não pertencer aos grupos.
+    """
+    return (Note.query
+            .options(undefer(Note.content))
+            .filter(Note.id == note_id, Note.task_group_id.in_(group_ids))
+            .first())
+
+
+def member_directory(group_ids):
+    """
+    Membros distintos (id, nome) dos grupos informados, ordenados pelo nome.
+
+    Uma única consulta pela tabela associativa, no lugar de um
+    `group.members.all()` por grupo.
+    """
+    if not group_ids:
+        return []
+    rows = (db.session.query(User.id, User.username)
+            .join(user_taskgroup, user_taskgroup.c.user_id == User.id)
+            .filter(user_taskgroup.c.taskgroup_id.in_(list(group_ids)))
+            .distinct()
+            .order_by(User.username)
+            .all())
+    return [(user_id, username) for user_id, username in rows]
+
+
+def _like_pattern(term):
+    """Padrão LIKE de "contém", com os curingas do termo escapados."""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def admin_group_stats(admin_id, page=1, per_page=ADMIN_PAGE_SIZE):
+    """
+    Página de grupos do administrador com as contagens do painel.
+
+    Membros, tarefas, notas e a última atividade vêm de subconsultas
+    correlacionadas em uma única consulta; o SQLite as resolve pelos índices
+    de cada grupo, então o custo depende do tamanho da página e não do
+    total de grupos. Os itens são dicts com id, name, created_at,
+    member_count, task_count, note_count e last_activity.
+    """
+    def scalar(expression, *where):
+        return select(expression).where(*where).correlate(TaskGroup).scalar_subquery()
+
+    query = (db.session.query(
+                TaskGroup.id, TaskGroup.name, TaskGroup.created_at,
+                scalar(func.count(), user_taskgroup.c.taskgroup_id == TaskGroup.id).label('member_count'),
+                scalar(func.count(Tarefa.id), Tarefa.task_group_id == TaskGroup.id).label('task_count'),
+                scalar(func.count(Note.id), Note.task_group_id == TaskGroup.id).label('note_count'),
+                scalar(func.max(Tarefa.created_at), Tarefa.task_group_id == TaskGroup.id).label('last_task_at'),
+                scalar(func.max(Note.updated_at), Note.task_group_id == TaskGroup.id).label('last_note_at'))
+             .filter(TaskGroup.admin_id == admin_id)
+             .order_by(TaskGroup.name, TaskGroup.id))
+
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    items = []
+    for row in pagination.items:
+        item = dict(row._mapping)
+        activity = [value for value in (item.pop('last_task_at'), item.pop('last_note_at')) if value]
+        item['last_activity'] = max(activity) if activity else None
+        items.append(item)
+    pagination.items = items
+    return pagination
+
+
+def admin_user_page(search=None, page=1, per_page=ADMIN_PAGE_SIZE):
+    """Página de usuários comuns ordenados pelo nome, com busca opcional por parte do nome."""
+    query = (db.session.query(User.id, User.username, User.created_at)
+             .filter(User.is_admin.is_(False)))
+    if search:
+        query = query.filter(User.username.like(_like_pattern(search), escape='\\'))
+    return query.order_by(User.username).paginate(page=page, per_page=per_page, error_out=False)
+
+
+def _is_member(group_id):
+    return exists().where(user_taskgroup.c.user_id == User.id,
+                          user_taskgroup.c.taskgroup_id == group_id)
+
+
+def group_member_page(group_id, page=1, per_page=ADMIN_PAGE_SIZE):
+    """Página de membros (id, nome, criado em) do grupo, ordenados pelo nome."""
+    return (db.session.query(User.id, User.username, User.created_at)
+            .join(user_taskgroup, user_taskgroup.c.user_id == User.id)
+            .filter(user_taskgroup.c.taskgroup_id == group_id)
+            .order_by(User.username)
+            .paginate(page=page, per_page=per_page, error_out=False))
+
+
+def _prefix_upper_bound(prefix):
+    """
+    Menor texto maior que todos os que começam com `prefix` (None se não houver).
+
+    Incrementa o último caractere pulando os substitutos (U+D800-U+DFFF),
+    que não existem em UTF-8; um U+10FFFF final não tem sucessor, então sai
+    do prefixo e o anterior é incrementado.
+    """
+    while prefix:
+        code = ord(prefix[-1]) + 1
+        if code == 0xD800:
+            code = 0xE000
+        if code <= 0x10FFFF:
+            return prefix[:-1] + chr(code)
+        prefix = prefix[:-1]
+    return None
+
+
+def member_candidates(group_id, prefix='', after=None, limit=MEMBER_SEARCH_LIMIT):
+    """
+    Usuários que ainda não são membros do grupo e cujo nome começa com `prefix`.
+
+    O prefixo vira um intervalo no índice único de username (a busca
+    diferencia maiúsculas de minúsculas); os membros atuais são excluídos
+    no próprio SQL. Paginação por chave: `after` é o último nome da página
+    anterior. Retorna (usuários, próximo `after` ou None).
+    """
+    query = db.session.query(User.id, User.username).filter(~_is_member(group_id))
+    if prefix:
+        # [prefix, prefix com o último caractere incrementado)
+        query = query.filter(User.username >= prefix)
+        upper = _prefix_upper_bound(prefix)
+        if upper is not None:
+            query = query.filter(User.username < upper)
+    if after:
+        query = query.filter(User.username > after)
+
+    rows = query.order_by(User.username).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_after = rows[-1].username if has_more else None
+    return [(user_id, username) for user_id, username in rows], next_after
+
+
+def add_members(group_id, user_ids):
+    """
+    Adiciona os usuários ao grupo com um único INSERT ... SELECT.
+
+    Ids inexistentes e usuários que já são membros são ignorados. Retorna a
+    quantidade de membros adicionados; o commit fica a cargo de quem chama.
+    """
+    candidates = (select(User.id, literal(group_id))
+                  .where(User.id.in_(list(user_ids)), ~_is_member(group_id)))
+    result = db.session.execute(user_taskgroup.insert().from_select(
+        ['user_id', 'taskgroup_id'], candidates))
+    return result.rowcount
+
+
+def remove_members(group_id, user_ids):
+    """Remove os usuários do grupo com um único DELETE; retorna quantos foram removidos."""
+    result = db.session.execute(user_taskgroup.delete().where(
+        user_taskgroup.c.taskgroup_id == group_id,
+        user_taskgroup.c.user_id.in_(list(user_ids))))
+    return result.rowcount
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Busca textual em tarefas e notas com índices FTS5 do SQLite.
+
+Dois índices, cada um com o rowid igual ao id da linha de origem:
+
+- tarefas_fts(scope, descricao)
+- notes_fts(scope, title, content)
+
+`scope` guarda o token "g<id do grupo>", de modo que o filtro pelos grupos
+do usuário é resolvido dentro do próprio índice (scope:(g1 OR g2) AND ...),
+sem varrer resultados de outros grupos. Triggers nas tabelas de origem
+mantêm os índices sincronizados em qualquer escrita (ORM, UPDATE em lote,
+scripts); a migração 0005 cria índices e triggers e indexa as linhas
+existentes.
+
+O tokenizador remove acentos, então "reuniao" encontra "reunião".
+
+Execute: python search.py rebuild   (reconstrói os índices a partir das tabelas)
+         python search.py optimize  (compacta os índices)
+"""
+import sys
+from datetime import date
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from models import db
+
+# Resultados por página da busca
+SEARCH_PAGE_SIZE = 20
+
+# Última página navegável: cada página lê page * per_page linhas de cada
+# índice, e números enormes estourariam os inteiros do SQLite
+SEARCH_MAX_PAGES = 50
+
+# Palavras por trecho destacado
+SNIPPET_TOKENS = 16
+
+# Marcadores usados no snippet() e trocados por <mark> depois do escape do HTML
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_END = '\x03'
+
+_TOKENIZER = "tokenize = 'unicode61 remove_diacritics 2'"
+
+SCHEMA = [
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS tarefas_fts USING fts5(scope, descricao, {_TOKENIZER})',
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(scope, title, content, {_TOKENIZER})',
+
+    """CREATE TRIGGER IF NOT EXISTS tarefas_fts_insert AFTER INSERT ON tarefas BEGIN
+        INSERT INTO tarefas_fts (rowid, scope, descricao)
+        VALUES (new.id, 'g' || new.task_group_id, new.descricao);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tarefas_fts_update AFTER UPDATE OF descricao, task_group_id ON tarefas BEGIN
+        UPDATE tarefas_fts SET scope = 'g' || new.task_group_id, descricao = new.descricao
+        WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tarefas_fts_delete AFTER DELETE ON tarefas BEGIN
+        DELETE FROM tarefas_fts WHERE rowid = old.id;
+    END""",
+
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts (rowid, scope, title, content)
+        VALUES (new.id, 'g' || new.task_group_id, new.title, coalesce(new.content, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, content, task_group_id ON notes BEGIN
+        UPDATE notes_fts SET scope = 'g' || new.task_group_id, title = new.title,
+                             content = coalesce(new.content, '')
+        WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        DELETE FROM notes_fts WHERE rowid = old.id;
+    END""",
+]
+
+# Acima desta quantidade de linhas com um dos termos, a busca ordena pela
+# data de criação em vez de relevância (ver `search`)
+RANK_MAX_MATCHES = 5000
+
+# Palavras consideradas do texto digitado
+MAX_QUERY_WORDS = 8
+
+# Cada índice devolve no máximo :window linhas (já ordenadas e com os
+# trechos destacados); só elas são unidas às tabelas de origem. Pesos do
+# bm25 por coluna: scope não conta e o título da nota pesa mais.
+_SEARCH_SQL = f"""
+WITH {{windows}}t AS (
+    SELECT rowid AS id, NULL AS title,
+           snippet(tarefas_fts, 1, :hl_start, :hl_end, '…', {SNIPPET_TOKENS}) AS snippet,
+           {{tarefas_score}} AS score
+    FROM tarefas_fts WHERE tarefas_fts MATCH :match {{tarefas_window}}
+), n AS (
+    SELECT rowid AS id, highlight(notes_fts, 1, :hl_start, :hl_end) AS title,
+           snippet(notes_fts, 2, :hl_start, :hl_end, '…', {SNIPPET_TOKENS}) AS snippet,
+           {{notes_score}} AS score
+    FROM notes_fts WHERE notes_fts MATCH :match {{notes_window}}
+)
+SELECT 'tarefa' AS kind, t.id AS id, x.task_group_id AS task_group_id, x.data AS data,
+       x.created_at AS created_at, t.title AS title, t.snippet AS snippet, t.score AS score
+FROM t JOIN tarefas x ON x.id = t.id
+UNION ALL
+SELECT 'nota', n.id, y.task_group_id, y.updated_at, y.created_at, n.title, n.snippet, n.score
+FROM n JOIN notes y ON y.id = n.id
+ORDER BY {{outer_order}}
+LIMIT :limit OFFSET :offset
+"""
+
+# Janelas das linhas criadas mais recentemente. A data de criação não está
+# no índice: cada linha encontrada é buscada na tabela de origem pela chave
+# primária (sem bm25 e sem trechos), e os trechos só são gerados para as
+# :window linhas escolhidas. O `+rowid` mantém o filtro fora do FTS5, que
+# senão refaria o MATCH para cada id da lista.
+_RECENT_WINDOWS = """tw AS (
+    SELECT x.id AS id FROM tarefas_fts CROSS JOIN tarefas x ON x.id = tarefas_fts.rowid
+    WHERE tarefas_fts MATCH :match
+    ORDER BY x.created_at DESC, x.id DESC LIMIT :window
+), nw AS (
+    SELECT y.id AS id FROM notes_fts CROSS JOIN notes y ON y.id = notes_fts.rowid
+    WHERE notes_fts MATCH :match
+    ORDER BY y.created_at DESC, y.id DESC LIMIT :window
+), """
+
+# Ordenações: relevância (bm25) ou linhas criadas mais recentemente (sem
+# calcular o bm25). A ordem de fora, restrita a um dos tipos, tem de ser a
+# mesma da janela de dentro, senão a página N sai de janelas cortadas por
+# outro critério e repete ou pula resultados.
+_RANKED_SQL = _SEARCH_SQL.format(windows='', outer_order='score, id, kind',
+                                 tarefas_window='ORDER BY score, rowid LIMIT :window',
+                                 notes_window='ORDER BY score, rowid LIMIT :window',
+                                 tarefas_score='bm25(tarefas_fts, 0.0, 1.0)',
+                                 notes_score='bm25(notes_fts, 0.0, 5.0, 1.0)')
+_RECENT_SQL = _SEARCH_SQL.format(windows=_RECENT_WINDOWS, outer_order='created_at DESC, kind, id DESC',
+                                 tarefas_window='AND +rowid IN (SELECT id FROM tw)',
+                                 notes_window='AND +rowid IN (SELECT id FROM nw)',
+                                 tarefas_score='NULL', notes_score='NULL')
+
+_COUNT_SQL = """
+SELECT count(*) FROM (SELECT 1 FROM {table} WHERE {table} MATCH :match LIMIT :cap)
+"""
+
+_INDEX_CHECK = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tarefas_fts'"
+
+# Verdadeiro depois que os índices foram encontrados neste processo
+_installed = False
+
+
+def install(conn):
+    """Cria os índices e triggers (idempotente) e indexa as linhas existentes."""
+    for statement in SCHEMA:
+        conn.execute(text(statement))
+    rebuild(conn)
+
+
+def rebuild(conn):
+    """Reconstrói os índices a partir das tabelas de origem."""
+    conn.execute(text('DELETE FROM tarefas_fts'))
+    conn.execute(text("INSERT INTO tarefas_fts (rowid, scope, descricao) "
+                      "SELECT id, 'g' || task_group_id, descricao FROM tarefas"))
+    conn.execute(text('DELETE FROM notes_fts'))
+    conn.execute(text("INSERT INTO notes_fts (rowid, scope, title, content) "
+                      "SELECT id, 'g' || task_group_id, title, coalesce(content, '') FROM notes"))
+    optimize(conn)
+
+
+def optimize(conn):
+    """Funde os segmentos dos índices (mais rápido após cargas grandes)."""
+    conn.execute(text("INSERT INTO tarefas_fts (tarefas_fts) VALUES ('optimize')"))
+    conn.execute(text("INSERT INTO notes_fts (notes_fts) VALUES ('optimize')"))
+
+
+def is_installed():
+    """Os índices FTS existem neste banco? (não existem em bancos criados só com create_all)"""
+    global _installed
+    if not _installed:
+        connection = db.session.connection()
+        _installed = (connection.dialect.name == 'sqlite'
+                      and connection.execute(text(_INDEX_CHECK)).first() is not None)
+    return _installed
+
+
+def _phrases(query):
+    """
+    Palavras do texto como frases do FTS5 (entre aspas).
+
+    Sem busca por prefixo: em um índice grande, um prefixo obriga o FTS5 a
+    fundir as listas de todos os termos que começam com ele a cada consulta.
+    """
+    words = [word.replace('"', '""') for word in query.split()[:MAX_QUERY_WORDS]]
+    return [f'"{word}"' for word in words]
+
+
+def match_expression(query, group_ids):
+    """
+    Expressão MATCH do FTS5 para o texto digitado, restrita aos grupos.
+
+    A sintaxe do FTS5 não é exposta ao usuário: cada palavra vira uma frase
+    entre aspas. Retorna None se não houver palavras ou grupos.
+    """
+    phrases = _phrases(query)
+    if not phrases or not group_ids:
+        return None
+    scopes = ' OR '.join(f'g{int(group_id)}' for group_id in sorted(group_ids))
+    return f'scope:({scopes}) AND - scope:({" ".join(phrases)})'
+
+
+def _has_common_phrase(query):
+    """Algum termo aparece em mais de RANK_MAX_MATCHES linhas de um dos índices?"""
+    for phrase in _phrases(query):
+        for table in ('tarefas_fts', 'notes_fts'):
+            count = db.session.execute(text(_COUNT_SQL.format(table=table)), {
+                'match': f'- scope:({phrase})', 'cap': RANK_MAX_MATCHES + 1}).scalar()
+            if count > RANK_MAX_MATCHES:
+                return True
+    return False
+
+
+def highlight_html(value):
+    """Escapa o trecho e troca os marcadores de destaque por <mark>."""
+    if value is None:
+        return None
+    escaped = str(escape(value))
+    return Markup(escaped.replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_END, '</mark>'))
+
+
+def search(query, group_ids, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    Busca tarefas e notas dos grupos informados.
+
+    Os resultados vêm por relevância (bm25). O bm25 conta, para cada termo,
+    quantas linhas do índice inteiro o contêm, o que percorre toda a lista
+    do termo; com termos muito comuns (mais de RANK_MAX_MATCHES linhas,
+    verificado com contagens limitadas) a busca passa a ordenar pelos criados
+    mais recentemente, o que só lê as datas de criação das linhas encontradas.
+
+    Páginas após SEARCH_MAX_PAGES vêm vazias.
+
+    Retorna (resultados, há_próxima_página, por_relevância). Cada resultado
+    é um dict com kind ('tarefa' ou 'nota'), id, task_group_id, data, title
+    e snippet (estes dois já em HTML seguro, com os termos destacados);
+    `data` é a data da tarefa ou a da última atualização da nota.
+    """
+    match = match_expression(query, group_ids)
+    if match is None:
+        return [], False, True
+
+    page = max(page, 1)
+    ranked = not _has_common_phrase(query)
+    if page > SEARCH_MAX_PAGES:
+        return [], False, ranked
+    rows = db.session.execute(text(_RANKED_SQL if ranked else _RECENT_SQL), {
+        'match': match, 'hl_start': _HIGHLIGHT_START, 'hl_end': _HIGHLIGHT_END,
+        'window': page * per_page + 1, 'limit': per_page + 1, 'offset': (page - 1) * per_page,
+    }).mappings().all()
+
+    results = []
+    for row in rows[:per_page]:
+        result = dict(row)
+        del result['created_at']  # só ordena os resultados
+        # Consulta textual: datas chegam como texto ISO do SQLite
+        result['data'] = date.fromisoformat(str(result['data'])[:10]) if result['data'] else None
+        result['title'] = highlight_html(result['title'])
+        result['snippet'] = highlight_html(result['snippet'])
+        results.append(result)
+    return results, len(rows) > per_page and page < SEARCH_MAX_PAGES, ranked
+
+
+def main():
+    from app import app
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command not in ('rebuild', 'optimize'):
+        print('Uso: python search.py rebuild|optimize', file=sys.stderr)
+        sys.exit(2)
+
+    with app.app_context():
+        if not is_installed():
+            print('✗ Índices de busca não encontrados; execute "python migrations.py"', file=sys.stderr)
+            sys.exit(1)
+        with db.engine.begin() as conn:
+            if command == 'rebuild':
+                rebuild(conn)
+                print('✓ Índices de busca reconstruídos')
+            else:
+                optimize(conn)
+                print('✓ Índices de busca compactados')
+
+
+if __name__ == '__main__':
+    main()
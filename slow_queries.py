@@ -0,0 +1,266 @@
+"""
+Registro de consultas lentas, agrupadas pela forma da instrução SQL.
+
+Toda instrução que passa de SLOW_QUERY_MS milissegundos é registrada no
+log da aplicação e em uma entrada identificada pela impressão digital
+(fingerprint) do SQL normalizado: literais e parâmetros viram `?` e
+listas como `IN (?, ?, ?)` viram `IN (?, ...)`, então a mesma consulta com
+valores ou tamanhos de lista diferentes cai na mesma entrada. Cada entrada
+guarda o SQL normalizado, a forma dos parâmetros (tipos, nunca valores),
+as rotas em que apareceu, número de ocorrências, tempo total, máximo e
+último, e — no SQLite — a saída do `EXPLAIN QUERY PLAN`, capturada na
+primeira vez que o worker vê aquela forma.
+
+Como nas métricas (metrics.py), cada worker grava suas entradas em um
+arquivo próprio (<cache>/slow_queries/<pid>.json) e a página de
+administração soma os arquivos de todos os workers. "Limpar" incrementa
+um contador de geração (cache.py): cada worker descarta as entradas da
+geração anterior no próximo uso.
+
+O tempo medido é o da execução da instrução no driver; para um SELECT,
+a leitura das linhas seguintes à primeira não entra.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from flask import has_request_context, request
+from sqlalchemy import event
+from cache import WorkerStore, default_cache_dir, generation_counter, worker_store
+
+# Entradas mantidas por worker (as vistas há mais tempo saem primeiro)
+MAX_ENTRIES = 200
+
+# Rota registrada para instruções fora de requisições (threads, scripts)
+NO_ROUTE = '(fora de requisição)'
+
+_SPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_ROWS = re.compile(r'(\(\?(?:, \.\.\.)?\))(?:\s*,\s*\1)+')
+
+# Instruções que o EXPLAIN QUERY PLAN aceita
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+
+def normalize(statement):
+    """SQL com espaços, literais e listas de parâmetros normalizados."""
+    sql = _SPACE.sub(' ', statement).strip()
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _LIST.sub('(?, ...)', sql)
+    return _ROWS.sub(r'\1, ...', sql)
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _type_name(value):
+    return 'NULL' if value is None else type(value).__name__
+
+
+def _row_shape(parameters):
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{name}: {_type_name(value)}' for name, value in parameters.items()) + '}'
+    runs = []
+    for name in map(_type_name, parameters or ()):
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return '(' + ', '.join(name if count == 1 else f'{name}×{count}' for name, count in runs) + ')'
+
+
+def _many_rows(parameters, executemany):
+    # O "insertmanyvalues" do SQLAlchemy sinaliza executemany com uma linha só
+    return (executemany and isinstance(parameters, (list, tuple)) and parameters
+            and isinstance(parameters[0], (list, tuple, dict)))
+
+
+def parameter_shape(parameters, executemany=False):
+    """Tipos dos parâmetros, ex.: '(int, str×3)'; executemany: '50× (int, str)'."""
+    if _many_rows(parameters, executemany):
+        return f'{len(parameters)}× {_row_shape(parameters[0])}'
+    return _row_shape(parameters)
+
+
+def explain(dbapi_connection, statement, parameters):
+    """Saída do EXPLAIN QUERY PLAN do SQLite, indentada pela árvore do plano."""
+    rows = dbapi_connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+
+class SlowQueryLog(WorkerStore):
+    """Entradas de consultas lentas de um worker, gravadas no diretório compartilhado."""
+
+    def __init__(self, directory, counter, flush_interval=5, max_entries=MAX_ENTRIES):
+        super().__init__(directory, flush_interval)
+        self.counter = counter
+        self.max_entries = max_entries
+        self._entries = {}
+        self._generation = counter.current()
+
+    def _check_generation(self):
+        generation = self.counter.current()
+        if generation != self._generation:
+            self._entries = {}
+            self._generation = generation
+            self._dirty = True
+
+    def record(self, normalized, shape, route, elapsed_ms):
+        """Soma a ocorrência à entrada; retorna True se a forma é nova (plano a capturar)."""
+        now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        key = fingerprint(normalized)
+        with self._lock:
+            self._check_generation()
+            entry = self._entries.pop(key, None)
+            is_new = entry is None
+            if is_new:
+                entry = {'fingerprint': key, 'sql': normalized, 'params': [], 'routes': {}, 'count': 0,
+                         'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0, 'first_seen': now, 'plan': None}
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['last_ms'] = elapsed_ms
+            entry['last_seen'] = now
+            entry['routes'][route] = entry['routes'].get(route, 0) + 1
+            if shape not in entry['params'] and len(entry['params']) < 5:
+                entry['params'].append(shape)
+            # Reinserida no fim: a ordem do dict é a do último uso
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._dirty = True
+        return is_new
+
+    def set_plan(self, normalized, plan):
+        with self._lock:
+            entry = self._entries.get(fingerprint(normalized))
+            if entry is not None:
+                entry['plan'] = plan
+                self._dirty = True
+
+    def snapshot(self):
+        with self._lock:
+            self._check_generation()
+            return {'generation': self._generation, 'entries': json.loads(json.dumps(self._entries))}
+
+    def payload(self):
+        return self.snapshot()
+
+
+def slow_query_log(app):
+    """Registro do worker atual."""
+    return worker_store('slow_queries', lambda: SlowQueryLog(
+        os.path.join(default_cache_dir(app), 'slow_queries'), generation_counter(app, 'slow_queries'),
+        flush_interval=app.config.get('SLOW_QUERY_FLUSH_INTERVAL', 5)))
+
+
+def _route():
+    if has_request_context():
+        return request.url_rule.endpoint if request.url_rule else 'sem_rota'
+    return NO_ROUTE
+
+
+def init_app(app, db):
+    """Registra as instruções acima de SLOW_QUERY_MS (se SLOW_QUERY_LOG estiver ativo)."""
+    if not app.config.get('SLOW_QUERY_LOG', True):
+        return
+    threshold_ms = app.config.get('SLOW_QUERY_MS', 100)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_slow_query_started', None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms < threshold_ms:
+            return
+
+        normalized = normalize(statement)
+        route = _route()
+        shape = parameter_shape(parameters, executemany)
+        app.logger.warning('Consulta lenta: %.0f ms em %s [%s] %s %s', elapsed_ms, route,
+                           fingerprint(normalized), normalized, shape)
+
+        current = slow_query_log(app)
+        try:
+            is_new = current.record(normalized, shape, route, elapsed_ms)
+            if (is_new and conn.dialect.name == 'sqlite'
+                    and normalized.split(' ', 1)[0].upper() in _EXPLAINABLE):
+                try:
+                    plan = explain(cursor.connection, statement,
+                                   parameters[0] if _many_rows(parameters, executemany) else parameters)
+                except Exception as e:  # o plano é um extra: nunca derruba a consulta
+                    plan = f'(plano indisponível: {e})'
+                current.set_plan(normalized, plan)
+            current.maybe_flush()
+        except OSError:
+            app.logger.exception('Falha ao gravar as consultas lentas em %s', current.directory)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+
+    @app.teardown_request
+    def _flush_slow_queries(exc):
+        # Entradas registradas logo após uma gravação esperam a próxima requisição
+        current = slow_query_log(app)
+        try:
+            current.maybe_flush()
+        except OSError:
+            app.logger.exception('Falha ao gravar as consultas lentas em %s', current.directory)
+
+
+def collect(app):
+    """
+    Entradas de todos os workers, somadas por fingerprint, da mais custosa
+    (tempo total) para a menos custosa.
+    """
+    current = slow_query_log(app)
+    own = current.snapshot()
+    generation = own['generation']
+    # Arquivos de outra geração foram gravados antes de "Limpar" por um
+    # worker que ainda não voltou a gravar
+    snapshots = [own['entries']]
+    snapshots += [data['entries'] for data in current.others() if data.get('generation') == generation]
+
+    merged = {}
+    for snapshot in snapshots:
+        for key, source in snapshot.items():
+            target = merged.get(key)
+            if target is None:
+                merged[key] = json.loads(json.dumps(source))
+                continue
+            target['count'] += source['count']
+            target['total_ms'] += source['total_ms']
+            target['max_ms'] = max(target['max_ms'], source['max_ms'])
+            if source['last_seen'] > target['last_seen']:
+                target['last_seen'], target['last_ms'] = source['last_seen'], source['last_ms']
+            target['first_seen'] = min(target['first_seen'], source['first_seen'])
+            for route, count in source['routes'].items():
+                target['routes'][route] = target['routes'].get(route, 0) + count
+            for shape in source['params']:
+                if shape not in target['params']:
+                    target['params'].append(shape)
+            target['plan'] = target['plan'] or source['plan']
+    return sorted(merged.values(), key=lambda entry: entry['total_ms'], reverse=True)
+
+
+def clear(app):
+    """Descarta as entradas de todos os workers."""
+    current = slow_query_log(app)
+    current.counter.bump()
+    current.remove_all()
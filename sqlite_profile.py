@@ -0,0 +1,82 @@
+"""
+Perfil de produção do SQLite aplicado via eventos de conexão do SQLAlchemy.
+
+Com vários workers do gunicorn compartilhando o mesmo arquivo, as
+configurações padrão do SQLite geram erros "database is locked" e fazem
+leitores esperarem por escritores. Este módulo:
+
+- ativa o journal WAL (leitores não bloqueiam escritores e vice-versa);
+- usa synchronous=NORMAL (seguro com WAL, bem menos fsyncs);
+- define busy_timeout, cache_size e mmap_size configuráveis;
+- inicia transações de escrita com BEGIN IMMEDIATE, de modo que os
+  escritores façam fila pelo lock (respeitando o busy_timeout) em vez de
+  falharem ao tentar promover uma leitura para escrita.
+
+Uma transação é considerada de escrita quando ocorre durante uma
+requisição POST/PUT/PATCH/DELETE ou dentro de `write_transaction()`.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import has_request_context, request
+from sqlalchemy import event
+
+# Métodos HTTP cujas transações podem escrever no banco
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+_force_immediate = ContextVar('sqlite_force_immediate', default=False)
+
+
+@contextmanager
+def write_transaction():
+    """Força BEGIN IMMEDIATE para transações iniciadas dentro do bloco (scripts, CLI)."""
+    token = _force_immediate.set(True)
+    try:
+        yield
+    finally:
+        _force_immediate.reset(token)
+
+
+def _wants_immediate():
+    if _force_immediate.get():
+        return True
+    return has_request_context() and request.method in WRITE_METHODS
+
+
+def configure_engine(engine, busy_timeout=5000, cache_size=-20000, mmap_size=268435456):
+    """
+    Registra os eventos de conexão/transação no engine (apenas SQLite).
+
+    `busy_timeout` em milissegundos; `cache_size` segue a convenção do
+    SQLite (negativo = KiB); `mmap_size` em bytes (0 desativa).
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        # Desativa o BEGIN automático do driver; o SQLAlchemy emite o BEGIN
+        dbapi_connection.isolation_level = None
+
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        cursor.execute(f'PRAGMA cache_size={int(cache_size)}')
+        cursor.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _on_begin(conn):
+        conn.exec_driver_sql('BEGIN IMMEDIATE' if _wants_immediate() else 'BEGIN')
+
+
+def init_app(app, db):
+    """Aplica o perfil ao engine da aplicação, conforme app.config."""
+    if not app.config.get('SQLITE_TUNING', True):
+        return
+
+    with app.app_context():
+        configure_engine(db.engine,
+                         busy_timeout=app.config.get('SQLITE_BUSY_TIMEOUT', 5000),
+                         cache_size=app.config.get('SQLITE_CACHE_SIZE', -20000),
+                         mmap_size=app.config.get('SQLITE_MMAP_SIZE', 268435456))
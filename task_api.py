@@ -0,0 +1,224 @@
+"""
+Regras da API JSON de tarefas (/api/v1/tasks): serialização e operações em lote.
+
+Um lote é uma lista de operações aplicadas em uma única transação:
+
+    {"op": "create", "data": "2026-03-01", "descricao": "...", "task_group_id": 1}
+    {"op": "update", "id": 10, "descricao": "..."}   (data, descricao e/ou task_group_id)
+    {"op": "delete", "id": 11}
+
+As permissões são as mesmas das rotas HTML: só é possível criar tarefas
+e mover tarefas para grupos dos quais o usuário é membro, e só o autor ou
+um administrador altera ou remove uma tarefa (de um grupo do usuário).
+
+Todas as operações são validadas antes de qualquer escrita, com uma única
+consulta para as tarefas alteradas ou removidas. Depois as criações viram
+INSERTs de várias linhas, as alterações um UPDATE em lote por chave
+primária e as remoções um único DELETE. Cada operação recebe um resultado próprio; com
+`atomic` verdadeiro, um erro em qualquer operação cancela o lote inteiro.
+"""
+from collections import deque
+from datetime import datetime
+from sqlalchemy import delete, insert, update
+from models import db, Tarefa
+
+# Limite de operações aceitas em um único lote
+MAX_OPERATIONS = 500
+
+# Mesmo limite do formulário de tarefas
+MAX_DESCRIPTION_LENGTH = 1000
+
+OPERATIONS = ('create', 'update', 'delete')
+
+
+class BatchError(ValueError):
+    """Lote inválido como um todo (formato ou tamanho)."""
+
+
+class OperationError(ValueError):
+    """Operação inválida ou não permitida; vira o resultado de erro daquele item."""
+
+
+def task_to_dict(tarefa):
+    """Representação JSON de uma tarefa."""
+    return {
+        'id': tarefa.id,
+        'data': tarefa.data.isoformat(),
+        'descricao': tarefa.descricao,
+        'task_group_id': tarefa.task_group_id,
+        'user_id': tarefa.user_id,
+        'created_at': tarefa.created_at.isoformat() if tarefa.created_at else None,
+    }
+
+
+def parse_date(value):
+    """
+    Data no formato AAAA-MM-DD; None se inválida.
+
+    Mesmo formato do TaskForm: outras formas da ISO 8601 que o
+    date.fromisoformat aceita (20260301, 2026-W10-1) são recusadas.
+    """
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_fields(operation, group_ids, required):
+    """
+    Valida data, descricao e task_group_id presentes na operação.
+
+    Mesmas regras do TaskForm. Retorna os valores convertidos (data como
+    date); lança OperationError com a mensagem do primeiro erro.
+    """
+    values = {}
+    missing = [field for field in ('data', 'descricao', 'task_group_id')
+               if required and field not in operation]
+    if missing:
+        raise OperationError(f'Campos obrigatórios ausentes: {", ".join(missing)}.')
+
+    if 'data' in operation:
+        values['data'] = parse_date(operation['data'])
+        if values['data'] is None:
+            raise OperationError('Data inválida (use AAAA-MM-DD).')
+
+    if 'descricao' in operation:
+        descricao = operation['descricao']
+        if not isinstance(descricao, str) or not descricao.strip():
+            raise OperationError('A descrição é obrigatória.')
+        if len(descricao) > MAX_DESCRIPTION_LENGTH:
+            raise OperationError(f'A descrição deve ter no máximo {MAX_DESCRIPTION_LENGTH} caracteres.')
+        values['descricao'] = descricao
+
+    if 'task_group_id' in operation:
+        group_id = operation['task_group_id']
+        if not _is_int(group_id) or group_id not in group_ids:
+            raise OperationError('Você não pertence a este grupo de tarefas.')
+        values['task_group_id'] = group_id
+
+    if not values:
+        raise OperationError('Nenhum campo para alterar.')
+    return values
+
+
+def _check_target(operation, targets, seen, user):
+    """Confere a tarefa alvo de update/delete e a permissão do usuário."""
+    task_id = operation.get('id')
+    if not _is_int(task_id):
+        raise OperationError('Id da tarefa ausente ou inválido.')
+    if task_id in seen:
+        raise OperationError('A tarefa aparece em mais de uma operação do lote.')
+
+    target = targets.get(task_id)
+    if target is None:
+        raise OperationError('Tarefa não encontrada.')
+    if not user.is_admin and target.user_id != user.id:
+        raise OperationError('Apenas o autor ou um administrador podem alterar esta tarefa.')
+    seen.add(task_id)
+    return task_id
+
+
+def _plan(operations, user, group_ids):
+    """
+    Valida as operações sem escrever nada.
+
+    Retorna a lista de (índice, op, valores) válidas e a lista de resultados
+    de erro. Tarefas fora dos grupos do usuário são tratadas como inexistentes.
+    """
+    ids = [operation.get('id') for operation in operations
+           if isinstance(operation, dict) and _is_int(operation.get('id'))]
+    targets = {}
+    if ids:
+        rows = (db.session.query(Tarefa.id, Tarefa.user_id, Tarefa.task_group_id)
+                .filter(Tarefa.id.in_(set(ids)), Tarefa.task_group_id.in_(group_ids))
+                .all())
+        targets = {row.id: row for row in rows}
+
+    planned, errors, seen = [], [], set()
+    for index, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        try:
+            if op not in OPERATIONS:
+                raise OperationError(f'Operação inválida (use {", ".join(OPERATIONS)}).')
+            if op == 'create':
+                values = validate_fields(operation, group_ids, required=True)
+                values['user_id'] = user.id
+            elif op == 'update':
+                task_id = _check_target(operation, targets, seen, user)
+                values = validate_fields(operation, group_ids, required=False)
+                values['id'] = task_id
+            else:
+                values = {'id': _check_target(operation, targets, seen, user)}
+        except OperationError as e:
+            errors.append({'index': index, 'op': op, 'status': 'error', 'message': str(e)})
+            continue
+        planned.append((index, op, values))
+    return planned, errors
+
+
+def _create_key(values):
+    return values['data'], values['descricao'], values['task_group_id']
+
+
+def apply_batch(operations, user, group_ids, atomic=False):
+    """
+    Aplica o lote em uma transação e retorna (resultados, aplicado).
+
+    `user` é o usuário logado (id e is_admin) e `group_ids` os seus grupos.
+    Os resultados vêm na ordem das operações, com 'status' created, updated,
+    deleted, error ou skipped (lote atômico cancelado). `aplicado` é falso
+    quando nada foi gravado por causa de erros em um lote atômico.
+    Lança BatchError se o lote não for uma lista ou exceder MAX_OPERATIONS.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BatchError('O lote deve ser uma lista não vazia de operações.')
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(f'Máximo de {MAX_OPERATIONS} operações por lote.')
+
+    planned, errors = _plan(operations, user, group_ids)
+    results = {result['index']: result for result in errors}
+
+    if errors and atomic:
+        for index, op, _ in planned:
+            results[index] = {'index': index, 'op': op, 'status': 'skipped'}
+        db.session.rollback()
+        return [results[index] for index in range(len(operations))], False
+
+    creates = [(index, values) for index, op, values in planned if op == 'create']
+    updates = [(index, values) for index, op, values in planned if op == 'update']
+    deletes = [(index, values['id']) for index, op, values in planned if op == 'delete']
+
+    if creates:
+        # RETURNING sem ordem garantida (pedir a ordem dos parâmetros faria o
+        # SQLite voltar a um INSERT por linha): cada linha devolvida é
+        # associada pela combinação de campos; criações idênticas são
+        # intercambiáveis
+        pending = {}
+        for index, values in creates:
+            pending.setdefault(_create_key(values), deque()).append(index)
+        rows = db.session.execute(
+            insert(Tarefa).returning(Tarefa.id, Tarefa.data, Tarefa.descricao, Tarefa.task_group_id),
+            [values for _, values in creates]).all()
+        for row in rows:
+            index = pending[_create_key(row._mapping)].popleft()
+            results[index] = {'index': index, 'op': 'create', 'status': 'created', 'id': row.id}
+
+    if updates:
+        db.session.execute(update(Tarefa), [values for _, values in updates])
+        for index, values in updates:
+            results[index] = {'index': index, 'op': 'update', 'status': 'updated', 'id': values['id']}
+
+    if deletes:
+        db.session.execute(delete(Tarefa).where(Tarefa.id.in_([task_id for _, task_id in deletes]))
+                           .execution_options(synchronize_session=False))
+        for index, task_id in deletes:
+            results[index] = {'index': index, 'op': 'delete', 'status': 'deleted', 'id': task_id}
+
+    db.session.commit()
+    return [results[index] for index in range(len(operations))], True
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Importação em massa de tarefas a partir de arquivos CSV ou iCalendar (.ics).
+
+O arquivo é lido em fluxo, linha a linha, sem carregá-lo inteiro em
+memória. Cada tarefa é validada com as mesmas regras do formulário de
+tarefas (task_api.validate_fields: data AAAA-MM-DD, descrição de até 1000
+caracteres, grupo do qual o usuário é membro) e as válidas são gravadas em
+blocos de CHUNK_SIZE linhas (INSERT em lote), todos na mesma transação.
+Linhas rejeitadas são relatadas com o número da linha e o motivo.
+
+CSV: cabeçalho com as colunas `data` e `descricao` e, opcionalmente,
+`task_group_id` (senão vale o grupo escolhido na importação); colunas
+extras são ignoradas, então o CSV de export.py pode ser reimportado.
+
+ICS: cada VEVENT vira uma tarefa na data de DTSTART, com SUMMARY (ou,
+sem ele, DESCRIPTION) como descrição, no grupo escolhido.
+
+No modo de simulação (dry run) tudo é validado e relatado, mas nada é gravado.
+
+Execute: python task_import.py tarefas.csv --user admin --group 3 [--dry-run]
+"""
+import argparse
+import codecs
+import csv
+import sys
+import time
+from collections import namedtuple
+from sqlalchemy import insert
+from models import db, Tarefa
+from task_api import validate_fields, OperationError
+
+# Linhas por INSERT em lote
+CHUNK_SIZE = 1000
+
+# Tarefas aceitas em uma importação (linhas além disso são ignoradas e relatadas)
+MAX_ROWS = 100000
+
+# Linhas rejeitadas listadas no relatório (as demais só entram na contagem)
+MAX_REPORTED_ERRORS = 200
+
+FORMATS = ('csv', 'ics')
+
+ImportReport = namedtuple('ImportReport', ['dry_run', 'total', 'imported', 'rejected',
+                                           'errors', 'truncated', 'seconds'])
+
+
+class ImportFileError(ValueError):
+    """Arquivo ilegível ou sem o formato esperado."""
+
+
+def detect_format(filename):
+    """Formato pelo nome do arquivo ('csv' ou 'ics'); None se desconhecido."""
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+    return extension if extension in FORMATS else None
+
+
+def csv_records(lines):
+    """(número da linha, campos) de cada linha de dados do CSV."""
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames or not {'data', 'descricao'} <= set(reader.fieldnames):
+        raise ImportFileError('O CSV deve ter um cabeçalho com as colunas "data" e "descricao".')
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _unfold(lines):
+    """Junta as linhas de continuação do iCalendar (iniciadas por espaço ou tab)."""
+    number, current = 0, None
+    for line_number, line in enumerate(lines, start=1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield number, current
+        number, current = line_number, line
+    if current is not None:
+        yield number, current
+
+
+def _ics_text(value):
+    out, chars = [], iter(value)
+    for char in chars:
+        if char == '\\':
+            escaped = next(chars, '')
+            out.append('\n' if escaped in 'nN' else escaped)
+        else:
+            out.append(char)
+    return ''.join(out)
+
+
+def _ics_date(value):
+    # 20260301, 20260301T100000 ou 20260301T100000Z: só a data importa
+    digits = value[:8]
+    if len(digits) != 8 or not digits.isdigit():
+        return value
+    return f'{digits[:4]}-{digits[4:6]}-{digits[6:]}'
+
+
+def ics_records(lines):
+    """(número da linha do BEGIN:VEVENT, campos) de cada evento do arquivo."""
+    event, start = None, 0
+    seen_calendar = False
+    for number, line in _unfold(lines):
+        name, _, value = line.partition(':')
+        name = name.split(';', 1)[0].upper()
+        if name == 'BEGIN' and value.upper() == 'VCALENDAR':
+            seen_calendar = True
+        elif name == 'BEGIN' and value.upper() == 'VEVENT':
+            event, start = {}, number
+        elif name == 'END' and value.upper() == 'VEVENT' and event is not None:
+            record = {'descricao': event.get('SUMMARY') or event.get('DESCRIPTION', '')}
+            if 'DTSTART' in event:
+                record['data'] = _ics_date(event['DTSTART'])
+            yield start, record
+            event = None
+        elif event is not None and name in ('SUMMARY', 'DESCRIPTION', 'DTSTART'):
+            event[name] = _ics_text(value) if name != 'DTSTART' else value.strip()
+    if not seen_calendar:
+        raise ImportFileError('Arquivo .ics sem BEGIN:VCALENDAR.')
+
+
+def _operation(record, default_group_id):
+    """Converte os campos lidos no formato aceito por validate_fields."""
+    operation = {'data': (record.get('data') or '').strip(),
+                 'descricao': (record.get('descricao') or '').strip()}
+    group = record.get('task_group_id')
+    group = group.strip() if isinstance(group, str) else ''
+    if group:
+        operation['task_group_id'] = int(group) if group.isdigit() else group
+    elif default_group_id is not None:
+        operation['task_group_id'] = default_group_id
+    return operation
+
+
+def import_tasks(lines, fmt, user_id, group_ids, default_group_id=None, dry_run=False):
+    """
+    Importa as tarefas de `lines` (iterável de linhas de texto) e retorna um ImportReport.
+
+    As tarefas são criadas com autor `user_id`, apenas nos grupos
+    `group_ids`. O commit é feito ao final; em dry run nada é gravado.
+    Lança ImportFileError se o arquivo não puder ser lido.
+    """
+    records = csv_records(lines) if fmt == 'csv' else ics_records(lines)
+    started = time.perf_counter()
+    total = imported = rejected = 0
+    errors, chunk, truncated = [], [], False
+
+    def flush():
+        nonlocal imported
+        if chunk and not dry_run:
+            db.session.execute(insert(Tarefa), chunk)
+        imported += len(chunk)
+        chunk.clear()
+
+    try:
+        for line_number, record in records:
+            if total >= MAX_ROWS:
+                truncated = True
+                break
+            total += 1
+            try:
+                values = validate_fields(_operation(record, default_group_id), group_ids, required=True)
+            except OperationError as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append((line_number, str(e)))
+                continue
+            values['user_id'] = user_id
+            chunk.append(values)
+            if len(chunk) >= CHUNK_SIZE:
+                flush()
+        flush()
+    except (UnicodeDecodeError, csv.Error, ImportFileError) as e:
+        db.session.rollback()
+        if isinstance(e, ImportFileError):
+            raise
+        raise ImportFileError(f'Não foi possível ler o arquivo: {e}') from e
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return ImportReport(dry_run, total, imported, rejected, errors, truncated,
+                        time.perf_counter() - started)
+
+
+def text_lines(binary_file):
+    """Linhas de texto (UTF-8, com ou sem BOM) de um arquivo binário, lidas sob demanda."""
+    return codecs.iterdecode(binary_file, 'utf-8-sig')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importa tarefas de um arquivo CSV ou .ics.')
+    parser.add_argument('file', help='arquivo .csv ou .ics')
+    parser.add_argument('--user', required=True, help='usuário autor das tarefas (precisa ser membro dos grupos)')
+    parser.add_argument('--group', type=int, help='grupo padrão (obrigatório para .ics e CSV sem task_group_id)')
+    parser.add_argument('--dry-run', action='store_true', help='apenas validar, sem gravar')
+    args = parser.parse_args()
+
+    fmt = detect_format(args.file)
+    if fmt is None:
+        print('✗ Formato não reconhecido (use .csv ou .ics)', file=sys.stderr)
+        sys.exit(2)
+
+    from app import app
+    from models import User
+    from sqlite_profile import write_transaction
+    import membership
+
+    # Uma única transação de escrita, desde a leitura do usuário e dos grupos
+    with app.app_context(), write_transaction():
+        user = User.query.filter_by(username=args.user).first()
+        if user is None:
+            print(f'✗ Usuário "{args.user}" não encontrado', file=sys.stderr)
+            sys.exit(1)
+        group_ids = membership.group_ids(user.id)
+
+        try:
+            with open(args.file, 'rb') as f:
+                report = import_tasks(text_lines(f), fmt, user.id, group_ids,
+                                      default_group_id=args.group, dry_run=args.dry_run)
+        except ImportFileError as e:
+            print(f'✗ {e}', file=sys.stderr)
+            sys.exit(1)
+
+    for line_number, message in report.errors:
+        print(f'  linha {line_number}: {message}')
+    if report.rejected > len(report.errors):
+        print(f'  ... e mais {report.rejected - len(report.errors)} linha(s) rejeitada(s)')
+    if report.truncated:
+        print(f'  Limite de {MAX_ROWS} tarefas atingido; o restante do arquivo foi ignorado')
+    verb = 'seriam importadas' if report.dry_run else 'importadas'
+    print(f"{'✓' if not report.rejected else '⚠'} {report.imported} de {report.total} tarefas {verb} "
+          f"em {report.seconds:.1f}s ({report.total / max(report.seconds, 1e-9):.0f} linhas/s), "
+          f'{report.rejected} rejeitadas')
+
+
+if __name__ == '__main__':
+    main()
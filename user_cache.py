@@ -0,0 +1,66 @@
+"""
+Cache do user loader do Flask-Login.
+
+Em vez de um SELECT do usuário a cada requisição autenticada (inclusive o
+autosave de notas a cada 1,5 s), o loader devolve um retrato imutável e
+pequeno do usuário (id, nome, is_admin e versão), guardado em um LRU em
+processo com TTL.
+
+A versão é a geração do contador compartilhado "users": qualquer
+alteração de usuário (rotas de administração, create_user.py) chama
+`invalidate()` após o commit, o que invalida os retratos em todos os
+workers.
+"""
+from collections import namedtuple
+from flask import current_app
+from flask_login import UserMixin
+from cache import LRUCache, generation_counter
+from models import db, User
+
+
+class UserSnapshot(UserMixin, namedtuple('UserSnapshot', ['id', 'username', 'is_admin', 'version'])):
+    """Retrato imutável do usuário usado como `current_user`."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.username}>'
+
+
+_cache = None
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(maxsize=current_app.config.get('USER_CACHE_SIZE', 1024),
+                          ttl=current_app.config.get('USER_CACHE_TTL', 300))
+    return _cache
+
+
+def _counter():
+    return generation_counter(current_app, 'users')
+
+
+def load(user_id):
+    """Retrato do usuário `user_id` (ou None se não existir)."""
+    cache = _get_cache()
+    generation = _counter().current()
+
+    snapshot = cache.get(user_id)
+    if snapshot is not None and snapshot.version == generation:
+        return snapshot
+
+    row = db.session.query(User.id, User.username, User.is_admin).filter(User.id == user_id).first()
+    if row is None:
+        cache.delete(user_id)
+        return None
+
+    snapshot = UserSnapshot(row.id, row.username, row.is_admin, generation)
+    cache.set(user_id, snapshot)
+    return snapshot
+
+
+def invalidate():
+    """Invalida os retratos de todos os workers. Chamar após o commit da alteração."""
+    _counter().bump()
+    _get_cache().clear()